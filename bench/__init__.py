@@ -0,0 +1,7 @@
+# bench/__init__.py
+"""
+Performance checks for the training/evaluation path.
+
+    python -m bench run / compare      throughput benchmarks + regression check (see __main__)
+    python -m bench.import_time        import-time budget for worker processes
+"""
@@ -0,0 +1,93 @@
+# bench/__main__.py
+"""
+    python -m bench run [--quick] [--only combate env ...] [--out bench/results/latest.json]
+    python -m bench compare BASELINE.json CURRENT.json [--threshold 0.10]
+
+`run` writes the metrics plus machine metadata as JSON. `compare` prints the relative
+change of every metric present in both files and exits with status 1 if any of them
+got worse by more than the threshold (throughput down, or time up).
+
+bench/results/ is git-ignored scratch space for runs; a baseline meant to be kept is
+written with an explicit --out outside it and committed on purpose.
+"""
+import argparse, datetime, json, os, platform, subprocess, sys
+import numpy as np
+
+def machine_metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "git_commit": commit,
+    }
+
+def cmd_run(args):
+    from bench.benchmarks import BENCHMARKS
+    names = args.only or list(BENCHMARKS)
+    metrics = {}
+    for name in names:
+        fn, quick_kwargs = BENCHMARKS[name]
+        res = fn(**quick_kwargs) if args.quick else fn()
+        for key, m in res.items():
+            print(f"{key:42s} {m['value']:14.2f} {m['unit']}", flush=True)
+        metrics.update(res)
+    out = {"meta": machine_metadata(), "quick": args.quick, "metrics": metrics}
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(out, f, indent=2)
+    print(f"[bench] results -> {args.out}")
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """[(key, base, cur, change, regressed)]; change > 0 always means 'better'."""
+    rows = []
+    for key, b in baseline["metrics"].items():
+        c = current["metrics"].get(key)
+        if c is None or b["value"] == 0:
+            continue
+        rel = (c["value"] - b["value"]) / b["value"]
+        change = rel if b["higher_is_better"] else -rel
+        rows.append((key, b, c, change, change < -threshold))
+    return rows
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    for side, d in (("baseline", baseline), ("current", current)):
+        m = d["meta"]
+        print(f"{side:9s} {m['git_commit'] or '?':.10s}  {m['platform']}  py{m['python']}  "
+              f"numpy {m['numpy']}  {m['cpu_count']} cpus{'  (quick)' if d.get('quick') else ''}")
+    rows = compare(baseline, current, args.threshold)
+    for key, b, c, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ("faster" if change > args.threshold else "")
+        print(f"{key:42s} {b['value']:12.2f} -> {c['value']:12.2f} {c['unit']:12s} {change:+7.1%}  {flag}")
+    n_reg = sum(r[4] for r in rows)
+    print(f"[bench] {len(rows)} metrics compared, {n_reg} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if n_reg else 0)
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the benchmarks and write a JSON report")
+    r.add_argument("--quick", action="store_true", help="smaller workloads (smoke runs, CI)")
+    r.add_argument("--only", nargs="+", help="subset of benchmarks (see bench/benchmarks.py BENCHMARKS)")
+    r.add_argument("--out", type=str, default="bench/results/latest.json")
+    c = sub.add_parser("compare", help="flag regressions of CURRENT against BASELINE")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown")
+    args = ap.parse_args()
+    cmd_run(args) if args.cmd == "run" else cmd_compare(args)
+
+if __name__ == "__main__":
+    main()
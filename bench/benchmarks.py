@@ -0,0 +1,199 @@
+# bench/benchmarks.py
+"""
+Throughput / latency benchmarks for the simulator, the envs, the learners, evaluation
+and checkpoints.
+
+Every benchmark returns {name: {"value", "unit", "higher_is_better"}}. Timed sections
+are repeated and the best repeat is kept, which filters out scheduler noise better
+than the mean on a shared machine.
+"""
+import os, tempfile, time
+from types import SimpleNamespace
+import numpy as np
+
+from cache_datos import cargar_entrenadores, limpiar_registro
+from combate import Combate
+from rl_env.pokemon_env import PokemonEnv
+from rl_env.vector_pokemon_env import VectorPokemonEnv
+from rl_env.state_encoder import MixedRadixEncoder
+from rl_agents.tabular_q import TabularQLearner
+from rl_agents.tabular_sarsa import TabularSarsaLearner
+from utils.checkpoint import save_checkpoint, load_checkpoint
+
+N_ACTIONS = 16
+
+def _metric(value, unit, higher_is_better=True):
+    return {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+
+def _best_rate(fn, repeat):
+    """fn() -> work units done; best units/s over `repeat` runs."""
+    best = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = fn()
+        best = max(best, n / (time.perf_counter() - t0))
+    return best
+
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+# ---------- simulator / envs ----------
+
+def bench_combate(turns=20_000, repeat=3, seed=0):
+    entrenadores = cargar_entrenadores()
+    t1, t2 = entrenadores[1], entrenadores[2]
+    rng = np.random.default_rng(seed)
+
+    def run():
+        done_turns = 0
+        while done_turns < turns:
+            c = Combate(t1, t2, headless=True, rng=rng)
+            ended = False
+            while not ended and done_turns < turns:
+                legal = c.acciones_legales_agente()
+                _, ended = c.step_rl(legal[int(rng.random() * len(legal))])
+                done_turns += 1
+        return done_turns
+    return {"combate.step_rl": _metric(_best_rate(run, repeat), "turns/s")}
+
+def _random_rollout(env, steps, rng):
+    obs, info = env.reset(seed=int(rng.integers(1_000_000)))
+    for _ in range(steps):
+        legal = np.flatnonzero(info["action_mask"])
+        obs, r, term, trunc, info = env.step(int(legal[int(rng.random() * len(legal))]))
+        if term or trunc:
+            obs, info = env.reset()
+    return steps
+
+def bench_env(steps=20_000, repeat=3, seed=0):
+    env = PokemonEnv(seed=seed)
+    rng = np.random.default_rng(seed)
+    return {"pokemon_env.step": _metric(_best_rate(lambda: _random_rollout(env, steps, rng), repeat), "steps/s")}
+
+def bench_bots(steps=2_000, repeat=2, seed=0):
+    """PokemonEnv with the search-based opponents (random agent); planning cost dominates."""
+    from bot_busqueda import BotExpectimax, BotMCTS
+    out = {}
+    for name, make in (("expectimax", BotExpectimax), ("mcts", lambda: BotMCTS(seed=seed))):
+        env = PokemonEnv(seed=seed, bot=make())
+        rng = np.random.default_rng(seed)
+        rate = _best_rate(lambda: _random_rollout(env, steps, rng), repeat)
+        out[f"pokemon_env.step[{name}]"] = _metric(rate, "steps/s")
+    return out
+
+def bench_vector_env(n_envs=256, steps=200, repeat=3, seed=0):
+    venv = VectorPokemonEnv(n_envs, seed=seed)
+    rng = np.random.default_rng(seed)
+
+    def run():
+        obs, info = venv.reset(seed=seed)
+        for _ in range(steps):
+            mask = info["action_mask"]
+            # random legal action per env (argmax of masked noise)
+            a = np.argmax(np.where(mask, rng.random(mask.shape), -1.0), axis=1)
+            obs, r, term, trunc, info = venv.step(a)
+        return steps * n_envs
+    return {f"vector_env.step[{n_envs}]": _metric(_best_rate(run, repeat), "env-steps/s")}
+
+def bench_env_construction(repeat=20):
+    PokemonEnv()  # warm the per-process dataset registry
+    warm = _best_time(PokemonEnv, repeat)
+
+    def cold():
+        limpiar_registro()  # next env re-reads the compiled dataset cache
+        PokemonEnv()
+    cold_t = _best_time(cold, max(3, repeat // 4))
+    return {"pokemon_env.init_warm": _metric(warm * 1e3, "ms", higher_is_better=False),
+            "pokemon_env.init_cold": _metric(cold_t * 1e3, "ms", higher_is_better=False)}
+
+# ---------- learners ----------
+
+def _transitions(n_states, n, seed):
+    rng = np.random.default_rng(seed)
+    s = rng.integers(0, n_states, n).tolist()
+    a = rng.integers(0, N_ACTIONS, n).tolist()
+    r = rng.normal(size=n).tolist()
+    s2 = rng.integers(0, n_states, n).tolist()
+    done = (rng.random(n) < 0.05).tolist()
+    return s, a, r, s2, done
+
+def bench_learners(updates=100_000, repeat=3, seed=0):
+    n_states = MixedRadixEncoder(5).n_states
+    s, a, r, s2, done = _transitions(n_states, updates, seed)
+    out = {}
+    for dense in (False, True):
+        tag = "dense" if dense else "dict"
+        q = TabularQLearner(N_ACTIONS, n_states=n_states if dense else None, seed=seed)
+        sarsa = TabularSarsaLearner(N_ACTIONS, n_states=n_states if dense else None, seed=seed)
+
+        def run_q():
+            upd = q.update
+            for i in range(updates):
+                upd(s[i], a[i], r[i], s2[i], done[i])
+            return updates
+
+        def run_sarsa():
+            upd = sarsa.update
+            for i in range(updates):
+                upd(s[i], a[i], r[i], s2[i], a[i], done[i])
+            return updates
+        out[f"tabular_q.update[{tag}]"] = _metric(_best_rate(run_q, repeat), "updates/s")
+        out[f"tabular_sarsa.update[{tag}]"] = _metric(_best_rate(run_sarsa, repeat), "updates/s")
+    return out
+
+# ---------- evaluation ----------
+
+def bench_evaluate_greedy(episodes=200, repeat=3, seed=0):
+    from rl_agents.evaluation import evaluate, make_eval_env
+    n_states = MixedRadixEncoder(5).n_states
+    agent = TabularQLearner(N_ACTIONS, n_states=n_states, seed=seed)
+    agent.Q.rows(np.arange(n_states))  # allocate the whole table
+    agent.Q.data[:] = np.random.default_rng(seed).normal(size=agent.Q.data.shape)
+    venv = make_eval_env(episodes)
+
+    def run():
+        evaluate(agent, episodes=episodes, seed=seed, venv=venv)
+        return episodes
+    return {"evaluate_greedy": _metric(_best_rate(run, repeat), "episodes/s")}
+
+# ---------- checkpoints ----------
+
+def bench_checkpoints(n_buckets_list=(5, 10, 20), repeat=3, seed=0):
+    """Save/load of a fully visited table for several state-space sizes, both formats."""
+    out = {}
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        for nb in n_buckets_list:
+            enc = MixedRadixEncoder(nb)
+            env = SimpleNamespace(encoder=enc, n_states=enc.n_states)
+            agent = TabularQLearner(N_ACTIONS, n_states=enc.n_states)
+            agent.Q.rows(np.arange(enc.n_states))
+            agent.Q.data[:] = rng.normal(size=agent.Q.data.shape)
+            agent.Q.visited[:] = True
+            agent.Q._n_visited = enc.n_states
+            for ext in (".pkl", ".qtab"):
+                path = os.path.join(tmp, f"q{nb}{ext}")
+                save_t = _best_time(lambda: save_checkpoint(agent, env, path), repeat)
+                target = TabularQLearner(N_ACTIONS, n_states=enc.n_states)
+                load_t = _best_time(lambda: load_checkpoint(target, env, path), repeat)
+                key = f"checkpoint{ext}[{enc.n_states} rows]"
+                out[key + ".save"] = _metric(save_t * 1e3, "ms", higher_is_better=False)
+                out[key + ".load"] = _metric(load_t * 1e3, "ms", higher_is_better=False)
+    return out
+
+# name -> (function, kwargs for --quick)
+BENCHMARKS = {
+    "combate": (bench_combate, {"turns": 3_000, "repeat": 2}),
+    "env": (bench_env, {"steps": 3_000, "repeat": 2}),
+    "bots": (bench_bots, {"steps": 300, "repeat": 1}),
+    "vector_env": (bench_vector_env, {"steps": 50, "repeat": 2}),
+    "env_construction": (bench_env_construction, {"repeat": 5}),
+    "learners": (bench_learners, {"updates": 20_000, "repeat": 2}),
+    "evaluate_greedy": (bench_evaluate_greedy, {"episodes": 40, "repeat": 2}),
+    "checkpoints": (bench_checkpoints, {"n_buckets_list": (5, 10), "repeat": 2}),
+}
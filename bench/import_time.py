@@ -0,0 +1,56 @@
+# bench/import_time.py
+"""
+Import-time budget for the modules a training/eval worker loads.
+
+Each target is imported in a fresh interpreter (like a spawn-started worker), several
+times, and the median wall time is compared with the budget. The run also fails if a
+target pulls in a module that belongs to the render/CSV path (PIL, pandas, ...).
+
+    python -m bench.import_time                  # default targets and budget
+    python -m bench.import_time --budget 0.4 --repeat 7
+"""
+import argparse, json, statistics, subprocess, sys
+
+TARGETS = ("rl_env.pokemon_env", "rl_env.vector_pokemon_env", "rl_agents.tabular_q")
+FORBIDDEN = ("PIL", "pandas", "matplotlib", "image_generator", "data")
+DEFAULT_BUDGET = 0.3  # seconds per target (median); gymnasium + numpy are most of it
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {target}
+dt = time.perf_counter() - t0
+print(json.dumps({{"seconds": dt, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+def measure(target: str, repeat: int = 5) -> dict:
+    """Median import time of target over `repeat` fresh interpreters + forbidden modules seen."""
+    times, loaded = [], set()
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(target=target, forbidden=FORBIDDEN)],
+                             check=True, capture_output=True, text=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        times.append(res["seconds"])
+        loaded.update(res["loaded"])
+    return {"target": target, "median_s": statistics.median(times), "min_s": min(times),
+            "forbidden_loaded": sorted(loaded)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=float, default=DEFAULT_BUDGET)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("targets", nargs="*", default=list(TARGETS))
+    args = ap.parse_args()
+
+    failed = False
+    for target in args.targets:
+        r = measure(target, args.repeat)
+        ok = r["median_s"] <= args.budget and not r["forbidden_loaded"]
+        failed |= not ok
+        extra = f"  loads {', '.join(r['forbidden_loaded'])}" if r["forbidden_loaded"] else ""
+        print(f"[{'ok' if ok else 'FAIL'}] {target:28s} median={r['median_s']*1000:7.1f} ms "
+              f"(min {r['min_s']*1000:.1f} ms, budget {args.budget*1000:.0f} ms){extra}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
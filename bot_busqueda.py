@@ -0,0 +1,248 @@
+# bot_busqueda.py
+"""
+Políticas del bot: la aleatoria de siempre y dos que planifican sobre estado_combate.
+
+Combate(..., bot=politica) y PokemonEnv(bot=politica) aceptan cualquier objeto con
+elegir(combate) -> índice del movimiento del activo del bot; bot=None es la política
+aleatoria original (mismas tiradas, mismos combates con la misma semilla).
+
+    BotExpectimax  expectimax con profundización iterativa: el bot maximiza, el agente
+                   juega uniforme entre sus acciones legales (movimientos y cambios) y
+                   los aciertos se promedian con su probabilidad exacta (desenlaces).
+    BotMCTS        UCT con transposiciones: estadísticas por estado, acción del agente
+                   y aciertos muestreados, rollouts aleatorios cortos.
+
+Ambos guardan lo calculado en una TablaTransposicion (LRU acotada) indexada por
+EstadoCombate.clave(), que se conserva entre decisiones y entre combates del mismo
+enfrentamiento, y aceptan un presupuesto por decisión: max_nodos (turnos simulados en
+expectimax, iteraciones en MCTS) y/o tiempo (segundos). El bot sólo elige movimiento: las reglas del combate no le dejan
+cambiar de pokémon salvo por K.O., y eso ya lo resuelve la transición.
+
+El valor de un estado es desde el punto de vista del bot: +1 si gana, -1 si pierde y,
+al cortar la búsqueda, la diferencia de vida restante (fracción) entre los dos equipos.
+"""
+import math
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from estado_combate import EstadoCombate, ReglasCombate, desenlaces, transicion
+
+
+class TablaTransposicion:
+    """Diccionario con capacidad máxima: al llenarse se descarta la entrada usada hace más tiempo."""
+    def __init__(self, capacidad: int = 200_000):
+        self.capacidad = capacidad
+        self._d = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        v = self._d.get(clave)
+        if v is None:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+            self._d.move_to_end(clave)
+        return v
+
+    def put(self, clave, valor):
+        self._d[clave] = valor
+        self._d.move_to_end(clave)
+        if len(self._d) > self.capacidad:
+            self._d.popitem(last=False)
+
+    def clear(self):
+        self._d.clear()
+
+    def __len__(self):
+        return len(self._d)
+
+
+def valor_heuristico(reglas: ReglasCombate, e: EstadoCombate) -> float:
+    """Valor para el bot: ±1 si el combate ha terminado, si no vida restante del bot - del agente (fracciones)."""
+    if not any(v > 0 for v in e.vidas1):
+        return 1.0
+    if not any(v > 0 for v in e.vidas2):
+        return -1.0
+    # el activo lleva su vida actual; el resto de slots, la guardada (0 = debilitado)
+    f1 = sum(v / h for i, (v, h) in enumerate(zip(e.vidas1, reglas.hp1)) if i != e.activo1)
+    f2 = sum(v / h for i, (v, h) in enumerate(zip(e.vidas2, reglas.hp2)) if i != e.activo2)
+    f1 += e.vida1 / reglas.hp1[e.activo1]
+    f2 += e.vida2 / reglas.hp2[e.activo2]
+    return f2 / reglas.n2 - f1 / reglas.n1
+
+
+class _SinPresupuesto(Exception):
+    pass
+
+
+class PoliticaBot(ABC):
+    """Interfaz de las políticas del bot."""
+    @abstractmethod
+    def elegir(self, combate) -> int:
+        """Índice del movimiento del activo del bot en el turno actual de combate."""
+
+
+class BotAleatorio(PoliticaBot):
+    """Movimiento uniforme con las tiradas del propio combate (igual que bot=None)."""
+    def elegir(self, combate) -> int:
+        return int(combate.aleatorio.uniforme() * len(combate.pokemon_activo_t2.movimientos))
+
+
+class _BotBusqueda(PoliticaBot):
+    """Reglas del enfrentamiento, tabla de transposición y presupuesto compartidos."""
+    def __init__(self, max_nodos: Optional[int], tiempo: Optional[float], tam_tabla: int):
+        self.max_nodos = max_nodos
+        self.tiempo = tiempo
+        self.tabla = TablaTransposicion(tam_tabla)
+        self.reglas: Optional[ReglasCombate] = None
+        self._equipos = None
+        self.nodos = 0          # turnos simulados en la última decisión
+
+    def elegir(self, combate) -> int:
+        equipos = (tuple(p.name for p in combate.t1.pokemons), tuple(p.name for p in combate.t2.pokemons))
+        if equipos != self._equipos:
+            # otro enfrentamiento: las claves de la tabla ya no valen
+            self.reglas = ReglasCombate(combate.t1, combate.t2)
+            self._equipos = equipos
+            self.tabla.clear()
+        return self.elegir_estado(combate.snapshot())
+
+    @abstractmethod
+    def elegir_estado(self, e: EstadoCombate) -> int:
+        """Índice del movimiento del activo del bot en el estado e."""
+
+    def _limite(self) -> float:
+        return time.perf_counter() + self.tiempo if self.tiempo is not None else math.inf
+
+
+class BotExpectimax(_BotBusqueda):
+    """
+    Expectimax a `profundidad` turnos con profundización iterativa: si el presupuesto se
+    agota a media iteración se usa la última profundidad completa (la primera siempre
+    se completa). La tabla guarda el valor de cada (estado, profundidad) ya calculado.
+    """
+    def __init__(self, profundidad: int = 2, max_nodos: Optional[int] = 2_000,
+                 tiempo: Optional[float] = None, tam_tabla: int = 200_000):
+        super().__init__(max_nodos, tiempo, tam_tabla)
+        self.profundidad = profundidad
+        self.profundidad_alcanzada = 0
+
+    def elegir_estado(self, e: EstadoCombate) -> int:
+        self.nodos = 0
+        self._fin = self._limite()
+        movs = range(self.reglas.n_movs2[e.activo2])
+        mejor = 0
+        self.profundidad_alcanzada = 0
+        for prof in range(1, self.profundidad + 1):
+            self._limitado = prof > 1
+            try:
+                valores = [self._valor_mov(e, m, prof) for m in movs]
+            except _SinPresupuesto:
+                break
+            mejor = max(movs, key=valores.__getitem__)
+            self.profundidad_alcanzada = prof
+        return mejor
+
+    def _valor(self, e: EstadoCombate, prof: int) -> float:
+        """Valor de un nodo de decisión del bot (el combate no ha terminado)."""
+        if prof == 0:
+            return valor_heuristico(self.reglas, e)
+        clave = (e.clave(), prof)
+        v = self.tabla.get(clave)
+        if v is None:
+            v = max(self._valor_mov(e, m, prof) for m in range(self.reglas.n_movs2[e.activo2]))
+            self.tabla.put(clave, v)
+        return v
+
+    def _valor_mov(self, e: EstadoCombate, mov: int, prof: int) -> float:
+        """Esperanza del valor si el bot usa mov: agente uniforme y aciertos con su probabilidad."""
+        if self._limitado and (self.max_nodos is not None and self.nodos >= self.max_nodos
+                               or time.perf_counter() >= self._fin):
+            raise _SinPresupuesto
+        R = self.reglas
+        acciones = R.acciones_legales(e)
+        total = 0.0
+        for a in acciones:
+            for p, s, _, done in desenlaces(R, e, a, mov):
+                self.nodos += 1
+                total += p * (valor_heuristico(R, s) if done else self._valor(s, prof - 1))
+        return total / len(acciones)
+
+
+class BotMCTS(_BotBusqueda):
+    """
+    UCT sobre los movimientos del bot con una entrada de la tabla por estado: [visitas por
+    movimiento, valor acumulado por movimiento]. Cada iteración baja eligiendo por UCB1,
+    muestrea la acción del agente (uniforme) y las tiradas, y al llegar a un estado nuevo
+    juega `prof_rollout` turnos al azar y puntúa con valor_heuristico.
+    max_nodos cuenta iteraciones.
+    """
+    def __init__(self, max_nodos: Optional[int] = 200, tiempo: Optional[float] = None,
+                 c: float = 1.0, prof_rollout: int = 3, prof_max: int = 20,
+                 tam_tabla: int = 200_000, seed: Optional[int] = None):
+        super().__init__(max_nodos, tiempo, tam_tabla)
+        if max_nodos is None and tiempo is None:
+            raise ValueError("BotMCTS necesita max_nodos o tiempo")
+        self.c = c
+        self.prof_rollout = prof_rollout
+        self.prof_max = prof_max
+        self.rng = random.Random(seed)
+
+    def elegir_estado(self, e: EstadoCombate) -> int:
+        fin = self._limite()
+        self.nodos = 0
+        while (self.max_nodos is None or self.nodos < self.max_nodos) and time.perf_counter() < fin:
+            self._iteracion(e)
+            self.nodos += 1
+        nodo = self.tabla.get(e.clave())
+        if nodo is None:
+            return 0
+        visitas = nodo[0]
+        return max(range(len(visitas)), key=visitas.__getitem__)
+
+    def _iteracion(self, e: EstadoCombate):
+        R, rng = self.reglas, self.rng
+        camino = []
+        valor = None
+        for _ in range(self.prof_max):
+            clave = e.clave()
+            nodo = self.tabla.get(clave)
+            if nodo is None:
+                n = R.n_movs2[e.activo2]
+                self.tabla.put(clave, [[0] * n, [0.0] * n])
+                valor = self._rollout(e)
+                break
+            mov = self._ucb(nodo)
+            camino.append((nodo, mov))
+            acciones = R.acciones_legales(e)
+            e, _, done = transicion(R, e, acciones[int(rng.random() * len(acciones))], rng, mov)
+            if done:
+                valor = valor_heuristico(R, e)
+                break
+        if valor is None:
+            valor = valor_heuristico(R, e)
+        for nodo, mov in camino:
+            nodo[0][mov] += 1
+            nodo[1][mov] += valor
+
+    def _ucb(self, nodo) -> int:
+        visitas, suma = nodo
+        for m, n in enumerate(visitas):
+            if n == 0:
+                return m
+        log_n = math.log(sum(visitas))
+        return max(range(len(visitas)),
+                   key=lambda m: suma[m] / visitas[m] + self.c * math.sqrt(log_n / visitas[m]))
+
+    def _rollout(self, e: EstadoCombate) -> float:
+        R, rng = self.reglas, self.rng
+        for _ in range(self.prof_rollout):
+            acciones = R.acciones_legales(e)
+            e, _, done = transicion(R, e, acciones[int(rng.random() * len(acciones))], rng)
+            if done:
+                break
+        return valor_heuristico(R, e)
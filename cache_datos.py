@@ -0,0 +1,151 @@
+"""
+Caché compilada del dataset (entrenadores + pokémon + movimientos).
+
+data.crear_todos_los_entrenadores lee cuatro CSV con pandas y recorre las filas con
+iterrows; aquí se guarda el resultado ya construido en un pickle
+(assets/cache/dataset.pkl) que se carga sin pandas. Al compilar también se calcula la
+tabla de daño del roster (tabla_danio.TablaDanio), que se guarda con los objetos y se
+registra al cargar; cada Pokemon guarda su fila en idx_roster.
+
+La caché es válida mientras no cambien los CSV de origen: primero se comparan
+tamaño y mtime, y si no coinciden (p. ej. tras un git checkout) se compara el sha256
+del contenido antes de regenerarla.
+
+cargar_entrenadores() además memoriza el resultado en el proceso: construir N
+entornos parsea los datos una sola vez. Los objetos devueltos son compartidos y se
+tratan como de solo lectura (el estado del combate vive en Combate).
+"""
+import hashlib
+import os
+import pickle
+from typing import Dict, List, Optional
+
+from classes import Entrenador, Pokemon
+import tabla_danio
+
+RUTA_CACHE = "assets/cache/dataset.pkl"
+VERSION_CACHE = 2
+FUENTES = (
+    "assets/csv/pokemon.csv",          # origen de pokemon_limpio.csv
+    "assets/csv/pokemon_limpio.csv",
+    "assets/csv/movs.csv",
+    "assets/csv/pokemon_movs.csv",
+    "assets/csv/trainer_pokemon.csv",
+)
+
+_registro: Optional[Dict] = None   # {"entrenadores", "roster", "tabla_danio"}
+
+
+def _sha256(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _firma(ruta: str, con_hash: bool = False) -> Dict:
+    if not os.path.exists(ruta):
+        return {"existe": False}
+    st = os.stat(ruta)
+    firma = {"existe": True, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if con_hash:
+        firma["sha256"] = _sha256(ruta)
+    return firma
+
+
+def _cache_valida(cache: Dict) -> bool:
+    if cache.get("version") != VERSION_CACHE or tuple(cache.get("fuentes", {})) != FUENTES:
+        return False
+    for ruta, guardada in cache["fuentes"].items():
+        actual = _firma(ruta)
+        if actual["existe"] != guardada["existe"]:
+            return False
+        if not actual["existe"]:
+            continue
+        if (actual["size"], actual["mtime_ns"]) == (guardada["size"], guardada["mtime_ns"]):
+            continue
+        # mtime distinto no implica contenido distinto: se decide por el hash
+        if actual["size"] != guardada["size"] or _sha256(ruta) != guardada["sha256"]:
+            return False
+    return True
+
+
+def _leer_cache(ruta: str) -> Optional[Dict]:
+    try:
+        with open(ruta, "rb") as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    return cache["dataset"] if isinstance(cache, dict) and _cache_valida(cache) else None
+
+
+def _escribir_cache(ruta: str, dataset: Dict):
+    cache = {
+        "version": VERSION_CACHE,
+        "fuentes": {r: _firma(r, con_hash=True) for r in FUENTES},
+        "dataset": dataset,
+    }
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f"{ruta}.{os.getpid()}.tmp"   # varios procesos pueden regenerarla a la vez
+    with open(tmp, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, ruta)
+
+
+def compilar_dataset(ruta: str = RUTA_CACHE) -> Dict:
+    """Parsea los CSV (con pandas), precalcula la tabla de daño y reescribe la caché."""
+    # import diferido: pandas solo hace falta aquí
+    from data import crear_todos_los_pokemon, crear_todos_los_entrenadores
+    roster = crear_todos_los_pokemon()
+    for i, p in enumerate(roster):
+        p.idx_roster = i
+    dataset = {
+        "entrenadores": crear_todos_los_entrenadores(roster),  # comparten los objetos del roster
+        "roster": roster,
+        "tabla_danio": tabla_danio.TablaDanio.construir(roster),
+    }
+    _escribir_cache(ruta, dataset)
+    return dataset
+
+
+def cargar_dataset(ruta: str = RUTA_CACHE) -> Dict:
+    """
+    Dataset compilado {"entrenadores", "roster", "tabla_danio"} desde la caché binaria
+    (regenerada si los CSV cambiaron), memorizado para todo el proceso.
+    """
+    global _registro
+    if _registro is None:
+        dataset = _leer_cache(ruta)
+        if dataset is None:
+            dataset = compilar_dataset(ruta)
+        tabla_danio.registrar(dataset["tabla_danio"])
+        _registro = dataset
+    return _registro
+
+
+def cargar_entrenadores(ruta: str = RUTA_CACHE) -> List[Entrenador]:
+    """Mismo resultado que data.crear_todos_los_entrenadores(), desde el dataset compilado."""
+    return cargar_dataset(ruta)["entrenadores"]
+
+
+def cargar_roster(ruta: str = RUTA_CACHE) -> List[Pokemon]:
+    """Todos los pokémon (orden de crear_todos_los_pokemon = filas de la tabla de daño)."""
+    return cargar_dataset(ruta)["roster"]
+
+
+def cargar_tabla_danio(ruta: str = RUTA_CACHE) -> tabla_danio.TablaDanio:
+    return cargar_dataset(ruta)["tabla_danio"]
+
+
+def limpiar_registro():
+    """Olvida el dataset memorizado (la próxima llamada vuelve a leer la caché)."""
+    global _registro
+    _registro = None
+    tabla_danio.registrar(None)
+
+
+if __name__ == "__main__":
+    dataset = compilar_dataset()
+    print(f"Caché escrita en '{RUTA_CACHE}' ({len(dataset['entrenadores'])} entrenadores, "
+          f"{len(dataset['roster'])} pokémon).")
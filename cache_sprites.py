@@ -0,0 +1,109 @@
+# cache_sprites.py
+"""
+Caché de sprites y fuentes para image_generator (una por proceso: CACHE).
+
+Cada sprite se decodifica, se voltea y se redimensiona una sola vez por
+(ruta, tamaño, espejo) y se guarda ya en RGBA; dibujar un turno pasa a ser sólo pegar
+imágenes. La caché es una LRU acotada por bytes (ancho x alto x 4): max_bytes=None no
+expulsa nunca (el roster cabe de sobra), un límite pequeño sirve para procesos con
+muchos roster o poca memoria.
+
+construir_atlas() decodifica de una vez una lista de sprites y los empaqueta en una
+sola imagen RGBA (por filas). Mientras exista, un fallo de la LRU recorta del atlas en
+vez de volver a leer el PNG, así que con una LRU pequeña el disco no se vuelve a tocar.
+Las fuentes (pocas) se cargan una vez y no se expulsan.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from PIL import Image, ImageFont
+
+Clave = Tuple[str, Tuple[int, int], bool]
+
+ANCHO_MAX_ATLAS = 4096
+
+
+def cargar_sprite(ruta: str, tamanio: Tuple[int, int], espejo: bool = False) -> Image.Image:
+    """Lee el PNG y lo deja como lo pega image_generator: RGBA, volteado si espejo, redimensionado."""
+    img = Image.open(ruta).convert("RGBA")
+    if espejo:
+        img = img.transpose(Image.FLIP_LEFT_RIGHT)
+    return img.resize(tamanio)
+
+
+class CacheSprites:
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self._sprites: "OrderedDict[Clave, Image.Image]" = OrderedDict()
+        self._fuentes: Dict[Tuple[str, int], ImageFont.ImageFont] = {}
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.atlas: Optional[Image.Image] = None
+        self._cajas: Dict[Clave, Tuple[int, int, int, int]] = {}
+
+    def sprite(self, ruta: str, tamanio: Tuple[int, int], espejo: bool = False) -> Image.Image:
+        """Sprite listo para pegar. No modificar la imagen devuelta: es compartida."""
+        clave = (ruta, tuple(tamanio), espejo)
+        img = self._sprites.get(clave)
+        if img is not None:
+            self.aciertos += 1
+            self._sprites.move_to_end(clave)
+            return img
+        self.fallos += 1
+        caja = self._cajas.get(clave)
+        img = self.atlas.crop(caja) if caja is not None else cargar_sprite(ruta, clave[1], espejo)
+        self._guardar(clave, img)
+        return img
+
+    def _guardar(self, clave: Clave, img: Image.Image):
+        self._sprites[clave] = img
+        self.bytes += img.width * img.height * 4
+        if self.max_bytes is not None:
+            # se conserva siempre el último aunque por sí solo supere el límite
+            while self.bytes > self.max_bytes and len(self._sprites) > 1:
+                _, viejo = self._sprites.popitem(last=False)
+                self.bytes -= viejo.width * viejo.height * 4
+
+    def fuente(self, ruta: str, tamanio: int):
+        """ImageFont.truetype cargada una vez; si el .ttf no se puede abrir, la fuente por defecto."""
+        clave = (ruta, tamanio)
+        f = self._fuentes.get(clave)
+        if f is None:
+            try:
+                f = ImageFont.truetype(ruta, tamanio)
+            except IOError:
+                f = ImageFont.load_default()
+            self._fuentes[clave] = f
+        return f
+
+    def construir_atlas(self, peticiones: Iterable[Clave]) -> Image.Image:
+        """Empaqueta los sprites (ruta, tamaño, espejo) en un atlas RGBA y lo usa como respaldo de la LRU."""
+        claves = list(dict.fromkeys((r, tuple(t), e) for r, t, e in peticiones))
+        # filas de altura decreciente: poco hueco con los pocos tamaños que se usan
+        claves.sort(key=lambda c: -c[1][1])
+        cajas, x, y, alto_fila, ancho = {}, 0, 0, 0, 0
+        for c in claves:
+            w, h = c[1]
+            if x + w > ANCHO_MAX_ATLAS and x > 0:
+                x, y, alto_fila = 0, y + alto_fila, 0
+            cajas[c] = (x, y, x + w, y + h)
+            x += w
+            alto_fila = max(alto_fila, h)
+            ancho = max(ancho, x)
+        atlas = Image.new("RGBA", (max(ancho, 1), max(y + alto_fila, 1)), (0, 0, 0, 0))
+        for c, caja in cajas.items():
+            atlas.paste(cargar_sprite(*c), caja[:2])
+        self.atlas, self._cajas = atlas, cajas
+        return atlas
+
+    def limpiar(self):
+        """Vacía sprites, fuentes y atlas (p. ej. si cambian los PNG en disco)."""
+        self._sprites.clear()
+        self._fuentes.clear()
+        self._cajas = {}
+        self.atlas = None
+        self.bytes = 0
+
+
+# caché del proceso
+CACHE = CacheSprites()
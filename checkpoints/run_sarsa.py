@@ -1,8 +1,9 @@
-import pickle
+import os, sys
 
-ruta_archivo = 'checkpoints/best_sarsa_agent.pkl'
+# allow "python checkpoints/run_sarsa.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.checkpoint import describe_checkpoint
 
-with open(ruta_archivo, 'rb') as archivo:
-    datos = pickle.load(archivo)
+ruta_archivo = sys.argv[1] if len(sys.argv) > 1 else 'checkpoints/best_sarsa_agent.pkl'
 
-print(datos)
\ No newline at end of file
+print(describe_checkpoint(ruta_archivo))
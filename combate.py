@@ -1,19 +1,74 @@
 import time
-from PIL import Image
+from functools import lru_cache
+from time import perf_counter_ns
+from typing import Optional
+import numpy as np
 
 # --- Importaciones de tus otros archivos ---
-from data import crear_todos_los_entrenadores
+# PIL/image_generator (render) y data (pandas) se importan solo donde se usan, para que
+# el entorno de entrenamiento (rl_env) cargue este módulo sin esas dependencias.
 from classes import Pokemon, Entrenador, Movimiento
 from danio import calcular_danio, ko
+from estado_combate import EstadoCombate
 from reward import calcular_reward_turno
-from image_generator import crear_imagen_combate # <<< NUEVA IMPORTACIÓN
+import tabla_danio
 from types import SimpleNamespace
 
+# Movimientos "ficticios" para la reward (constantes: no se crean en cada turno)
+_MOV_CAMBIO = SimpleNamespace(name="Cambio")
+_MOV_BOT_NONE = SimpleNamespace(name="(bot_none)")
+# Orden de resolución de ataques: True = ataca el agente, False = ataca el bot
+_ORDEN_AGENTE_PRIMERO = (True, False)
+_ORDEN_BOT_PRIMERO = (False, True)
+# Acción 10+slot = cambiar al slot (bit 10+slot de la máscara de acciones legales)
+ACCION_CAMBIO = 10
+
+
+@lru_cache(maxsize=None)
+def acciones_de_mascara(bits: int) -> tuple:
+    """Índices de acción de una máscara de bits (hay pocas máscaras distintas: se memorizan)."""
+    return tuple(i for i in range(bits.bit_length()) if bits >> i & 1)
+
+
+class ReservaAleatoria:
+    """
+    Números aleatorios pre-sorteados por bloques desde un np.random.Generator.
+    El combate consume tiradas de precisión (1..100) y uniformes [0, 1) para el bot
+    sin llamar al generador en cada evento: una llamada vectorizada rellena el bloque.
+    Cada Combate tiene la suya, así que varios combates pueden ir en hilos distintos.
+    """
+    def __init__(self, rng: np.random.Generator, tam_bloque: int = 64):
+        self.rng = rng
+        self.tam_bloque = tam_bloque
+        self._tiradas = []
+        self._uniformes = []
+
+    def tirada(self) -> int:
+        if not self._tiradas:
+            self._tiradas = self.rng.integers(1, 101, size=self.tam_bloque).tolist()
+        return self._tiradas.pop()
+
+    def uniforme(self) -> float:
+        if not self._uniformes:
+            self._uniformes = self.rng.random(self.tam_bloque).tolist()
+        return self._uniformes.pop()
+
 class Combate:
-    def __init__(self, entrenador1: Entrenador, entrenador2: Entrenador, *, interactive: bool = False):
+    def __init__(self, entrenador1: Entrenador, entrenador2: Entrenador, *, interactive: bool = False,
+                 headless: bool = False, rng: Optional[np.random.Generator] = None, bot=None):
         self.t1 = entrenador1
         self.t2 = entrenador2
         self.interactive = interactive
+        # headless: modo entrenamiento, no se construyen mensajes de log ni se escribe por stdout
+        self.headless = headless
+        # generador propio: con la misma semilla el combate se repite exactamente
+        self.aleatorio = ReservaAleatoria(rng if rng is not None else np.random.default_rng())
+        # instrumentación opcional (rl_env.metrics.StepMetrics); None = desactivada
+        self.metrics = None
+        # política del bot (bot_busqueda.PoliticaBot: elegir(combate) -> índice); None = al azar
+        self.bot = bot
+        # tabla de daño precalculada del roster (None si estos pokémon no vienen del dataset compilado)
+        self.tabla = tabla_danio.tabla_para(self.t1.pokemons + self.t2.pokemons)
         # track if the agent MUST switch (active fainted)
         self.agent_must_switch = False
         self.vidas_equipo_t1 = {p.name: p.hp for p in self.t1.pokemons}
@@ -24,8 +79,41 @@ class Combate:
         self.vida_actual_t2 = self.vidas_equipo_t2[self.pokemon_activo_t2.name]
         self.pokemon_left_t1 = len(self.t1.pokemons)
         self.pokemon_left_t2 = len(self.t2.pokemons)
+        # slot de cada pokémon (snapshot/restore trabajan con índices, no con objetos)
+        self._slot_t1 = {p.name: i for i, p in enumerate(self.t1.pokemons)}
+        self._slot_t2 = {p.name: i for i, p in enumerate(self.t2.pokemons)}
         self.turno = 0
         self.log_del_turno = [] # <<< NUEVO: para guardar mensajes
+        # (mov. del bot, daño agente, daño bot, acierto agente, acierto bot) del último step_rl
+        self.ultimo_turno = None
+        self._ultimo_acierto = None
+        # acciones legales del agente como máscara de bits (bit i = acción i legal);
+        # sólo se recalcula al cambiar de pokémon o tras un K.O. del agente
+        self.mascara_legal = 0
+        self._actualizar_mascara()
+
+    def snapshot(self) -> EstadoCombate:
+        """Estado del combate como tupla inmutable (ver estado_combate). No incluye el generador ni el log."""
+        return EstadoCombate(
+            self._slot_t1[self.pokemon_activo_t1.name], self._slot_t2[self.pokemon_activo_t2.name],
+            self.vida_actual_t1, self.vida_actual_t2,
+            tuple([self.vidas_equipo_t1[p.name] for p in self.t1.pokemons]),
+            tuple([self.vidas_equipo_t2[p.name] for p in self.t2.pokemons]),
+            self.turno,
+        )
+
+    def restore(self, estado: EstadoCombate):
+        """Vuelve al estado de un snapshot() (de este combate o de estado_combate.transicion)."""
+        self.pokemon_activo_t1 = self.t1.pokemons[estado.activo1]
+        self.pokemon_activo_t2 = self.t2.pokemons[estado.activo2]
+        self.vida_actual_t1, self.vida_actual_t2 = estado.vida1, estado.vida2
+        self.vidas_equipo_t1 = {p.name: v for p, v in zip(self.t1.pokemons, estado.vidas1)}
+        self.vidas_equipo_t2 = {p.name: v for p, v in zip(self.t2.pokemons, estado.vidas2)}
+        self.pokemon_left_t1 = estado.left1
+        self.pokemon_left_t2 = estado.left2
+        self.turno = estado.turno
+        self.agent_must_switch = False
+        self._actualizar_mascara()
 
     def _agregar_al_log(self, mensaje):
         """Añade un mensaje al log del turno."""
@@ -67,6 +155,7 @@ class Combate:
                     continue
                 self.pokemon_activo_t1 = nuevo_pokemon
                 self.vida_actual_t1 = self.vidas_equipo_t1[nuevo_pokemon.name]
+                self._actualizar_mascara()
                 self._agregar_al_log(f"\n¡{self.t1.name} saca a {self.pokemon_activo_t1.name}!")
                 return True
             except (ValueError, IndexError): print("Selección no válida.")
@@ -82,7 +171,8 @@ class Combate:
                 # Lo establece como el nuevo Pokémon activo
                 self.pokemon_activo_t1 = pokemon
                 self.vida_actual_t1 = self.vidas_equipo_t1[pokemon.name]
-                self._agregar_al_log(f"\n¡{self.t1.name} saca a {self.pokemon_activo_t1.name}!")
+                if not self.headless:
+                    self._agregar_al_log(f"\n¡{self.t1.name} saca a {self.pokemon_activo_t1.name}!")
                 return True # Cambio exitoso
         
         # Esto no debería ocurrir si se llama después de chequear pokemon_left > 0
@@ -92,14 +182,30 @@ class Combate:
         """
         Política simple para el bot: elige un movimiento al azar entre los disponibles.
         """
-        from random import choice
-        return choice(self.pokemon_activo_t2.movimientos)
+        return self.pokemon_activo_t2.movimientos[self._indice_mov_bot()]
+
+    def _indice_mov_bot(self) -> int:
+        if self.bot is not None:
+            return self.bot.elegir(self)
+        return int(self.aleatorio.uniforme() * len(self.pokemon_activo_t2.movimientos))
     
-    def ejecutar_ataque(self, atacante, defensor, mov):
+    def ejecutar_ataque(self, atacante, defensor, mov, idx_mov=None):
+        tirada = self.aleatorio.tirada()
+        self._ultimo_acierto = mov.precision >= tirada
+        if self.metrics is not None and mov.precision < tirada:
+            self.metrics.count("misses")
+        if self.headless:
+            t = self.tabla
+            if t is not None and idx_mov is not None:
+                # una lectura de la tabla precalculada + la comparación de precisión
+                if t.precision_l[atacante.idx_roster][idx_mov] < tirada:
+                    return 0
+                return t.danio_l[atacante.idx_roster][defensor.idx_roster][idx_mov]
+            return calcular_danio(atacante, defensor, mov, verbose=False, tirada=tirada)
         self._agregar_al_log(f"\n{atacante.name} utiliza {mov.name}...")
         # <<< CAMBIO: danio.py ya no debe imprimir. Asumimos que devuelve (daño, [mensajes])
         # Si danio.py sigue imprimiendo, esos mensajes no aparecerán en la imagen.
-        danio_calculado = calcular_danio(atacante, defensor, mov)
+        danio_calculado = calcular_danio(atacante, defensor, mov, tirada=tirada)
         
         if danio_calculado > 0:
             porcentaje_danio = (danio_calculado / defensor.hp) * 100 if defensor.hp > 0 else 0
@@ -108,9 +214,14 @@ class Combate:
 
     def manejar_debilitado(self, num_entrenador_debilitado):
         if num_entrenador_debilitado == 1:
-            self._agregar_al_log(f"\n¡{self.pokemon_activo_t1.name} ha sido debilitado!")
+            if not self.headless:
+                self._agregar_al_log(f"\n¡{self.pokemon_activo_t1.name} ha sido debilitado!")
             self.vidas_equipo_t1[self.pokemon_activo_t1.name] = 0
             self.pokemon_left_t1 -= 1
+            if self.metrics is not None:
+                self.metrics.count("kos_taken")
+                if self.pokemon_left_t1 > 0:
+                    self.metrics.count("forced_switches")
             if self.pokemon_left_t1 > 0:
                 if self.interactive:
                     # Si estamos en modo interactivo, preguntamos al usuario
@@ -118,15 +229,20 @@ class Combate:
                 else:
                     # Si no, el agente elige automáticamente
                     self._elegir_siguiente_pokemon_automatico()
+            self._actualizar_mascara()
         else:
-            self._agregar_al_log(f"\n¡{self.pokemon_activo_t2.name} ha sido debilitado!")
+            if not self.headless:
+                self._agregar_al_log(f"\n¡{self.pokemon_activo_t2.name} ha sido debilitado!")
             self.vidas_equipo_t2[self.pokemon_activo_t2.name] = 0
             self.pokemon_left_t2 -= 1
+            if self.metrics is not None:
+                self.metrics.count("kos_dealt")
             if self.pokemon_left_t2 > 0:
                 siguiente_pokemon_bot = next(p for p in self.t2.pokemons if self.vidas_equipo_t2[p.name] > 0)
                 self.pokemon_activo_t2 = siguiente_pokemon_bot
                 self.vida_actual_t2 = self.vidas_equipo_t2[siguiente_pokemon_bot.name]
-                self._agregar_al_log(f"{self.t2.name} saca a {siguiente_pokemon_bot.name}!")
+                if not self.headless:
+                    self._agregar_al_log(f"{self.t2.name} saca a {siguiente_pokemon_bot.name}!")
 
     def _agregar_estado_final_al_log(self):
         """Añade el estado de salud final al log del turno."""
@@ -156,8 +272,8 @@ class Combate:
             "our_team_left": self.pokemon_left_t1,
             "opp_team_left": self.pokemon_left_t2,
             # Slots disponibles para cambiar (índices del equipo t1 con vida>0 y no el activo)
-            "switch_slots_alive": [i for i,p in enumerate(self.t1.pokemons)
-                                if self.vidas_equipo_t1[p.name] > 0 and p.name != a.name],
+            "switch_slots_alive": [i - ACCION_CAMBIO for i in acciones_de_mascara(self.mascara_legal)
+                                   if i >= ACCION_CAMBIO],
             # Cuántos movimientos tiene el activo del agente ahora mismo
             "n_moves": len(a.movimientos)
         }
@@ -168,16 +284,21 @@ class Combate:
         - 0..3: usar movimiento i (si existe)
         - 10+idx_equipo: cambiar al pokémon del equipo con ese índice (si está vivo y no es el activo)
         """
+        return list(acciones_de_mascara(self.mascara_legal))
+
+    def _actualizar_mascara(self):
+        """
+        Recalcula self.mascara_legal. Hay que llamarlo cuando cambian el activo del agente,
+        las vidas de su equipo o agent_must_switch (cambio, K.O., cambio forzado).
+        """
         a = self.pokemon_activo_t1
-        acc = []
-        # If not forced to switch, include moves
-        if not self.agent_must_switch:
-            acc.extend(range(len(a.movimientos)))  # 0..n_moves-1
+        # If not forced to switch, include moves 0..n_moves-1
+        bits = 0 if self.agent_must_switch else (1 << len(a.movimientos)) - 1
         # switches
         for i, p in enumerate(self.t1.pokemons):
             if self.vidas_equipo_t1[p.name] > 0 and p.name != a.name:
-                acc.append(10 + i)  # 10+slot = acción de cambio
-        return acc
+                bits |= 1 << (ACCION_CAMBIO + i)
+        self.mascara_legal = bits
 
     def _aplicar_cambio_agente(self, idx_equipo):
         """Cambia el pokémon activo del agente al slot idx_equipo (si está vivo)."""
@@ -186,7 +307,9 @@ class Combate:
             return False
         self.pokemon_activo_t1 = nuevo
         self.vida_actual_t1 = self.vidas_equipo_t1[nuevo.name]
-        self._agregar_al_log(f"\n¡{self.t1.name} saca a {self.pokemon_activo_t1.name}!")
+        self._actualizar_mascara()
+        if not self.headless:
+            self._agregar_al_log(f"\n¡{self.t1.name} saca a {self.pokemon_activo_t1.name}!")
         return True
 
     def is_done(self) -> bool:
@@ -206,7 +329,12 @@ class Combate:
         Devuelve: (reward_turno, done_bool)
         """
         self.turno += 1
-        self.log_del_turno = []  # limpiamos el log de este turno
+        if not self.headless:
+            self.log_del_turno = []  # limpiamos el log de este turno
+        m = self.metrics  # instrumentación por fases (None = sin coste)
+        if m is not None:
+            m.count("turns")
+            t0 = perf_counter_ns()
 
         # Guardamos info del inicio del turno (para la reward)
         oponente_al_inicio = self.pokemon_activo_t2
@@ -215,6 +343,15 @@ class Combate:
 
         danio_turno_jugador = 0.0
         danio_turno_bot     = 0.0
+        acierto_jugador = acierto_bot = None  # None = no llegó a atacar
+
+        # --- Movimiento del bot: se elige antes de aplicar la acción del agente, para que
+        # una política que busca (bot_busqueda) no vea el cambio del agente ---
+        idx_bot = self._indice_mov_bot()
+        mov_bot = self.pokemon_activo_t2.movimientos[idx_bot]
+        if m is not None:
+            t0 = m.lap("bot_move", t0)
+
         # Agente: mover o cambiar
         mov_jugador = None
         # ---- Acción del agente: mover o cambiar ----
@@ -227,46 +364,53 @@ class Combate:
             a = self.pokemon_activo_t1
             if 0 <= agent_action < len(a.movimientos):
                 mov_jugador = a.movimientos[agent_action]
-
-        # --- Movimiento del bot (misma política que antes) ---
-        mov_bot = self.elegir_movimiento_bot()
+        if m is not None:
+            t0 = m.lap("agent_action", t0)
 
         # --- Orden de turnos por Speed (igual que simular) ---
-        ataques = []
-        if mov_jugador is not None:
-            ataques.append({'atacante': self.pokemon_activo_t1, 'defensor': self.pokemon_activo_t2, 'mov': mov_jugador})
-        # Si hubo cambio, el agente no ataca este turno → su ataque no se encola
-        ataques.append({'atacante': self.pokemon_activo_t2, 'defensor': self.pokemon_activo_t1, 'mov': mov_bot})
-
+        # Si hubo cambio, el agente no ataca este turno → sólo ataca el bot.
         # Si ambos atacan, decide por speed (si empatan, va primero el agente, como en README)
-        if len(ataques) == 2 and self.pokemon_activo_t1.speed < self.pokemon_activo_t2.speed:
-            ataques.reverse()
+        if mov_jugador is None or self.pokemon_activo_t1.speed < self.pokemon_activo_t2.speed:
+            orden = _ORDEN_BOT_PRIMERO
+        else:
+            orden = _ORDEN_AGENTE_PRIMERO
 
         vida_oponente_ko_param, vida_jugador_ko_param = None, None
 
         # --- Resolver ataques en orden (reutiliza ejecutar_ataque y manejar_debilitado) ---
-        for ataque in ataques:
-            danio = 0.0
-            if ataque['mov'] is not None:  # puede ser None si el agente cambió
-                danio = self.ejecutar_ataque(ataque['atacante'], ataque['defensor'], ataque['mov'])
-
-            if ataque['atacante'] == self.pokemon_activo_t1:
+        for ataca_agente in orden:
+            if ataca_agente:
+                if mov_jugador is None:  # el agente cambió
+                    continue
+                danio = self.ejecutar_ataque(self.pokemon_activo_t1, self.pokemon_activo_t2, mov_jugador,
+                                             agent_action)
                 self.vida_actual_t2 = max(0, self.vida_actual_t2 - danio)
                 danio_turno_jugador = danio
+                acierto_jugador = self._ultimo_acierto
+                if m is not None:
+                    t0 = m.lap("damage", t0)
                 if self.vida_actual_t2 <= 0:
                     vida_oponente_ko_param = vida_oponente_antes_ataques
                     self.manejar_debilitado(2)
+                    if m is not None:
+                        t0 = m.lap("ko", t0)
                     break  # si K.O., termina el turno
             else:
+                danio = self.ejecutar_ataque(self.pokemon_activo_t2, self.pokemon_activo_t1, mov_bot, idx_bot)
                 self.vida_actual_t1 = max(0, self.vida_actual_t1 - danio)
                 danio_turno_bot = danio
+                acierto_bot = self._ultimo_acierto
+                if m is not None:
+                    t0 = m.lap("damage", t0)
                 if self.vida_actual_t1 <= 0:
                     vida_jugador_ko_param = vida_jugador_antes_ataques
                     self.manejar_debilitado(1)
+                    if m is not None:
+                        t0 = m.lap("ko", t0)
                     break
-    
-        mov_j_for_reward = mov_jugador if mov_jugador is not None else SimpleNamespace(name="Cambio")
-        mov_b_for_reward = mov_bot      if mov_bot      is not None else SimpleNamespace(name="(bot_none)")
+
+        mov_j_for_reward = mov_jugador if mov_jugador is not None else _MOV_CAMBIO
+        mov_b_for_reward = mov_bot      if mov_bot      is not None else _MOV_BOT_NONE
         
         # --- ¿Fin del combate? El mismo criterio del final de simular ---
         done = (self.pokemon_left_t1 == 0) or (self.pokemon_left_t2 == 0)
@@ -283,12 +427,17 @@ class Combate:
             done=done,
             agent_won=agent_won
         )
+        if m is not None:
+            m.lap("reward", t0)
+        # resumen del turno para quien lo quiera registrar (rl_env.trajectory)
+        self.ultimo_turno = (idx_bot, danio_turno_jugador, danio_turno_bot, acierto_jugador, acierto_bot)
         # Optional: mark if next turn must switch (only if you don’t auto-switch immediately)
         # self.agent_must_switch = (self.vida_actual_t1 <= 0 and self.pokemon_left_t1 > 0)
         return reward, done
 
 
     def simular(self):
+        from image_generator import crear_imagen_combate
         log_turno_anterior = "¡COMIENZA EL COMBATE!"
         
         while self.pokemon_left_t1 > 0 and self.pokemon_left_t2 > 0:
@@ -394,6 +543,7 @@ class Combate:
         else: print(f"¡El ganador es {self.t2.name}!")
 
 if __name__ == "__main__":
+    from data import crear_todos_los_entrenadores
     print("Cargando datos para el combate...")
     todos_los_entrenadores = crear_todos_los_entrenadores()
     
@@ -0,0 +1,240 @@
+# combate_vectorial.py
+"""
+VectorCombate: N combates simultáneos entre los mismos dos entrenadores.
+
+El estado se guarda como arrays (struct-of-arrays) en lugar de un grafo de objetos
+por combate, y step_rl resuelve el turno de TODOS los combates con operaciones de NumPy.
+
+Las reglas son exactamente las de Combate.step_rl (modo no interactivo):
+    - acción 0..3: movimiento del pokémon activo (si existe)
+    - acción 10+idx: cambio al slot idx (si está vivo). Como en Combate, el pokémon
+      que sale NO guarda su vida actual: vidas1 sólo se modifica al ser debilitado.
+    - el bot elige un movimiento uniforme entre los de su activo
+    - orden por speed (empate -> primero el agente); si hay cambio sólo ataca el bot
+    - tirada de precisión 1..100 por ataque; K.O. termina el turno
+    - tras un K.O. entra automáticamente el primer pokémon vivo del equipo
+La reward se calcula con reward.calcular_reward_turno_batch, que replica
+calcular_reward_turno, así que las Q-tables son intercambiables con el camino escalar.
+"""
+from typing import Optional
+import numpy as np
+
+from classes import Entrenador
+from danio import danio_base
+from reward import calcular_reward_turno_batch
+from tabla_tipos import efectividad_total
+import tabla_danio
+
+N_MOVS = 4          # máximo de movimientos por pokémon
+ACCION_CAMBIO = 10  # acción 10+idx = cambiar al slot idx
+N_ACCIONES = 16
+_BITS_MOVS = (1 << np.arange(N_MOVS + 1, dtype=np.int64)) - 1   # n movimientos -> bits 0..n-1
+_BITS_ACCIONES = np.arange(N_ACCIONES, dtype=np.int64)
+
+
+def tablas_ataque(atacantes, defensores):
+    """
+    Tablas deterministas de los ataques de un equipo contra otro:
+        base[a, d, m]  daño sin precisión
+        eff[a, m, d]   efectividad del movimiento m de a contra d
+        prec[a, m]     precisión (0 si el movimiento no existe)
+    Recortes de la tabla precalculada del roster si la hay (dataset compilado); si no, cálculo directo.
+    """
+    tabla = tabla_danio.tabla_para(list(atacantes) + list(defensores))
+    if tabla is not None:
+        return tabla.tablas_equipos(atacantes, defensores)
+    na, nd = len(atacantes), len(defensores)
+    base = np.zeros((na, nd, N_MOVS), dtype=np.float64)
+    eff = np.ones((na, N_MOVS, nd), dtype=np.float64)
+    prec = np.zeros((na, N_MOVS), dtype=np.int64)
+    for ia, atacante in enumerate(atacantes):
+        for m, mov in enumerate(atacante.movimientos):
+            prec[ia, m] = mov.precision
+            for idf, defensor in enumerate(defensores):
+                base[ia, idf, m] = danio_base(atacante, defensor, mov)
+                eff[ia, m, idf] = efectividad_total(mov.type, defensor.type1, defensor.type2)
+    return base, eff, prec
+
+
+class VectorCombate:
+    def __init__(self, entrenador1: Entrenador, entrenador2: Entrenador, n: int,
+                 rng: Optional[np.random.Generator] = None):
+        self.t1 = entrenador1
+        self.t2 = entrenador2
+        self.n = int(n)
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        p1, p2 = self.t1.pokemons, self.t2.pokemons
+        self.n1, self.n2 = len(p1), len(p2)
+
+        # --- tablas por slot (no dependen del estado) ---
+        self.hp_total1 = np.array([p.hp for p in p1], dtype=np.float64)
+        self.hp_total2 = np.array([p.hp for p in p2], dtype=np.float64)
+        self.speed1 = np.array([p.speed for p in p1], dtype=np.float64)
+        self.speed2 = np.array([p.speed for p in p2], dtype=np.float64)
+        self.n_movs1 = np.array([len(p.movimientos) for p in p1], dtype=np.int64)
+        self.n_movs2 = np.array([len(p.movimientos) for p in p2], dtype=np.int64)
+        self.base1, self.eff1, self.prec1 = tablas_ataque(p1, p2)   # agente -> bot
+        self.base2, self.eff2, self.prec2 = tablas_ataque(p2, p1)   # bot -> agente
+        # mejor efectividad ofensiva de cada slot del agente contra cada slot del bot (>= 1.0)
+        self.best_eff1 = np.ones((self.n1, self.n2), dtype=np.float64)
+        for ia, a in enumerate(p1):
+            for ib, b in enumerate(p2):
+                for mov in a.movimientos:
+                    self.best_eff1[ia, ib] = max(self.best_eff1[ia, ib],
+                                                 efectividad_total(mov.type, b.type1, b.type2))
+
+        # --- estado (struct-of-arrays) ---
+        self.activo1 = np.zeros(self.n, dtype=np.int64)
+        self.activo2 = np.zeros(self.n, dtype=np.int64)
+        self.vida1 = np.zeros(self.n, dtype=np.float64)
+        self.vida2 = np.zeros(self.n, dtype=np.float64)
+        self.vidas1 = np.zeros((self.n, self.n1), dtype=np.float64)
+        self.vidas2 = np.zeros((self.n, self.n2), dtype=np.float64)
+        self.left1 = np.zeros(self.n, dtype=np.int64)
+        self.left2 = np.zeros(self.n, dtype=np.int64)
+        self.turno = np.zeros(self.n, dtype=np.int64)
+        # slots vivos del agente y acciones legales como bits (como Combate.mascara_legal)
+        self.vivos1 = np.zeros(self.n, dtype=np.int64)
+        self.mascara = np.zeros(self.n, dtype=np.int64)
+        self._idx = np.arange(self.n)
+        self.reset()
+
+    def reset(self, filas: Optional[np.ndarray] = None):
+        """Reinicia todos los combates, o sólo los indicados (máscara bool o índices)."""
+        if filas is None:
+            filas = slice(None)
+        self.vidas1[filas] = self.hp_total1
+        self.vidas2[filas] = self.hp_total2
+        self.activo1[filas] = 0
+        self.activo2[filas] = 0
+        self.vida1[filas] = self.hp_total1[0]
+        self.vida2[filas] = self.hp_total2[0]
+        self.left1[filas] = self.n1
+        self.left2[filas] = self.n2
+        self.turno[filas] = 0
+        self.vivos1[filas] = (1 << self.n1) - 1
+        self._actualizar_mascara()
+
+    def fijar_estados(self, activo1, vivos1, vida1, activo2, vida2):
+        """
+        Sustituye los combates por un lote de estados dados (tantos como elementos):
+        activo y vida actual de cada lado y slots vivos del agente como bits. El bot
+        siempre saca al primer vivo, así que sus slots vivos son los >= activo2.
+        """
+        self.activo1 = np.asarray(activo1, dtype=np.int64)
+        self.activo2 = np.asarray(activo2, dtype=np.int64)
+        self.vivos1 = np.asarray(vivos1, dtype=np.int64)
+        self.vida1 = np.asarray(vida1, dtype=np.float64)
+        self.vida2 = np.asarray(vida2, dtype=np.float64)
+        self.n = len(self.activo1)
+        self._idx = np.arange(self.n)
+        vivo1 = (self.vivos1[:, None] >> np.arange(self.n1)) & 1 == 1
+        self.vidas1 = np.where(vivo1, self.hp_total1, 0.0)
+        self.vidas2 = np.where(np.arange(self.n2) >= self.activo2[:, None], self.hp_total2, 0.0)
+        self.left1 = vivo1.sum(axis=1)
+        self.left2 = self.n2 - self.activo2
+        self.turno = np.zeros(self.n, dtype=np.int64)
+        self._actualizar_mascara()
+
+    def _actualizar_mascara(self):
+        # movimientos del activo + cambios a los slots vivos que no son el activo
+        otros = self.vivos1 & ~(np.int64(1) << self.activo1)
+        self.mascara = _BITS_MOVS[self.n_movs1[self.activo1]] | (otros << ACCION_CAMBIO)
+
+    # --- RL ADAPTER ---
+
+    def acciones_legales(self) -> np.ndarray:
+        """Máscara [N, 16] equivalente a Combate.acciones_legales_agente (desempaqueta self.mascara)."""
+        return ((self.mascara[:, None] >> _BITS_ACCIONES) & 1).astype(bool)
+
+    def es_legal(self, acciones: np.ndarray) -> np.ndarray:
+        """[N] bool: la acción de cada combate es legal (sin construir la máscara [N, 16])."""
+        dentro = (acciones >= 0) & (acciones < N_ACCIONES)
+        return dentro & ((self.mascara >> np.clip(acciones, 0, N_ACCIONES - 1)) & 1).astype(bool)
+
+    def is_done(self) -> np.ndarray:
+        return (self.left1 == 0) | (self.left2 == 0)
+
+    def agent_won(self) -> np.ndarray:
+        return self.left2 == 0
+
+    def step_rl(self, acciones: np.ndarray, mov_b=None, tirada_j=None, tirada_b=None):
+        """
+        Ejecuta UN turno en cada combate.
+        mov_b / tirada_j / tirada_b fijan el movimiento del bot y las tiradas de precisión
+        en lugar de sortearlos (para enumerar desenlaces, ver modelo_combate).
+        Devuelve: (rewards [N] float64, done [N] bool)
+        """
+        idx = self._idx
+        acciones = np.asarray(acciones, dtype=np.int64)
+        self.turno += 1
+
+        # ---- Acción del agente: cambiar (si el slot está vivo) o mover ----
+        es_cambio = acciones >= ACCION_CAMBIO
+        slot = np.clip(acciones - ACCION_CAMBIO, 0, self.n1 - 1)
+        cambia = es_cambio & (acciones - ACCION_CAMBIO < self.n1) & (self.vidas1[idx, slot] > 0)
+        self.activo1 = np.where(cambia, slot, self.activo1)
+        self.vida1 = np.where(cambia, self.vidas1[idx, slot], self.vida1)
+
+        a1 = self.activo1          # activo del agente tras el cambio
+        a2 = self.activo2          # activo del bot al inicio del turno
+        mov_j = np.clip(acciones, 0, N_MOVS - 1)
+        mueve = ~es_cambio & (acciones >= 0) & (acciones < self.n_movs1[a1])
+
+        # --- Movimiento del bot (uniforme entre los suyos) ---
+        if mov_b is None:
+            mov_b = (self.rng.random(self.n) * self.n_movs2[a2]).astype(np.int64)
+
+        # --- Tiradas de precisión (1..100) y daño ---
+        if tirada_j is None:
+            tirada_j = self.rng.integers(1, 101, size=self.n)
+        if tirada_b is None:
+            tirada_b = self.rng.integers(1, 101, size=self.n)
+        danio_j = np.where(mueve & (self.prec1[a1, mov_j] >= tirada_j), self.base1[a1, a2, mov_j], 0.0)
+        danio_b = np.where(self.prec2[a2, mov_b] >= tirada_b, self.base2[a2, a1, mov_b], 0.0)
+
+        # --- Orden por speed: si el primero deja K.O., el segundo no ataca ---
+        bot_primero = ~mueve | (self.speed1[a1] < self.speed2[a2])
+        mata_j = mueve & (self.vida2 - danio_j <= 0)
+        mata_b = self.vida1 - danio_b <= 0
+        ataca_j = mueve & ~(bot_primero & mata_b)
+        ataca_b = bot_primero | ~mata_j
+        ko_hecho = ataca_j & mata_j
+        ko_recibido = ataca_b & mata_b
+        danio_j = np.where(ataca_j, danio_j, 0.0)
+        danio_b = np.where(ataca_b, danio_b, 0.0)
+        self.vida2 = np.maximum(0, self.vida2 - danio_j)
+        self.vida1 = np.maximum(0, self.vida1 - danio_b)
+
+        # --- K.O.: marcar debilitado y sacar automáticamente el primer vivo ---
+        self.vidas1[idx[ko_recibido], a1[ko_recibido]] = 0
+        self.vivos1 &= ~(ko_recibido.astype(np.int64) << a1)
+        self.left1 = self.left1 - ko_recibido
+        entra1 = ko_recibido & (self.left1 > 0)
+        sig1 = np.argmax(self.vidas1 > 0, axis=1)
+        self.activo1 = np.where(entra1, sig1, a1)
+        self.vida1 = np.where(entra1, self.vidas1[idx, sig1], self.vida1)
+
+        self.vidas2[idx[ko_hecho], a2[ko_hecho]] = 0
+        self.left2 = self.left2 - ko_hecho
+        entra2 = ko_hecho & (self.left2 > 0)
+        sig2 = np.argmax(self.vidas2 > 0, axis=1)
+        self.activo2 = np.where(entra2, sig2, a2)
+        self.vida2 = np.where(entra2, self.vidas2[idx, sig2], self.vida2)
+
+        self._actualizar_mascara()
+
+        # --- Reward (misma fórmula que calcular_reward_turno) ---
+        done = self.is_done()
+        reward = calcular_reward_turno_batch(
+            danio_j, danio_b,
+            self.hp_total2[a2], self.hp_total1[self.activo1],
+            ~mueve,
+            self.best_eff1[self.activo1, a2],
+            self.eff1[a1, mov_j, a2],
+            self.eff2[a2, mov_b, self.activo1],
+            ko_hecho, ko_recibido,
+            done, self.agent_won(),
+        )
+        return reward, done
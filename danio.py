@@ -1,27 +1,22 @@
-# Importamos el DataFrame desde nuestro archivo data.py
-from data import df_tipos
-import pandas as pd # Lo necesitamos por si un tipo es nulo (NaN)
+# Usamos el registro precompilado de tipos (tabla_tipos.py) en vez de df_tipos.loc
+import tabla_tipos
 import random
 
 def calcular_efectividad(tipo_atacante, tipo_defensor):
     """
     Calcula la efectividad de un tipo de ataque contra un tipo de defensor
-    utilizando el DataFrame de la tabla de tipos.
+    utilizando la tabla de tipos precompilada.
     """
-    # Si el pokemon defensor no tiene segundo tipo, este será nulo (NaN).
+    # Si el pokemon defensor no tiene segundo tipo, este será nulo (None/NaN).
     # En ese caso, la efectividad es neutra (1).
-    if pd.isna(tipo_defensor):
+    if tipo_defensor is None or tipo_defensor != tipo_defensor:
         return 1
-    
-    # Usamos .loc para buscar en el DataFrame por índice (atacante) y columna (defensor)
-    # y así obtener el multiplicador de daño.
-    try:
-        efectividad = df_tipos.loc[tipo_atacante, tipo_defensor]
-        return efectividad
-    except KeyError:
+
+    if not (tabla_tipos.es_tipo_conocido(tipo_atacante) and tabla_tipos.es_tipo_conocido(tipo_defensor)):
         # Si algún tipo no se encuentra en la tabla, devolvemos 1 como valor por defecto.
         print(f"Advertencia: El tipo '{tipo_atacante}' o '{tipo_defensor}' no fue encontrado. Se usará efectividad neutra.")
         return 1
+    return tabla_tipos.efectividad(tipo_atacante, tipo_defensor)
 
 
 
@@ -38,37 +33,50 @@ def same_type_attack_bonus(tipo_pokemon1, tipo_pokemon2, tipo_mov):
     return multiplicador
 
 
-def calcular_danio(pokemon_atacante, pokemon_defensor, mov):
+def calcular_danio(pokemon_atacante, pokemon_defensor, mov, verbose: bool = True, tirada=None):
     """
     Calcula el daño final de un movimiento.
     Asume que los objetos pokemon y mov tienen los atributos necesarios.
+    Con verbose=False no se escribe nada por stdout (modo entrenamiento).
+    tirada: número 1..100 para la precisión ya sorteado por quien llama (Combate usa su
+    propio generador); si es None se usa el random global.
     """
     danio = 0
-    precision_random = random.randint(1, 100)
+    precision_random = random.randint(1, 100) if tirada is None else tirada
 
     # Corregido: mov.precision es el nombre correcto del atributo
     if mov.precision < precision_random:
-        danio = 0
-        print("El ataque ha fallado!")
+        if verbose:
+            print("El ataque ha fallado!")
         return danio
         
-    # La efectividad total es el producto de las efectividades contra cada tipo.
-    # Corregido: mov.tipo -> mov.type
-    efectividad1 = calcular_efectividad(mov.type, pokemon_defensor.type1)
-    efectividad2 = calcular_efectividad(mov.type, pokemon_defensor.type2)
-    efectividad_total = efectividad1 * efectividad2
-
-    if efectividad_total == 2:
-        print("Es superefectivo!!")
-    if efectividad_total == 4:
-        print("Es megaefectivo!!")
-    if efectividad_total == 0.5:
-        print("Es poco efectivo...")
-    if efectividad_total == 0.25:   
-        print("Es muy poco efectivo...")
-    if efectividad_total == 0:
-        print("El pokemon rival es inmune...")
-    
+    # La efectividad total es el producto de las efectividades contra cada tipo
+    # (ya precalculado en la tabla dual de tabla_tipos).
+    efectividad_total = tabla_tipos.efectividad_total(mov.type, pokemon_defensor.type1, pokemon_defensor.type2)
+
+    if verbose:
+        if efectividad_total == 2:
+            print("Es superefectivo!!")
+        if efectividad_total == 4:
+            print("Es megaefectivo!!")
+        if efectividad_total == 0.5:
+            print("Es poco efectivo...")
+        if efectividad_total == 0.25:
+            print("Es muy poco efectivo...")
+        if efectividad_total == 0:
+            print("El pokemon rival es inmune...")
+
+    return danio_base(pokemon_atacante, pokemon_defensor, mov, efectividad_total)
+
+
+def danio_base(pokemon_atacante, pokemon_defensor, mov, efectividad_total=None):
+    """
+    Parte determinista del daño (sin la tirada de precisión).
+    Sólo depende de (atacante, defensor, movimiento), así que se puede precalcular.
+    """
+    if efectividad_total is None:
+        efectividad_total = tabla_tipos.efectividad_total(mov.type, pokemon_defensor.type1, pokemon_defensor.type2)
+
     # El multiplicador por ser del mismo tipo (STAB)
     # Corregido: mov.tipo -> mov.type
     multiplicador_stab = same_type_attack_bonus(pokemon_atacante.type1, pokemon_atacante.type2, mov.type)
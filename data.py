@@ -6,33 +6,10 @@ from classes import Movimiento, Pokemon, Entrenador
 
 # --- DEFINICIÓN GLOBAL DE LA TABLA DE EFECTIVIDADES ---
 
-tipos = [
-    "Normal", "Fuego", "Agua", "Planta", "Electrico", "Hielo", "Lucha", "Veneno", "Tierra",
-    "Volador", "Psiquico", "Bicho", "Roca", "Fantasma", "Dragon", "Siniestro", "Acero", "Hada"
-]
-
-datos_efectividad = [
-    # Defensor ->
-    # Nor   Fue    Agu    Pla    Elé    Hie    Luc    Ven    Tie    Vol    Psi    Bic    Roc    Fan    Dra    Sin    Ace    Had   ↓ Atacante
-    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   0.5,   0.0,   1.0,   1.0,   0.5,   1.0], # Normal
-    [1.0,  0.5,   0.5,   2.0,   1.0,   2.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   0.5,   1.0,   2.0,   1.0], # Fuego
-    [1.0,  2.0,   0.5,   0.5,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   1.0,   1.0], # Agua
-    [1.0,  0.5,   2.0,   0.5,   1.0,   1.0,   1.0,   0.5,   2.0,   0.5,   1.0,   0.5,   2.0,   1.0,   0.5,   1.0,   0.5,   1.0], # Planta
-    [1.0,  1.0,   2.0,   0.5,   0.5,   1.0,   1.0,   1.0,   0.0,   2.0,   1.0,   1.0,   1.0,   1.0,   0.5,   1.0,   1.0,   1.0], # Eléctrico
-    [1.0,  0.5,   0.5,   2.0,   1.0,   0.5,   1.0,   1.0,   2.0,   2.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0], # Hielo
-    [2.0,  1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   0.5,   0.5,   0.5,   2.0,   0.0,   1.0,   2.0,   2.0,   0.5], # Lucha
-    [1.0,  1.0,   1.0,   2.0,   1.0,   1.0,   1.0,   0.5,   0.5,   1.0,   1.0,   1.0,   0.5,   0.5,   1.0,   1.0,   0.0,   2.0], # Veneno
-    [1.0,  2.0,   1.0,   0.5,   2.0,   1.0,   1.0,   2.0,   1.0,   0.0,   1.0,   0.5,   2.0,   1.0,   1.0,   1.0,   2.0,   1.0], # Tierra
-    [1.0,  1.0,   1.0,   2.0,   0.5,   1.0,   2.0,   1.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   1.0,   1.0,   0.5,   1.0], # Volador
-    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   2.0,   1.0,   1.0,   0.5,   1.0,   1.0,   1.0,   1.0,   0.0,   0.5,   1.0], # Psíquico
-    [1.0,  0.5,   1.0,   2.0,   1.0,   1.0,   0.5,   0.5,   1.0,   0.5,   2.0,   1.0,   1.0,   0.5,   1.0,   2.0,   0.5,   0.5], # Bicho
-    [1.0,  2.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   0.5,   2.0,   1.0,   2.0,   1.0,   1.0,   1.0,   1.0,   0.5,   1.0], # Roca
-    [0.0,  1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   1.0], # Fantasma
-    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   0.0], # Dragón
-    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   0.5,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   0.5], # Siniestro
-    [1.0,  0.5,   0.5,   1.0,   0.5,   2.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   1.0,   0.5,   2.0], # Acero
-    [1.0,  0.5,   1.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   2.0,   0.5,   1.0]  # Hada
-]
+# Las listas viven en tabla_tipos (sin pandas) para que el camino de entrenamiento no importe
+# este módulo; aquí se mantiene el DataFrame para quien lo use.
+from tabla_tipos import tipos, datos_efectividad
+
 df_tipos = pd.DataFrame(data=datos_efectividad, index=tipos, columns=tipos)
 
 
@@ -140,17 +117,22 @@ def crear_todos_los_pokemon() -> List[Pokemon]:
 
 
 
-def crear_todos_los_entrenadores() -> List[Entrenador]:
+def crear_todos_los_entrenadores(lista_pokemon_disponibles: Optional[List[Pokemon]] = None) -> List[Entrenador]:
     """
     Crea una lista de objetos Entrenador a partir del CSV, asignándoles
     sus respectivos equipos de Pokémon.
 
+    Args:
+        lista_pokemon_disponibles: roster ya creado con crear_todos_los_pokemon (los
+            equipos comparten esos objetos). Si es None se crea aquí.
+
     Returns:
         List[Entrenador]: Una lista con todas las instancias de la clase Entrenador.
     """
     # 1. Necesitamos todos los objetos Pokémon disponibles para poder asignarlos.
     #    Los convertimos a un diccionario para una búsqueda por nombre súper rápida.
-    lista_pokemon_disponibles = crear_todos_los_pokemon()
+    if lista_pokemon_disponibles is None:
+        lista_pokemon_disponibles = crear_todos_los_pokemon()
     pokemon_lookup = {pokemon.name: pokemon for pokemon in lista_pokemon_disponibles}
 
     # 2. Leemos el archivo CSV de los entrenadores.
@@ -0,0 +1,166 @@
+# estado_combate.py
+"""
+Estado inmutable del combate y transición pura, para búsqueda (expectimax, MCTS, rollouts).
+
+EstadoCombate es una tupla de ints y floats: se copia gratis, es hashable (sirve de
+clave de una tabla de transposición) y Combate.snapshot()/restore() la sacan y la
+vuelcan sin deepcopy. ReglasCombate guarda, en listas de Python, todo lo que no cambia
+durante el combate (vidas máximas, speed, daño/precisión/efectividad por slot), y
+transicion(reglas, estado, accion, rng) juega un turno sin tocar ningún objeto.
+
+Las reglas son las de Combate.step_rl (modo no interactivo), incluida la reward; el
+orden en que se consumen los números aleatorios no es el mismo que en Combate, así que
+con la misma semilla los combates no coinciden tirada a tirada.
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+from combate_vectorial import tablas_ataque, ACCION_CAMBIO
+from reward import reward_turno_valores
+from tabla_tipos import efectividad_total
+
+
+class EstadoCombate(NamedTuple):
+    activo1: int            # slot activo del agente
+    activo2: int            # slot activo del bot
+    vida1: float            # vida actual del activo del agente
+    vida2: float
+    vidas1: Tuple[float, ...]   # vida guardada por slot (0 = debilitado), como Combate.vidas_equipo_t1
+    vidas2: Tuple[float, ...]
+    turno: int = 0
+
+    @property
+    def left1(self) -> int:
+        return sum(1 for v in self.vidas1 if v > 0)
+
+    @property
+    def left2(self) -> int:
+        return sum(1 for v in self.vidas2 if v > 0)
+
+    def clave(self) -> tuple:
+        """Estado sin el contador de turnos (lo que importa para la dinámica)."""
+        return self[:6]
+
+
+class ReglasCombate:
+    """Tablas constantes de un enfrentamiento entrenador1 (agente) vs entrenador2 (bot)."""
+    def __init__(self, entrenador1, entrenador2):
+        p1, p2 = entrenador1.pokemons, entrenador2.pokemons
+        self.n1, self.n2 = len(p1), len(p2)
+        self.hp1 = [float(p.hp) for p in p1]
+        self.hp2 = [float(p.hp) for p in p2]
+        self.speed1 = [p.speed for p in p1]
+        self.speed2 = [p.speed for p in p2]
+        self.n_movs1 = [len(p.movimientos) for p in p1]
+        self.n_movs2 = [len(p.movimientos) for p in p2]
+        base1, eff1, prec1 = tablas_ataque(p1, p2)
+        base2, eff2, prec2 = tablas_ataque(p2, p1)
+        # listas anidadas: indexar listas es mucho más rápido que escalares de NumPy
+        self.base1, self.eff1, self.prec1 = base1.tolist(), eff1.tolist(), prec1.tolist()
+        self.base2, self.eff2, self.prec2 = base2.tolist(), eff2.tolist(), prec2.tolist()
+        self.best_eff1 = [[max([1.0] + [efectividad_total(m.type, b.type1, b.type2) for m in a.movimientos])
+                           for b in p2] for a in p1]
+
+    def estado_inicial(self) -> EstadoCombate:
+        return EstadoCombate(0, 0, self.hp1[0], self.hp2[0], tuple(self.hp1), tuple(self.hp2), 0)
+
+    def acciones_legales(self, e: EstadoCombate) -> List[int]:
+        """Como Combate.acciones_legales_agente."""
+        acc = list(range(self.n_movs1[e.activo1]))
+        acc.extend(ACCION_CAMBIO + i for i, v in enumerate(e.vidas1) if v > 0 and i != e.activo1)
+        return acc
+
+
+def resolver(reglas: ReglasCombate, e: EstadoCombate, accion: int, mov_bot: int,
+             acierta_agente: bool, acierta_bot: bool):
+    """
+    Un turno con el movimiento del bot y los aciertos ya decididos.
+    Devuelve (estado siguiente, reward, done).
+    """
+    R = reglas
+    a1, a2, v1, v2, vidas1, vidas2, turno = e
+    a2_ini = a2
+    # ---- acción del agente: cambiar (si el slot está vivo) o mover ----
+    mueve = False
+    if accion >= ACCION_CAMBIO:
+        slot = accion - ACCION_CAMBIO
+        if vidas1[slot] > 0:
+            a1, v1 = slot, vidas1[slot]
+    else:
+        mueve = 0 <= accion < R.n_movs1[a1]
+    a1_ataque = a1
+
+    dj = db = 0.0
+    ko_hecho = ko_recibido = False
+    for ataca_agente in ((False, True) if not mueve or R.speed1[a1] < R.speed2[a2] else (True, False)):
+        if ataca_agente:
+            if not mueve:
+                continue
+            dj = R.base1[a1][a2][accion] if acierta_agente else 0
+            v2 = max(0, v2 - dj)
+            if v2 <= 0:
+                ko_hecho = True
+                vidas2 = vidas2[:a2] + (0,) + vidas2[a2 + 1:]
+                siguiente = next((i for i, v in enumerate(vidas2) if v > 0), None)
+                if siguiente is not None:
+                    a2, v2 = siguiente, vidas2[siguiente]
+                break
+        else:
+            db = R.base2[a2][a1][mov_bot] if acierta_bot else 0
+            v1 = max(0, v1 - db)
+            if v1 <= 0:
+                ko_recibido = True
+                vidas1 = vidas1[:a1] + (0,) + vidas1[a1 + 1:]
+                siguiente = next((i for i, v in enumerate(vidas1) if v > 0), None)
+                if siguiente is not None:
+                    a1, v1 = siguiente, vidas1[siguiente]
+                break
+
+    fin1 = ko_recibido and not any(v > 0 for v in vidas1)
+    fin2 = ko_hecho and not any(v > 0 for v in vidas2)
+    done = fin1 or fin2
+    reward = reward_turno_valores(
+        dj, db, R.hp2[a2_ini], R.hp1[a1],
+        not mueve, R.best_eff1[a1][a2_ini],
+        R.eff1[a1_ataque][accion][a2_ini] if mueve else 1.0,
+        R.eff2[a2_ini][mov_bot][a1],
+        ko_hecho, ko_recibido, done, fin2 if done else None,
+    )
+    return EstadoCombate(a1, a2, v1, v2, vidas1, vidas2, turno + 1), reward, done
+
+
+def transicion(reglas: ReglasCombate, e: EstadoCombate, accion: int, rng, mov_bot: Optional[int] = None):
+    """
+    Juega un turno desde e sin efectos secundarios. rng: cualquier objeto con random() en
+    [0, 1) (random.Random o np.random.Generator). mov_bot=None: el bot elige al azar.
+    Devuelve (estado siguiente, reward, done).
+    """
+    if mov_bot is None:
+        mov_bot = int(rng.random() * reglas.n_movs2[e.activo2])
+    # tirada 1..100 por ataque: acierta si precisión >= tirada
+    prec_j = reglas.prec1[e.activo1][accion] if 0 <= accion < reglas.n_movs1[e.activo1] else 0
+    acierta_j = prec_j >= int(rng.random() * 100) + 1
+    acierta_b = reglas.prec2[e.activo2][mov_bot] >= int(rng.random() * 100) + 1
+    return resolver(reglas, e, accion, mov_bot, acierta_j, acierta_b)
+
+
+def desenlaces(reglas: ReglasCombate, e: EstadoCombate, accion: int, mov_bot: Optional[int] = None):
+    """
+    Todos los desenlaces del turno con su probabilidad: [(p, estado, reward, done)].
+    Movimiento del bot uniforme (o mov_bot si se da); P(acierto) = precisión / 100.
+    """
+    R = reglas
+    movs_bot = range(R.n_movs2[e.activo2]) if mov_bot is None else (mov_bot,)
+    nm2 = len(movs_bot)
+    mueve = 0 <= accion < R.n_movs1[e.activo1]
+    pj = min(100, max(0, R.prec1[e.activo1][accion])) / 100.0 if mueve else 1.0
+    out = []
+    for mb in movs_bot:
+        pb = min(100, max(0, R.prec2[e.activo2][mb])) / 100.0
+        for acierta_j, p_j in ((True, pj), (False, 1.0 - pj)):
+            if p_j <= 0:
+                continue
+            for acierta_b, p_b in ((True, pb), (False, 1.0 - pb)):
+                if p_b <= 0:
+                    continue
+                out.append((p_j * p_b / nm2,) + resolver(R, e, accion, mb, acierta_j, acierta_b))
+    return out
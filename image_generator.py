@@ -1,7 +1,8 @@
 # image_generator.py
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from classes import Pokemon, Entrenador
+from cache_sprites import CACHE
 import subprocess
 
 # --- Constantes de configuración para la imagen ---
@@ -27,6 +28,23 @@ ESPACIO_POKEBALL = 10
 POS_POKEBALLS_JUGADOR = (POS_ENTRENADOR_JUGADOR[0]+70, POS_ENTRENADOR_JUGADOR[1] - TAMANIO_POKEBALL[1] - 5)
 POS_POKEBALLS_OPONENTE = (POS_ENTRENADOR_OPONENTE[0]+70, POS_ENTRENADOR_OPONENTE[1] - TAMANIO_POKEBALL[1] - 5)
 
+RUTA_POKEBALL = "assets/images/other_images/pokeball.png"
+RUTA_POKEBALL_DERROTADA = "assets/images/other_images/pokeball_derrotado.png"
+RUTA_FUENTE, RUTA_FUENTE_PANEL = "assets/ttf/arial.ttf", "assets/ttf/consola.ttf"
+
+def precargar_atlas(entrenadores):
+    """
+    Decodifica de una vez todos los sprites que pueden salir en un combate de estos
+    entrenadores (en los tamaños en que se pintan) y los deja en el atlas de CACHE.
+    """
+    peticiones = [(RUTA_POKEBALL, TAMANIO_POKEBALL, False), (RUTA_POKEBALL_DERROTADA, TAMANIO_POKEBALL, False)]
+    for e in entrenadores:
+        peticiones.append((e.imagen, TAMANIO_ENTRENADOR, False))
+        for p in e.pokemons:
+            peticiones.append((p.imagen, TAMANIO_POKE_JUGADOR, True))
+            peticiones.append((p.imagen, TAMANIO_POKE_OPONENTE, False))
+    return CACHE.construir_atlas(peticiones)
+
 def _get_color_vida(porcentaje_vida):
     if porcentaje_vida > 0.5: return COLOR_VERDE
     elif porcentaje_vida > 0.2: return COLOR_AMARILLO
@@ -43,46 +61,43 @@ def _dibujar_pokeballs(lienzo, pokeballs_vivas: int, pos_inicial: tuple, sprite_
         else:
             lienzo.paste(sprite_derrotada, (pos_x, pos_y), sprite_derrotada)
 
-def crear_imagen_combate(
+def componer_imagen_combate(
     entrenador1: Entrenador, entrenador2: Entrenador, texto_combate: str,
-    pokemon_left1: int, pokemon_left2: int, # <<< NUEVOS PARÁMETROS
+    pokemon_left1: int, pokemon_left2: int,
     pokemon1: Pokemon = None, vida_actual1: float = 0,
     pokemon2: Pokemon = None, vida_actual2: float = 0,
-    output_path="combate.png"
 ):
+    """Dibuja el estado del combate y devuelve la imagen (None si falta algún sprite). Sprites y fuentes salen de CACHE."""
     lienzo = Image.new('RGBA', (ANCHO_CANVAS, ALTO_CANVAS), COLOR_FONDO_BATALLA)
     
     try:
-        sprite_entrenador1 = Image.open(entrenador1.imagen).convert("RGBA").resize(TAMANIO_ENTRENADOR)
-        sprite_entrenador2 = Image.open(entrenador2.imagen).convert("RGBA").resize(TAMANIO_ENTRENADOR)
+        sprite_entrenador1 = CACHE.sprite(entrenador1.imagen, TAMANIO_ENTRENADOR)
+        sprite_entrenador2 = CACHE.sprite(entrenador2.imagen, TAMANIO_ENTRENADOR)
         lienzo.paste(sprite_entrenador1, POS_ENTRENADOR_JUGADOR, sprite_entrenador1)
         lienzo.paste(sprite_entrenador2, POS_ENTRENADOR_OPONENTE, sprite_entrenador2)
 
         if pokemon1:
-            sprite_pokemon1 = Image.open(pokemon1.imagen).convert("RGBA").transpose(Image.FLIP_LEFT_RIGHT).resize(TAMANIO_POKE_JUGADOR)
+            sprite_pokemon1 = CACHE.sprite(pokemon1.imagen, TAMANIO_POKE_JUGADOR, espejo=True)
             lienzo.paste(sprite_pokemon1, POS_POKE_JUGADOR, sprite_pokemon1)
         if pokemon2:
-            sprite_pokemon2 = Image.open(pokemon2.imagen).convert("RGBA").resize(TAMANIO_POKE_OPONENTE)
+            sprite_pokemon2 = CACHE.sprite(pokemon2.imagen, TAMANIO_POKE_OPONENTE)
             lienzo.paste(sprite_pokemon2, POS_POKE_OPONENTE, sprite_pokemon2)
 
         # <<< LÓGICA PARA DIBUJAR POKÉ BALLS >>>
-        pokeball_viva = Image.open("assets/images/other_images/pokeball.png").convert("RGBA").resize(TAMANIO_POKEBALL)
-        pokeball_derrotada = Image.open("assets/images/other_images/pokeball_derrotado.png").convert("RGBA").resize(TAMANIO_POKEBALL)
+        pokeball_viva = CACHE.sprite(RUTA_POKEBALL, TAMANIO_POKEBALL)
+        pokeball_derrotada = CACHE.sprite(RUTA_POKEBALL_DERROTADA, TAMANIO_POKEBALL)
         
         _dibujar_pokeballs(lienzo, pokemon_left1, POS_POKEBALLS_JUGADOR, pokeball_viva, pokeball_derrotada)
         _dibujar_pokeballs(lienzo, pokemon_left2, POS_POKEBALLS_OPONENTE, pokeball_viva, pokeball_derrotada)
 
     except FileNotFoundError as e:
         print(f"Error al cargar imagen: {e}. Verifica la ruta de las imágenes.")
-        return
+        return None
 
     draw = ImageDraw.Draw(lienzo)
-    try:
-        font_nombre = ImageFont.truetype("assets/ttf/arial.ttf", 32)
-        font_vida = ImageFont.truetype("assets/ttf/arial.ttf", 22)
-        font_panel = ImageFont.truetype("assets/ttf/consola.ttf", 26)
-    except IOError:
-        font_nombre = font_vida = font_panel = ImageFont.load_default()
+    font_nombre = CACHE.fuente(RUTA_FUENTE, 32)
+    font_vida = CACHE.fuente(RUTA_FUENTE, 22)
+    font_panel = CACHE.fuente(RUTA_FUENTE_PANEL, 26)
 
     if pokemon1:
         caja_jugador_pos = (ANCHO_AREA_BATALLA - 400, ALTO_CANVAS - 180)
@@ -111,7 +126,19 @@ def crear_imagen_combate(
     pos_panel = (ANCHO_AREA_BATALLA, 0)
     draw.rectangle((pos_panel[0], pos_panel[1], ANCHO_CANVAS, ALTO_CANVAS), fill=COLOR_PANEL_TEXTO)
     draw.multiline_text((pos_panel[0] + 25, 25), texto_combate, font=font_panel, fill=COLOR_TEXTO_PANEL)
-    
+    return lienzo
+
+def crear_imagen_combate(
+    entrenador1: Entrenador, entrenador2: Entrenador, texto_combate: str,
+    pokemon_left1: int, pokemon_left2: int, # <<< NUEVOS PARÁMETROS
+    pokemon1: Pokemon = None, vida_actual1: float = 0,
+    pokemon2: Pokemon = None, vida_actual2: float = 0,
+    output_path="combate.png"
+):
+    lienzo = componer_imagen_combate(entrenador1, entrenador2, texto_combate, pokemon_left1, pokemon_left2,
+                                     pokemon1, vida_actual1, pokemon2, vida_actual2)
+    if lienzo is None:
+        return
     lienzo.save(output_path)
 
         # Llama al explorador de Windows para que abra la imagen.
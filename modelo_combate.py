@@ -0,0 +1,216 @@
+# modelo_combate.py
+"""
+Modelo explícito (MDP) del combate agente vs bot aleatorio, para resolverlo sin muestrear.
+
+Un estado del combate (no interactivo) queda determinado por
+    (activo1, vivos1, vida1, activo2, vida2)
+- el pokémon que sale al cambiar NO guarda su vida (regla de Combate): al volver entra
+  con la vida completa, así que sólo importa la vida del activo;
+- el bot siempre saca al primer vivo, así que sus vivos son los slots >= activo2.
+
+Desde cada estado y acción legal el turno tiene como mucho 4 x 2 x 2 desenlaces
+(movimiento uniforme del bot, acierto/fallo de cada ataque, P(acierto) = precisión/100).
+Cada desenlace se resuelve con VectorCombate.step_rl (las tiradas se fijan: 1 = acierta,
+101 = falla), así que el modelo usa exactamente las reglas, la tabla de daño y la reward
+del entorno. Se enumeran por anchura todos los estados alcanzables desde el inicio.
+
+Con discretizar=n la vida de cada activo se redondea al borde superior de su bucket de
+hp_to_bucket (n buckets), sin salirse del bucket de la observación: modelo aproximado y
+mucho más pequeño, pero con las mismas observaciones. Con None es exacto.
+El truncado por max_steps del entorno no se modela (horizonte infinito).
+"""
+from typing import Callable, Dict, Optional
+import numpy as np
+from scipy import sparse
+
+from combate_vectorial import N_MOVS, ACCION_CAMBIO, N_ACCIONES
+from rl_env.vector_pokemon_env import VectorPokemonEnv
+
+_ACIERTA, _FALLA = 1, 101   # tiradas fijadas (precisión >= tirada acierta)
+_DECIMALES = 9
+
+
+class ModeloCombate:
+    """
+    Estados no terminales 0..S-1 (0 = inicio del combate) y pares estado-acción 0..A-1
+    ordenados por estado (los de s son inicio[s]:inicio[s+1]).
+
+        P[sa, s']      probabilidad de pasar a s' (los desenlaces terminales no tienen columna)
+        R[sa]          reward esperada del turno
+        p_victoria[sa] probabilidad de acabar el combate ganando en este turno
+        p_derrota[sa]  probabilidad de acabar perdiendo
+    """
+    def __init__(self, estados: Dict[str, np.ndarray], obs: np.ndarray, sa_estado: np.ndarray,
+                 sa_accion: np.ndarray, P: sparse.csr_matrix, R: np.ndarray,
+                 p_victoria: np.ndarray, p_derrota: np.ndarray, indice: Dict[tuple, int],
+                 hp_total1: np.ndarray, hp_total2: np.ndarray, n_buckets: int,
+                 discretizar: Optional[int] = None):
+        self.estados = estados
+        self.obs = obs
+        self.sa_estado = sa_estado
+        self.sa_accion = sa_accion
+        self.P = P
+        self.R = R
+        self.p_victoria = p_victoria
+        self.p_derrota = p_derrota
+        self.n_estados = len(obs)
+        self.inicio = np.searchsorted(sa_estado, np.arange(self.n_estados + 1))
+        self.indice = indice
+        self.hp_total1, self.hp_total2 = hp_total1, hp_total2
+        self.n_buckets = n_buckets
+        self.discretizar = discretizar
+
+    def __repr__(self):
+        return f"ModeloCombate({self.n_estados} estados, {len(self.sa_estado)} pares estado-acción)"
+
+    def indices(self, activo1, vivos1, vida1, activo2, vida2) -> np.ndarray:
+        """
+        Estado del modelo de un lote de combates reales (p. ej. los arrays de un VectorCombate),
+        con la misma discretización; -1 si no es alcanzable en el modelo.
+        """
+        if self.discretizar:
+            vida1 = _discretizar(vida1, self.hp_total1[activo1], self.discretizar, self.n_buckets)
+            vida2 = _discretizar(vida2, self.hp_total2[activo2], self.discretizar, self.n_buckets)
+        claves = zip(np.asarray(activo1).tolist(), np.asarray(vivos1).tolist(),
+                     np.round(vida1, _DECIMALES).tolist(), np.asarray(activo2).tolist(),
+                     np.round(vida2, _DECIMALES).tolist())
+        return np.array([self.indice.get(k, -1) for k in claves], dtype=np.int64)
+
+    def pares(self, politica: np.ndarray) -> np.ndarray:
+        """Índice de par estado-acción de una política dada como acción por estado [S]."""
+        politica = np.asarray(politica, dtype=np.int64)
+        sa = np.full(self.n_estados, -1, dtype=np.int64)
+        coincide = self.sa_accion == politica[self.sa_estado]
+        sa[self.sa_estado[coincide]] = np.flatnonzero(coincide)
+        if (sa < 0).any():
+            raise ValueError(f"la política elige una acción ilegal en {int((sa < 0).sum())} estados")
+        return sa
+
+
+def _borde_superior(vida, hp_total, n_buckets):
+    # borde superior del bucket de hp_to_bucket (0 sigue siendo 0)
+    ancho = np.maximum(1, hp_total // n_buckets)
+    b = np.minimum((vida - 1) // ancho + 1, n_buckets)
+    return np.where(vida <= 0, 0.0, np.where(b == n_buckets, hp_total, np.minimum(hp_total, b * ancho)))
+
+
+def _discretizar(vida, hp_total, n_buckets, n_buckets_obs):
+    # sin cruzar el borde del bucket de la observación: la obs del estado no cambia
+    return np.minimum(_borde_superior(vida, hp_total, n_buckets),
+                      _borde_superior(vida, hp_total, n_buckets_obs))
+
+
+def construir_modelo(n_buckets: int = 5, discretizar: Optional[int] = None,
+                     politica: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+                     max_estados: int = 2_000_000, bloque: int = 8192) -> ModeloCombate:
+    """
+    Enumera los estados alcanzables del combate de PokemonEnv y construye las matrices
+    del modelo. n_buckets es el de la observación: obs[s] es el id (MixedRadixEncoder)
+    que vería el agente en s, para comparar con las Q-tables entrenadas.
+    politica(obs [B], mascara [B, 16]) -> acciones [B] restringe el modelo a los estados
+    que alcanza esa política y a su acción en cada uno (mucho menos estados).
+    """
+    env = VectorPokemonEnv(1, n_buckets=n_buckets)   # mismos entrenadores y codificación
+    c = env.battle
+
+    # claves (activo1, vivos1, vida1, activo2, vida2) -> índice de estado
+    indice = {}
+    columnas = [[] for _ in range(5)]
+
+    def registrar(a1, v1, h1, a2, h2) -> list:
+        """Índices de estos estados (los nuevos se añaden al final, en orden)."""
+        # la misma vida sumada en otro orden puede diferir en el último bit: se redondea
+        h1, h2 = np.round(h1, _DECIMALES), np.round(h2, _DECIMALES)
+        ids = []
+        for clave in zip(a1.tolist(), v1.tolist(), h1.tolist(), a2.tolist(), h2.tolist()):
+            i = indice.get(clave)
+            if i is None:
+                i = indice[clave] = len(indice)
+                for col, x in zip(columnas, clave):
+                    col.append(x)
+            ids.append(i)
+        return ids
+
+    vida_ini1, vida_ini2 = c.hp_total1[:1], c.hp_total2[:1]
+    if discretizar:
+        vida_ini1 = _discretizar(vida_ini1, c.hp_total1[:1], discretizar, n_buckets)
+        vida_ini2 = _discretizar(vida_ini2, c.hp_total2[:1], discretizar, n_buckets)
+    registrar(np.zeros(1, np.int64), np.array([(1 << c.n1) - 1]), vida_ini1,
+              np.zeros(1, np.int64), vida_ini2)
+
+    sa_estado, sa_accion = [], []
+    filas, cols, probs = [], [], []          # transiciones no terminales (sa, s', p)
+    R, p_victoria, p_derrota = [], [], []
+    n_sa = 0
+    hecho = 0
+    # los estados se expanden en orden de índice, por bloques (anchura)
+    while hecho < len(indice):
+        ids = np.arange(hecho, min(len(indice), hecho + bloque))
+        hecho = ids[-1] + 1
+        a1, v1, h1, a2, h2 = (np.array(col[ids[0]:hecho]) for col in columnas)
+        c.fijar_estados(a1, v1, h1, a2, h2)
+
+        # pares estado-acción legales (en orden de estado, acciones crecientes)
+        legal = ((c.mascara[:, None] >> np.arange(N_ACCIONES)) & 1).astype(bool)
+        if politica is not None:
+            # sólo la acción de la política: cadena de Markov en vez de MDP
+            elegida = np.asarray(politica(env.observations(), legal), dtype=np.int64)
+            legal &= np.arange(N_ACCIONES) == elegida[:, None]
+        e_sa, acc = np.nonzero(legal)
+        pares = n_sa + np.arange(len(e_sa))
+        n_sa += len(e_sa)
+        sa_estado.append(ids[e_sa])
+        sa_accion.append(acc)
+
+        # desenlaces: movimiento del bot x acierto del agente x acierto del bot
+        mb, hj, hb = (x.ravel() for x in np.meshgrid(np.arange(N_MOVS), (1, 0), (1, 0), indexing="ij"))
+        k = len(mb)
+        d_par = np.repeat(np.arange(len(e_sa)), k)
+        d_est = e_sa[d_par]
+        d_acc = acc[d_par]
+        d_mb, d_hj, d_hb = np.tile(mb, len(e_sa)), np.tile(hj, len(e_sa)), np.tile(hb, len(e_sa))
+        a1d, a2d = a1[d_est], a2[d_est]
+        nm2 = c.n_movs2[a2d]
+        es_mov = d_acc < ACCION_CAMBIO
+        # probabilidades (si el agente cambia, su acierto no importa: sólo el desenlace "acierta")
+        pj = np.clip(c.prec1[a1d, np.clip(d_acc, 0, N_MOVS - 1)], 0, 100) / 100.0
+        pj = np.where(es_mov, np.where(d_hj == 1, pj, 1.0 - pj), (d_hj == 1).astype(np.float64))
+        pb = np.clip(c.prec2[a2d, np.clip(d_mb, 0, N_MOVS - 1)], 0, 100) / 100.0
+        pb = np.where(d_hb == 1, pb, 1.0 - pb)
+        p = np.where(d_mb < nm2, pj * pb / nm2, 0.0)
+        vale = p > 0
+        d_par, d_est, d_acc, d_mb, d_hj, d_hb, p = (x[vale] for x in (d_par, d_est, d_acc, d_mb, d_hj, d_hb, p))
+
+        # resolver todos los desenlaces en un solo paso de VectorCombate
+        c.fijar_estados(a1[d_est], v1[d_est], h1[d_est], a2[d_est], h2[d_est])
+        r, done = c.step_rl(d_acc, mov_b=d_mb,
+                            tirada_j=np.where(d_hj == 1, _ACIERTA, _FALLA),
+                            tirada_b=np.where(d_hb == 1, _ACIERTA, _FALLA))
+        gana = done & c.agent_won()
+        pierde = done & ~c.agent_won()
+        R.append(np.bincount(d_par, p * r, len(e_sa)))
+        p_victoria.append(np.bincount(d_par, p * gana, len(e_sa)))
+        p_derrota.append(np.bincount(d_par, p * pierde, len(e_sa)))
+
+        sigue = ~done
+        h1n, h2n = c.vida1[sigue], c.vida2[sigue]
+        if discretizar:
+            h1n = _discretizar(h1n, c.hp_total1[c.activo1[sigue]], discretizar, n_buckets)
+            h2n = _discretizar(h2n, c.hp_total2[c.activo2[sigue]], discretizar, n_buckets)
+        a1n, v1n, a2n = c.activo1[sigue], c.vivos1[sigue], c.activo2[sigue]
+        filas.append(pares[d_par[sigue]])
+        cols.append(np.array(registrar(a1n, v1n, h1n, a2n, h2n), dtype=np.int64))
+        probs.append(p[sigue])
+        if len(indice) > max_estados:
+            raise MemoryError(f"más de {max_estados} estados alcanzables; prueba con discretizar=n")
+
+    n_estados = len(indice)
+    P = sparse.csr_matrix((np.concatenate(probs), (np.concatenate(filas), np.concatenate(cols))),
+                          shape=(n_sa, n_estados))   # los duplicados se suman
+    estados = {nombre: np.array(col) for nombre, col in
+               zip(("activo1", "vivos1", "vida1", "activo2", "vida2"), columnas)}
+    c.fijar_estados(*(estados[n] for n in ("activo1", "vivos1", "vida1", "activo2", "vida2")))
+    obs = env.observations()
+    return ModeloCombate(estados, obs, np.concatenate(sa_estado), np.concatenate(sa_accion), P,
+                         np.concatenate(R), np.concatenate(p_victoria), np.concatenate(p_derrota),
+                         indice, c.hp_total1, c.hp_total2, n_buckets, discretizar)
@@ -3,15 +3,36 @@
 Plot all training/eval figures for the RL Pokémon project.
 
 Usage:
-  python analysis/plot_all.py --logs logs --db optuna_studies.db --out docs --ma 100
+  python plots.py --logs logs --db optuna_studies.db --out docs --ma 100 [--incremental]
+
+Runs are the CSV logs in --logs and the .metrics/ chunk directories written by
+utils.metrics_sink. Long curves are downsampled with LTTB (--max-points) before
+plotting, and the figures are rendered in a process pool (--workers).
+
+--incremental keeps a cache in <out>/cache:
+  - per run: the parsed columns, moving averages, summary and the file's size/mtime.
+    An unchanged run is neither re-read nor re-plotted; a CSV that only grew is read
+    from the byte offset where the last pass stopped (only new rows), and a .metrics
+    directory only loads its new chunks. Anything else is re-read from scratch.
+  - Optuna: the flattened trials, a trial_id watermark and the ids of trials that were
+    still running. Only trials above the watermark, or running last time, are queried.
 """
 
 import argparse
 import math
+import os
+import pickle
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import sqlite3
+
+# matplotlib is imported only where figures are drawn (the pool workers)
+CACHE_VERSION = 1
+METRICS_EXT = ".metrics"
+_FINISHED_STATES = ("COMPLETE", "PRUNED", "FAIL")
 
 # ---------- helpers ----------
 def ensure_dirs(outdir: Path):
@@ -19,103 +40,337 @@ def ensure_dirs(outdir: Path):
     (outdir / "tables").mkdir(parents=True, exist_ok=True)
 
 def moving_average(x, w):
+    """Trailing mean over w points (shorter at the start), like rolling(w, min_periods=1)."""
+    x = np.asarray(x, dtype=np.float64)
     if w <= 1:
         return x
-    return x.rolling(window=w, min_periods=1, center=False).mean()
+    cs = np.concatenate([[0.0], np.cumsum(x)])
+    i = np.arange(1, len(x) + 1)
+    lo = np.maximum(0, i - w)
+    return (cs[i] - cs[lo]) / (i - lo)
+
+def extend_moving_average(x, ma_old, w):
+    """moving_average(x, w) reusing the first len(ma_old) values (x only grew)."""
+    n_old = len(ma_old)
+    if w <= 1 or n_old == 0:
+        return moving_average(x, w)
+    # only the last w - 1 old points are needed as history for the new windows
+    start = max(0, n_old - w + 1)
+    cs = np.concatenate([[0.0], np.cumsum(np.asarray(x[start:], dtype=np.float64))])
+    i = np.arange(n_old, len(x)) + 1          # window ends, 1-based over the whole series
+    lo = np.maximum(0, i - w)
+    new = (cs[i - start] - cs[lo - start]) / (i - lo)
+    return np.concatenate([ma_old, new])
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling to n_out points (keeps first/last and
+    the visual peaks). NaN points are dropped first.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ok = ~np.isnan(y)
+    x, y = x[ok], y[ok]
+    n = len(x)
+    if n_out <= 2 or n <= n_out:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # average of the next bucket (the last point for the last bucket)
+        nlo, nhi = (edges[b + 1], edges[b + 2]) if b + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[b + 1] = a
+    return x[idx], y[idx]
 
-def simple_line(df, x, y, title, outpath, ma=None):
+def _downsample(x, y, max_points):
+    if max_points and len(x) > max_points:
+        return lttb(x, y, max_points)
+    y = np.asarray(y, dtype=np.float64)
+    ok = ~np.isnan(y)
+    return np.asarray(x)[ok], y[ok]
+
+def simple_line(series, title, xlabel, ylabel, outpath):
+    """series: [(x, y, label, alpha)], already downsampled. Runs in the pool workers."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
     plt.figure()
-    if ma and y in df.columns:
-        plt.plot(df[x], moving_average(df[y], ma), label=f"{y} (MA{ma})")
-        plt.plot(df[x], df[y], alpha=0.25, label=y)
+    for x, y, label, alpha in series:
+        plt.plot(x, y, label=label, alpha=alpha)
+    if len(series) > 1:
         plt.legend()
-    else:
-        plt.plot(df[x], df[y])
     plt.title(title)
-    plt.xlabel(x)
-    plt.ylabel(y)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
     plt.tight_layout()
     plt.savefig(outpath)
     plt.close()
 
+def bar_plot(labels, values, title, xlabel, ylabel, outpath):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    plt.figure()
+    plt.bar(labels, values)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.tight_layout()
+    plt.savefig(outpath)
+    plt.close()
+
+def _render(job):
+    kind, args = job
+    (simple_line if kind == "line" else bar_plot)(*args)
+    return args[-1]
+
+def render_all(jobs, workers: int):
+    """Renders [(kind, args)] in a process pool (inline with workers <= 1)."""
+    if not jobs:
+        return
+    if workers <= 1 or len(jobs) == 1:
+        for job in jobs:
+            _render(job)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        for _ in pool.map(_render, jobs, chunksize=max(1, len(jobs) // (4 * workers))):
+            pass
+
 def save_preview_table(df: pd.DataFrame, out_csv: Path, n=10):
     df.head(n).to_csv(out_csv, index=False)
 
+def _load_cache(path: Path):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        return data if data.get("version") == CACHE_VERSION else None
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def _save_cache(path: Path, data: dict):
+    data["version"] = CACHE_VERSION
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+# ---------- reading runs (full or incremental) ----------
+def _columns_of(df: pd.DataFrame) -> dict:
+    return {k: df[k].to_numpy() for k in df.columns}
+
+def _concat_columns(old: dict, new: dict) -> dict:
+    if not old:
+        return new
+    return {k: np.concatenate([old[k], new[k]]) if k in new else old[k] for k in old}
+
+def _read_csv_run(path: Path, cached):
+    """
+    (columns, file state, changed) of a CSV run. With `cached`, an unchanged size/mtime
+    reads nothing and a file that only grew is parsed from the cached byte offset.
+    """
+    st = path.stat()
+    state = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    with open(path, "rb") as f:
+        if cached is not None:
+            old = cached["file"]
+            if (old["size"], old["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+                return cached["columns"], old, False
+            if st.st_size >= old["offset"] and _tail(f, old["offset"]) == old["tail"]:
+                # the file only grew: parse the new complete lines
+                f.seek(old["offset"])
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                cols = cached["columns"]
+                if end:
+                    df = pd.read_csv(BytesIO(data[:end]), header=None, names=old["header"])
+                    cols = _concat_columns(cols, _columns_of(df))
+                offset = old["offset"] + end
+                state.update(offset=offset, header=old["header"], tail=_tail(f, offset))
+                return cols, state, True
+            f.seek(0)
+        data = f.read()
+        # a half-written last line is left for the next pass
+        end = data.rfind(b"\n") + 1
+        df = pd.read_csv(BytesIO(data[:end]))
+        state.update(offset=end, header=list(df.columns), tail=_tail(f, end))
+    return _columns_of(df), state, True
+
+def _tail(f, offset, n=64):
+    """Last bytes before offset: checked on the next pass to make sure the file only grew."""
+    f.seek(max(0, offset - n))
+    return f.read(offset - max(0, offset - n))
+
+def _read_metrics_run(path: Path, cached):
+    """(columns, state, changed) of a .metrics directory; only chunks not seen before are loaded."""
+    from utils.metrics_sink import chunk_paths
+    chunks = [(os.path.basename(p), os.path.getsize(p)) for p in chunk_paths(str(path))]
+    if cached is not None:
+        seen = cached["file"]["chunks"]
+        if chunks == seen:
+            return cached["columns"], cached["file"], False
+        if chunks[:len(seen)] == seen:
+            cols, todo = cached["columns"], chunks[len(seen):]
+        else:
+            cols, todo = {}, chunks
+    else:
+        cols, todo = {}, chunks
+    for name, _ in todo:
+        with np.load(path / name) as z:
+            cols = _concat_columns(cols, {k: z[k] for k in z.files})
+    return cols, {"chunks": chunks}, True
+
+def _summary(run_name: str, cols: dict) -> dict:
+    n = len(cols["episode"])
+    def last(k):
+        return cols[k][-1] if k in cols and n else None
+    def last_float(k):
+        v = last(k)
+        return float(v) if v is not None and not math.isnan(v) else None
+    return {
+        "run": run_name,
+        "episodes": int(cols["episode"].max()),
+        "final_train_return": float(last("train_return")) if "train_return" in cols else None,
+        "final_episode_length": float(last("episode_length")) if "episode_length" in cols else None,
+        "final_epsilon": float(last("epsilon")) if "epsilon" in cols else None,
+        "final_eval_winrate": last_float("eval_winrate"),
+        "final_eval_return": last_float("eval_return"),
+        "max_q_rows": int(cols["q_rows"].max()) if "q_rows" in cols else None,
+    }
+
 # ---------- per-run figures ----------
-def plot_run(csv_path: Path, outdir: Path, ma_win: int):
-    run_name = csv_path.stem
-    df = pd.read_csv(csv_path)
+_MA_COLUMNS = ("train_return", "episode_length")
+
+def _run_cache_path(cache_dir: Path, path: Path) -> Path:
+    suffix = ".m" if path.suffix == METRICS_EXT else ""
+    return cache_dir / "runs" / f"{_run_name(path)}{suffix}.pkl"
+
+def _run_name(path: Path) -> str:
+    return path.name[:-len(METRICS_EXT)] if path.suffix == METRICS_EXT else path.stem
+
+def _with_aliases(cols: dict) -> dict:
+    # map alternative names
+    if "steps" in cols and "episode_length" not in cols:
+        cols = dict(cols, episode_length=cols["steps"])
+    return cols
+
+def load_run(path: Path, ma_win: int, cache_dir: Path = None):
+    """
+    Columns, moving averages and summary of a run (CSV file or .metrics directory).
+    Returns (run, changed): run is the cache entry, changed False if nothing new was read.
+    """
+    cache_path = _run_cache_path(cache_dir, path) if cache_dir else None
+    cached = _load_cache(cache_path) if cache_path else None
+    reader = _read_metrics_run if path.is_dir() else _read_csv_run
+    raw, state, changed = reader(path, cached)
+    if not changed and cached["ma_win"] == ma_win:
+        return cached, False
     # normalize expected columns
     # typical columns: episode, train_return, steps|episode_length, epsilon, q_rows, eval_winrate, eval_return
-    if "episode" not in df.columns:
-        raise ValueError(f"{csv_path} has no 'episode' column.")
-    # map alternative names
-    if "steps" in df.columns and "episode_length" not in df.columns:
-        df["episode_length"] = df["steps"]
+    if "episode" not in raw:
+        raise ValueError(f"{path} has no 'episode' column.")
+    cols = _with_aliases(raw)
+
+    old_ma = cached["ma"] if cached is not None and cached["ma_win"] == ma_win else {}
+    ma = {}
+    for k in _MA_COLUMNS:
+        if k in cols:
+            prev = old_ma.get(k)
+            if prev is not None and len(prev) <= len(cols[k]):
+                ma[k] = extend_moving_average(cols[k], prev, ma_win)
+            else:
+                ma[k] = moving_average(cols[k], ma_win)
+    run = {"name": _run_name(path), "file": state, "columns": raw, "ma": ma, "ma_win": ma_win,
+           "summary": _summary(_run_name(path), cols), "rendered": None}
+    if cache_path:
+        _save_cache(cache_path, run)
+    return run, True
 
+def run_jobs(run: dict, outdir: Path, ma_win: int, max_points: int):
+    """Figure jobs of one run (data already downsampled, so the pool ships little)."""
+    cols, ma, name = _with_aliases(run["columns"]), run["ma"], run["name"]
     figs = outdir / "figs"
-    # Train return
-    if "train_return" in df.columns:
-        simple_line(df, "episode", "train_return",
-                    f"{run_name}: Train return per episode",
-                    figs / f"{run_name}_train_return.png",
-                    ma=ma_win)
-    # Episode length
-    if "episode_length" in df.columns:
-        simple_line(df, "episode", "episode_length",
-                    f"{run_name}: Episode length",
-                    figs / f"{run_name}_episode_length.png",
-                    ma=ma_win)
-    # Epsilon
-    if "epsilon" in df.columns:
-        simple_line(df, "episode", "epsilon",
-                    f"{run_name}: Epsilon schedule",
-                    figs / f"{run_name}_epsilon.png")
-    # Greedy eval win-rate
-    if "eval_winrate" in df.columns and df["eval_winrate"].notna().any():
-        simple_line(df[df["eval_winrate"].notna()], "episode", "eval_winrate",
-                    f"{run_name}: Greedy eval win-rate",
-                    figs / f"{run_name}_eval_winrate.png")
-    # Q rows (visited states proxy)
-    if "q_rows" in df.columns and df["q_rows"].notna().any():
-        simple_line(df, "episode", "q_rows",
-                    f"{run_name}: Unique Q rows (state coverage proxy)",
-                    figs / f"{run_name}_q_rows.png")
-
-    # Save a tiny summary for the appendix
-    last = df.tail(1).to_dict(orient="records")[0]
-    summary = {
-        "run": run_name,
-        "episodes": int(df["episode"].max()),
-        "final_train_return": float(last.get("train_return")) if "train_return" in df.columns else None,
-        "final_episode_length": float(last.get("episode_length")) if "episode_length" in df.columns else None,
-        "final_epsilon": float(last.get("epsilon")) if "epsilon" in df.columns else None,
-        "final_eval_winrate": float(last.get("eval_winrate")) if "eval_winrate" in df.columns and not math.isnan(last.get("eval_winrate", float("nan"))) else None,
-        "final_eval_return": float(last.get("eval_return")) if "eval_return" in df.columns and not math.isnan(last.get("eval_return", float("nan"))) else None,
-        "max_q_rows": int(df["q_rows"].max()) if "q_rows" in df.columns else None,
-    }
-    return summary
+    ep = cols["episode"]
+    jobs = []
+    def line(y_key, title, fname, with_ma=False, rows=None):
+        x, y = (ep, cols[y_key]) if rows is None else (ep[rows], cols[y_key][rows])
+        if with_ma and ma_win and y_key in ma:
+            series = [(*_downsample(ep, ma[y_key], max_points), f"{y_key} (MA{ma_win})", 1.0),
+                      (*_downsample(x, y, max_points), y_key, 0.25)]
+        else:
+            series = [(*_downsample(x, y, max_points), y_key, 1.0)]
+        jobs.append(("line", (series, f"{name}: {title}", "episode", y_key, str(figs / f"{name}_{fname}.png"))))
+    if "train_return" in cols:
+        line("train_return", "Train return per episode", "train_return", with_ma=True)
+    if "episode_length" in cols:
+        line("episode_length", "Episode length", "episode_length", with_ma=True)
+    if "epsilon" in cols:
+        line("epsilon", "Epsilon schedule", "epsilon")
+    if "eval_winrate" in cols and not np.isnan(cols["eval_winrate"]).all():
+        line("eval_winrate", "Greedy eval win-rate", "eval_winrate", rows=~np.isnan(cols["eval_winrate"]))
+    if "q_rows" in cols:
+        line("q_rows", "Unique Q rows (state coverage proxy)", "q_rows")
+    return jobs
+
+def plot_run(csv_path: Path, outdir: Path, ma_win: int, max_points: int = 5000):
+    """Reads one run, renders its figures (in this process) and returns its summary."""
+    run, _ = load_run(Path(csv_path), ma_win)
+    render_all(run_jobs(run, outdir, ma_win, max_points), workers=1)
+    return run["summary"]
 
 # ---------- optuna ----------
-def analyze_optuna(db_path: Path, outdir: Path, study_like: str = ""):
-    if not db_path.exists():
-        return None
+_TRIALS_SQL = """
+    SELECT s.study_name, t.trial_id, t.number AS trial_number, t.state,
+           tv.value, tp.param_name, tp.param_value
+    FROM trials t
+    LEFT JOIN trial_values tv ON t.trial_id = tv.trial_id
+    LEFT JOIN trial_params tp ON t.trial_id = tp.trial_id
+    LEFT JOIN studies s ON s.study_id = t.study_id
+    WHERE t.trial_id > ? {pending}
+"""
+
+def load_optuna_trials(db_path: Path, cache_dir: Path = None):
+    """
+    Flattened trials x params x values of the whole DB. With a cache only trials above
+    the watermark (highest trial_id read) are queried, plus the ones that had not
+    finished yet last time (their values and params can still change).
+    """
+    cache_path = cache_dir / "optuna.pkl" if cache_dir else None
+    cached = _load_cache(cache_path) if cache_path else None
+    if cached is not None and cached.get("db") != str(db_path.resolve()):
+        cached = None
+    watermark = cached["watermark"] if cached is not None else -1
+    pending = cached["pending"] if cached is not None else []
+    sql = _TRIALS_SQL.format(pending=f"OR t.trial_id IN ({','.join('?' * len(pending))})" if pending else "")
     con = sqlite3.connect(db_path)
     try:
         studies = pd.read_sql_query("SELECT study_id, study_name FROM studies;", con)
-        trials = pd.read_sql_query(
-            """
-            SELECT s.study_name, t.trial_id, t.number AS trial_number, t.state,
-                   tv.value, tp.param_name, tp.param_value
-            FROM trials t
-            LEFT JOIN trial_values tv ON t.trial_id = tv.trial_id
-            LEFT JOIN trial_params tp ON t.trial_id = tp.trial_id
-            LEFT JOIN studies s ON s.study_id = t.study_id
-            """,
-            con,
-        )
+        new = pd.read_sql_query(sql, con, params=(watermark, *pending))
     finally:
         con.close()
+    if cached is None:
+        trials = new
+    else:
+        old = cached["trials"]
+        trials = pd.concat([old[~old["trial_id"].isin(pending)], new], ignore_index=True)
+    if cache_path:
+        if len(new):
+            watermark = max(watermark, int(new["trial_id"].max()))
+        pending = sorted(set(new.loc[~new["state"].isin(_FINISHED_STATES), "trial_id"].tolist()))
+        _save_cache(cache_path, {"db": str(db_path.resolve()), "watermark": watermark,
+                                 "pending": pending, "trials": trials})
+    return studies, trials
+
+def analyze_optuna(db_path: Path, outdir: Path, study_like: str = "", cache_dir: Path = None, workers: int = 1):
+    if not db_path.exists():
+        return None
+    studies, trials = load_optuna_trials(db_path, cache_dir)
     if trials.empty:
         return None
 
@@ -132,20 +387,25 @@ def analyze_optuna(db_path: Path, outdir: Path, study_like: str = ""):
     best.to_csv(outdir / "tables" / "optuna_top10.csv", index=False)
 
     # bar plot of top values by study (first 10 rows)
+    jobs = []
     for study in best["study_name"].unique():
         sub = best[best["study_name"] == study]
-        plt.figure()
-        plt.bar(sub["trial_number"].astype(str), sub["value"])
-        plt.title(f"Optuna top trials — {study}")
-        plt.xlabel("trial_number")
-        plt.ylabel("objective value")
-        plt.tight_layout()
-        plt.savefig(outdir / "figs" / f"optuna_top_{study.replace(' ','_')}.png")
-        plt.close()
+        jobs.append(("bar", (sub["trial_number"].astype(str).tolist(), sub["value"].tolist(),
+                             f"Optuna top trials — {study}", "trial_number", "objective value",
+                             str(outdir / "figs" / f"optuna_top_{study.replace(' ','_')}.png"))))
+    render_all(jobs, workers)
 
     return {"studies": studies, "best": best}
 
 # ---------- main ----------
+def find_runs(logs_dir: Path):
+    """CSV logs plus .metrics directories that have no CSV export next to them."""
+    csvs = sorted(logs_dir.glob("*.csv"))
+    names = {p.stem for p in csvs}
+    dirs = sorted(p for p in logs_dir.glob("*" + METRICS_EXT)
+                  if p.is_dir() and p.name[:-len(METRICS_EXT)] not in names)
+    return csvs + dirs
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--logs", type=str, default="./logs", help="logs directory")
@@ -153,25 +413,46 @@ def main():
     ap.add_argument("--out", type=str, default="./plots", help="output directory")
     ap.add_argument("--ma", type=int, default=100, help="moving average window (episodes)")
     ap.add_argument("--study_like", type=str, default="", help="filter study names containing this string")
+    ap.add_argument("--incremental", action="store_true",
+                    help="reuse <out>/cache: skip unchanged runs, read only new rows/chunks/trials")
+    ap.add_argument("--max-points", type=int, default=5000, help="LTTB downsampling per curve (0 = off)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes rendering figures")
     args = ap.parse_args()
 
     logs_dir = Path(args.logs)
     outdir = Path(args.out)
     ensure_dirs(outdir)
+    cache_dir = outdir / "cache" if args.incremental else None
 
-    # Plot each run
-    summaries = []
-    for csv in sorted(logs_dir.glob("*.csv")):
+    # Read each run (cached runs only read what is new) and queue its figures
+    summaries, jobs, skipped, to_mark = [], [], 0, []
+    key = (args.ma, args.max_points)
+    for path in find_runs(logs_dir):
         try:
-            summaries.append(plot_run(csv, outdir, args.ma))
+            run, changed = load_run(path, args.ma, cache_dir)
         except Exception as e:
-            print(f"[WARN] Skipping {csv.name}: {e}")
+            print(f"[WARN] Skipping {path.name}: {e}")
+            continue
+        summaries.append(run["summary"])
+        if not changed and run.get("rendered") == key:
+            skipped += 1
+            continue
+        jobs.extend(run_jobs(run, outdir, args.ma, args.max_points))
+        to_mark.append((path, run))
+    render_all(jobs, args.workers)
+    # only once the figures exist: a failed or interrupted render is retried next pass
+    if cache_dir is not None:
+        for path, run in to_mark:
+            run["rendered"] = key
+            _save_cache(_run_cache_path(cache_dir, path), run)
+    if skipped:
+        print(f"[cache] {skipped} unchanged run(s) not re-plotted")
 
     if summaries:
         pd.DataFrame(summaries).to_csv(outdir / "tables" / "training_summaries.csv", index=False)
 
     # Optuna
-    analyze_optuna(Path(args.db), outdir, study_like=args.study_like)
+    analyze_optuna(Path(args.db), outdir, study_like=args.study_like, cache_dir=cache_dir, workers=args.workers)
 
     print(f"Done. Figures -> {outdir/'figs'}, Tables -> {outdir/'tables'}")
 
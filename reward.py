@@ -1,8 +1,9 @@
 # reward.py
 from typing import Optional
 from types import SimpleNamespace
-from danio import calcular_efectividad
+from tabla_tipos import efectividad_total
 import math
+import numpy as np
 
 """
 We're trying to design a reward function that encourages the agent to win battles
@@ -29,28 +30,18 @@ STEP_PENALTY     = 0.01   # small per-step negative to discourage stalling
 CLIP_PER_STEP    = 2.0    # clip shaping to ±2 before adding big terminal bonuses
 # ----------------------------------------------------------------
 
-def _ensure_hp_max(poke) -> float:
+def _hp_max(poke) -> float:
     """
-    Cache a per-Pokémon max HP on first sight.
-    We store it as an attribute so we don't need schema changes.
+    Max HP of a Pokémon: its base hp (the battle keeps current HP in Combate, so
+    Pokemon.hp is never modified). Pure: the shared Pokemon objects are not touched.
     """
     if poke is None:
         return 1.0
-    if not hasattr(poke, "_hp_max"):
-        # first time we see this Pokémon in the battle, assume current hp is max
-        # (your engine should set hp at reset/start)
-        setattr(poke, "_hp_max", float(max(1, getattr(poke, "hp", 1))))
-    return float(getattr(poke, "_hp_max"))
+    return float(max(1, getattr(poke, "hp", 1)))
 
 def _eff_mult(att_type: Optional[str], def_t1: Optional[str], def_t2: Optional[str]) -> float:
-    """Multiplicative offensive effectiveness with safe defaults."""
-    def e(att, d):
-        if att is None or d is None:
-            return 1.0
-        return float(calcular_efectividad(att, d))
-    if att_type is None:
-        return 1.0
-    return e(att_type, def_t1) * e(att_type, def_t2)
+    """Multiplicative offensive effectiveness with safe defaults (None -> neutral)."""
+    return efectividad_total(att_type, def_t1, def_t2)
 
 def _best_offensive_eff(attacker, defender) -> float:
     """Best available offensive effectiveness among attacker's moves."""
@@ -86,32 +77,59 @@ def calcular_reward_turno(
     # Which defender to evaluate against (if they switched this turn)?
     opp_eval = oponente_pre_cambio if oponente_pre_cambio is not None else pokemon_oponente
 
-    # --- percentage damage wrt MAX hp (stable shaping) ---
-    opp_max = _ensure_hp_max(opp_eval)
-    our_max = _ensure_hp_max(pokemon_jugador)
+    cambio = getattr(movimiento_jugador, "name", "") == "Cambio"
+    if cambio:
+        best_eff, off_eff, def_eff = _best_offensive_eff(pokemon_jugador, opp_eval), 1.0, 1.0
+    else:
+        best_eff = 1.0
+        off_eff = _current_move_eff(movimiento_jugador, opp_eval)
+        # defensive: opponent's move into us (if None, treat neutral)
+        def_eff = _current_move_eff(movimiento_oponente, pokemon_jugador) if movimiento_oponente else 1.0
+    return reward_turno_valores(
+        danio_hecho, danio_recibido, _hp_max(opp_eval), _hp_max(pokemon_jugador),
+        cambio, best_eff, off_eff, def_eff,
+        vida_oponente_antes_ko is not None, vida_jugador_antes_ko is not None,
+        done, agent_won,
+    )
 
-    pct_dmg_dealt    = float(danio_hecho)    / max(1.0, opp_max)
-    pct_dmg_received = float(danio_recibido) / max(1.0, our_max)
+
+def reward_turno_valores(
+    danio_hecho: float,
+    danio_recibido: float,
+    opp_hp_max: float,          # max HP of the opponent that started the turn
+    our_hp_max: float,          # max HP of our active AFTER resolution
+    cambio: bool,               # agent switched (or did not attack)
+    best_eff: float,            # best offensive eff of our active vs opponent (switch case)
+    off_eff: float,             # eff of our move vs opponent (move case)
+    def_eff: float,             # eff of the opponent's move vs our active
+    ko_hecho: bool,
+    ko_recibido: bool,
+    done: bool = False,
+    agent_won: Optional[bool] = None,
+) -> float:
+    """
+    calcular_reward_turno from plain numbers (no Pokemon objects): the core shared with
+    the pure transition of estado_combate. Same terms and float operation order.
+    """
+    # --- percentage damage wrt MAX hp (stable shaping) ---
+    pct_dmg_dealt    = float(danio_hecho)    / max(1.0, opp_hp_max)
+    pct_dmg_received = float(danio_recibido) / max(1.0, our_hp_max)
 
     # --- KO shaping (non-terminal) ---
     ko_term = 0.0
-    if vida_oponente_antes_ko is not None:
+    if ko_hecho:
         ko_term += KILL_BONUS
-    if vida_jugador_antes_ko is not None:
+    if ko_recibido:
         ko_term -= DEATH_PENALTY
 
     # --- effectiveness shaping ---
     # if we switched, reward only if the NEW active has a better offensive matchup than neutral
-    if getattr(movimiento_jugador, "name", "") == "Cambio":
+    if cambio:
         # reward proportional to how much better than neutral (1.0) our best move could be now
-        best_eff = _best_offensive_eff(pokemon_jugador, opp_eval)
         switch_gain = max(0.0, best_eff - 1.0)
         eff_term = W_SWITCH_BENEFIT * switch_gain
     else:
         # offensive vs defensive effectiveness ratio (centered at 0 by subtracting 1.0)
-        off_eff = _current_move_eff(movimiento_jugador, opp_eval)
-        # defensive: opponent's move into us (if None, treat neutral)
-        def_eff = _current_move_eff(movimiento_oponente, pokemon_jugador) if movimiento_oponente else 1.0
         if def_eff <= 0:
             def_eff = 0.01
         eff_ratio = off_eff / def_eff
@@ -130,4 +148,43 @@ def calcular_reward_turno(
     if done and agent_won is not None:
         terminal = WIN_BONUS if agent_won else -LOSE_PENALTY
 
-    return shaping + terminal
\ No newline at end of file
+    return shaping + terminal
+
+
+def calcular_reward_turno_batch(
+    danio_hecho: np.ndarray,      # [N] damage dealt by the agent this turn
+    danio_recibido: np.ndarray,   # [N] damage received this turn
+    opp_hp_max: np.ndarray,       # [N] max HP of the opponent that started the turn
+    our_hp_max: np.ndarray,       # [N] max HP of our active AFTER resolution
+    cambio: np.ndarray,           # [N] bool, agent switched (movimiento_jugador is "Cambio")
+    best_eff: np.ndarray,         # [N] best offensive eff of our active vs opponent (switch case)
+    off_eff: np.ndarray,          # [N] eff of our move vs opponent (move case)
+    def_eff: np.ndarray,          # [N] eff of the opponent's move vs our active
+    ko_hecho: np.ndarray,         # [N] bool, we KO'd the opponent this turn
+    ko_recibido: np.ndarray,      # [N] bool, our active was KO'd this turn
+    done: np.ndarray,             # [N] bool, battle ended
+    agent_won: np.ndarray,        # [N] bool, agent won (only read where done)
+) -> np.ndarray:
+    """
+    Vectorized calcular_reward_turno for N battles at once.
+    Same terms, weights and float operation order as the scalar version, so
+    both give bit-identical rewards for the same turn.
+    """
+    opp_max = np.maximum(1.0, np.maximum(1, opp_hp_max).astype(np.float64))
+    our_max = np.maximum(1.0, np.maximum(1, our_hp_max).astype(np.float64))
+    pct_dmg_dealt    = danio_hecho.astype(np.float64)    / opp_max
+    pct_dmg_received = danio_recibido.astype(np.float64) / our_max
+
+    ko_term = np.where(ko_hecho, KILL_BONUS, 0.0) - np.where(ko_recibido, DEATH_PENALTY, 0.0)
+
+    switch_term = W_SWITCH_BENEFIT * np.maximum(0.0, best_eff - 1.0)
+    def_eff = np.where(def_eff <= 0, 0.01, def_eff)
+    move_term = W_EFF * (off_eff / def_eff - 1.0)
+    eff_term = np.where(cambio, switch_term, move_term)
+
+    dmg_term = W_DMG * (pct_dmg_dealt - pct_dmg_received)
+    shaping = dmg_term + eff_term + ko_term + (-STEP_PENALTY)
+    shaping = np.clip(shaping, -CLIP_PER_STEP, CLIP_PER_STEP)
+
+    terminal = np.where(done, np.where(agent_won, WIN_BONUS, -LOSE_PENALTY), 0.0)
+    return shaping + terminal
@@ -0,0 +1,113 @@
+# rl_agents/evaluation.py
+"""
+Greedy (ε = 0) evaluation of a tabular agent, shared by the training and tuning scripts.
+
+The K episodes are played in lockstep over a VectorPokemonEnv: every step gathers the
+Q rows of all running battles at once and takes a masked argmax (ties -> lowest legal
+action, like legal[np.argmax(q[legal])]). Each env plays a fixed quota of episodes, so
+short battles are not over-represented in the sample.
+
+A win is always "the battle ended and the bot has no pokémon left"; truncated episodes
+count as not won.
+"""
+from dataclasses import dataclass
+import math
+from typing import Optional
+import numpy as np
+
+from rl_env.vector_pokemon_env import VectorPokemonEnv
+
+MAX_EVAL_ENVS = 256
+Z_95 = 1.959963984540054
+
+
+@dataclass(frozen=True)
+class EvalResult:
+    episodes: int
+    win_rate: float
+    win_ci: tuple          # Wilson 95% interval of win_rate
+    mean_return: float
+    return_ci: tuple       # normal-approximation 95% interval of mean_return
+    mean_length: float
+    std_length: float
+    min_length: int
+    max_length: int
+
+    def __str__(self):
+        return (f"win-rate {self.win_rate:.3f} [{self.win_ci[0]:.3f}, {self.win_ci[1]:.3f}] | "
+                f"return {self.mean_return:.3f} [{self.return_ci[0]:.3f}, {self.return_ci[1]:.3f}] | "
+                f"length {self.mean_length:.1f}±{self.std_length:.1f} ({self.min_length}-{self.max_length}) "
+                f"| n={self.episodes}")
+
+
+def wilson_interval(wins: int, n: int, z: float = Z_95) -> tuple:
+    if n == 0:
+        return (0.0, 1.0)
+    p = wins / n
+    den = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / den
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / den
+    return (max(0.0, centre - half), min(1.0, centre + half))
+
+
+def greedy_actions(Q, states: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    """Masked argmax over the Q rows of a batch of states (dense table or dict of rows)."""
+    if hasattr(Q, "greedy"):
+        return Q.greedy(states, masks)
+    # dict-backed table: unseen states read as zeros (and are not inserted)
+    zero = np.zeros(masks.shape[1], dtype=np.float32)
+    q = np.stack([Q.get(int(s), zero) for s in states])
+    return np.argmax(np.where(masks, q, -np.inf), axis=1)
+
+
+def make_eval_env(episodes: int = 100, n_buckets: int = 5, max_steps: int = 200) -> VectorPokemonEnv:
+    """Vector env sized for `episodes` (reuse it across periodic evaluations)."""
+    return VectorPokemonEnv(min(episodes, MAX_EVAL_ENVS), n_buckets=n_buckets, max_steps=max_steps)
+
+
+def evaluate(agent, episodes: int = 100, seed: int = 123,
+             venv: Optional[VectorPokemonEnv] = None, max_steps: int = 200) -> EvalResult:
+    """
+    Plays `episodes` greedy episodes of agent (anything with a .Q table) and returns
+    win rate, mean return and episode-length statistics with 95% confidence intervals.
+    """
+    if venv is None:
+        venv = make_eval_env(episodes, max_steps=max_steps)
+    n = venv.num_envs
+    quota = np.full(n, episodes // n, dtype=np.int64)
+    quota[:episodes % n] += 1
+
+    obs, info = venv.reset(seed=seed)
+    G = np.zeros(n)
+    length = np.zeros(n, dtype=np.int64)
+    returns, lengths, wins = [], [], 0
+    while quota.any():
+        a = greedy_actions(agent.Q, obs, info["action_mask"])
+        obs, r, terminated, truncated, info = venv.step(a)
+        G += r
+        length += 1
+        done = terminated | truncated
+        if done.any():
+            fin = np.flatnonzero(done & (quota > 0))
+            returns.extend(G[fin].tolist())
+            lengths.extend(length[fin].tolist())
+            wins += int(info["agent_won"][fin].sum())
+            quota[fin] -= 1
+            G[done] = 0.0
+            length[done] = 0
+
+    rets = np.asarray(returns)
+    lens = np.asarray(lengths)
+    half = Z_95 * rets.std(ddof=1) / math.sqrt(episodes) if episodes > 1 else float("inf")
+    mean_ret = float(rets.mean())
+    return EvalResult(
+        episodes=episodes,
+        win_rate=wins / episodes,
+        win_ci=wilson_interval(wins, episodes),
+        mean_return=mean_ret,
+        return_ci=(mean_ret - half, mean_ret + half),
+        mean_length=float(lens.mean()),
+        std_length=float(lens.std()),
+        min_length=int(lens.min()),
+        max_length=int(lens.max()),
+    )
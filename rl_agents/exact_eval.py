@@ -0,0 +1,90 @@
+# rl_agents/exact_eval.py
+"""
+Exact evaluation of a greedy Q-table policy against the random bot (no sampling).
+
+modelo_combate enumerates, with exact HP, only the battle states the greedy policy can
+reach (one action per state), which gives a Markov chain over battle states with two
+absorbing outcomes (win / loss); a few thousand states for a trained table, built in
+well under a second. Win and loss probabilities and the expected return come from
+sparse linear solves:
+
+    (I - P_pi) w = p_win_pi        (I - P_pi) v = R_pi
+
+States from which the policy never reaches the end of the battle (e.g. switching back
+and forth forever) make I - P_pi singular. They are found first by backward reachability
+and counted as "stalled": probability 0 of winning or losing, and they are left out of
+the solve. With horizon=T the chain is instead evaluated for T steps (the env's
+max_steps truncation), which is also exact and has no singular states.
+
+The result is deterministic, so Optuna objectives built on it carry no evaluation noise.
+hp_buckets rounds HP as in modelo_combate (smaller chain, no longer exact).
+"""
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order
+from scipy.sparse.linalg import spsolve
+
+from modelo_combate import ModeloCombate, construir_modelo
+from rl_agents.evaluation import greedy_actions
+
+
+@dataclass(frozen=True)
+class ExactEvalResult:
+    win_prob: float
+    loss_prob: float
+    stall_prob: float        # probability of never finishing (within `horizon` steps if given)
+    expected_return: float   # undiscounted; stalled states add nothing once reached
+    n_states: int
+    stalled_states: int
+
+    def __str__(self):
+        return (f"win {self.win_prob:.4f} | loss {self.loss_prob:.4f} | stall {self.stall_prob:.4f} | "
+                f"return {self.expected_return:.3f} | {self.n_states} states ({self.stalled_states} stalled)")
+
+
+def stalled_states(P_pi: sparse.csr_matrix, p_end: np.ndarray) -> np.ndarray:
+    """Bool [S]: states that cannot reach an absorbing outcome under the policy."""
+    n = P_pi.shape[0]
+    # reverse graph plus a virtual "end" node n pointing at every state that can finish
+    ends = np.flatnonzero(p_end > 0)
+    end_row = sparse.csr_matrix((np.ones(len(ends)), (np.zeros(len(ends), dtype=np.int64), ends)), shape=(1, n))
+    rev = sparse.bmat([[P_pi.T, sparse.csr_matrix((n, 1))],
+                       [end_row, sparse.csr_matrix((1, 1))]], format="csr")
+    reach = breadth_first_order(rev, n, directed=True, return_predecessors=False)
+    stalled = np.ones(n + 1, dtype=bool)
+    stalled[reach] = False
+    return stalled[:n]
+
+
+def evaluate_policy(model: ModeloCombate, sa: np.ndarray, horizon: Optional[int] = None) -> ExactEvalResult:
+    """Exact outcome probabilities and return of the policy given as one state-action pair per state."""
+    P_pi = model.P[sa].tocsr()
+    p_win, p_loss, r = model.p_victoria[sa], model.p_derrota[sa], model.R[sa]
+    n = model.n_estados
+    if horizon is not None:
+        w, l, v = np.zeros(n), np.zeros(n), np.zeros(n)
+        for _ in range(horizon):
+            w, l, v = p_win + P_pi @ w, p_loss + P_pi @ l, r + P_pi @ v
+        return ExactEvalResult(float(w[0]), float(l[0]), max(0.0, 1.0 - w[0] - l[0]), float(v[0]), n, 0)
+
+    stalled = stalled_states(P_pi, p_win + p_loss)
+    live = np.flatnonzero(~stalled)
+    w, l, v = np.zeros(n), np.zeros(n), np.zeros(n)
+    if len(live):
+        # from a live state the chain can still drift into stalled states: they count as 0
+        A = (sparse.identity(len(live), format="csc") - P_pi[live][:, live]).tocsc()
+        sol = spsolve(A, np.column_stack([p_win[live], p_loss[live], r[live]]))
+        sol = sol.reshape(len(live), 3)
+        w[live], l[live], v[live] = sol[:, 0], sol[:, 1], sol[:, 2]
+    stall = max(0.0, 1.0 - w[0] - l[0])
+    return ExactEvalResult(float(w[0]), float(l[0]), stall, float(v[0]), n, int(stalled.sum()))
+
+
+def exact_evaluate(agent, horizon: Optional[int] = None, n_buckets: int = 5,
+                   hp_buckets: Optional[int] = None) -> ExactEvalResult:
+    """Exact evaluation of agent's greedy policy (anything with a .Q table over observation ids)."""
+    chain = construir_modelo(n_buckets=n_buckets, discretizar=hp_buckets,
+                             politica=lambda obs, mask: greedy_actions(agent.Q, obs, mask))
+    return evaluate_policy(chain, np.arange(chain.n_estados), horizon)
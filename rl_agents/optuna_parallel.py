@@ -0,0 +1,148 @@
+# rl_agents/optuna_parallel.py
+"""
+Run an Optuna study on several cores.
+
+  storage  SQLite in WAL mode (readers do not block the writer) with a busy timeout,
+           plus retries while the database is still locked
+  trials   n_workers processes call study.optimize on the same stored study; a
+           MaxTrialsCallback stops all of them once n_trials trials have finished
+           (up to n_workers - 1 trials already running may still complete)
+  seeds    inside a trial the per-seed trainings run in a process pool and the running
+           mean is reported as each seed finishes, so the pruner still sees every step
+
+Objectives and per-seed functions cross process boundaries, so they must be picklable
+(top-level functions or functools.partial of them).
+"""
+import os, time, sqlite3, multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import optuna
+from sqlalchemy.exc import OperationalError
+
+SQLITE_TIMEOUT = 60   # seconds a connection waits for a lock before failing
+DEFAULT_STORAGE = "sqlite:///optuna_studies.db"
+
+def with_retry(fn, retries: int = 10, wait: float = 0.5):
+    """Call fn(), retrying with linear backoff while the storage reports a lock error."""
+    for i in range(retries):
+        try:
+            return fn()
+        except (OperationalError, optuna.exceptions.StorageInternalError):
+            if i == retries - 1:
+                raise
+            time.sleep(wait * (i + 1))
+
+def make_storage(url: str):
+    """RDBStorage safe for concurrent processes (WAL + busy timeout for SQLite)."""
+    if not url.startswith("sqlite:///"):
+        return url  # server databases handle concurrency themselves
+    path = url[len("sqlite:///"):]
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=SQLITE_TIMEOUT)
+    con.execute("PRAGMA journal_mode=WAL")  # persistent: stored in the database file
+    con.close()
+    return with_retry(lambda: optuna.storages.RDBStorage(
+        url,
+        engine_kwargs={"connect_args": {"timeout": SQLITE_TIMEOUT}},
+        heartbeat_interval=60,  # trials of a crashed worker are marked failed ...
+        failed_trial_callback=optuna.storages.RetryFailedTrialCallback(max_retry=2),  # ... and re-queued
+    ))
+
+# ---------- per-seed evaluation inside a trial ----------
+
+_seed_pool = None
+
+def _get_seed_pool(n_jobs: int) -> ProcessPoolExecutor:
+    global _seed_pool
+    if _seed_pool is None:
+        _seed_pool = ProcessPoolExecutor(max_workers=n_jobs)
+    return _seed_pool
+
+def shutdown_seed_pool():
+    """Stop the per-seed pool. Must run before a worker process exits: multiprocessing
+    joins child processes before the executor's own atexit hook could stop them."""
+    global _seed_pool
+    if _seed_pool is not None:
+        _seed_pool.shutdown(cancel_futures=True)
+        _seed_pool = None
+
+def mean_over_seeds(trial, fn, seeds, n_jobs: int = 1) -> float:
+    """
+    Mean of fn(seed) over seeds. The running mean of the first i seeds is reported at
+    step = i and the trial is pruned if the pruner says so.
+    n_jobs > 1 runs the seeds concurrently; results that finish early wait until the seeds
+    before them are in, so the reports are the same as in the serial run. Pending seeds
+    are cancelled on prune.
+    """
+    scores = []
+    if n_jobs <= 1:
+        for i, sd in enumerate(seeds, 1):
+            scores.append(fn(sd))
+            trial.report(float(np.mean(scores)), step=i)
+            if trial.should_prune():
+                raise optuna.exceptions.TrialPruned()
+        return float(np.mean(scores))
+
+    futures = [_get_seed_pool(n_jobs).submit(fn, sd) for sd in seeds]
+    index = {fut: i for i, fut in enumerate(futures)}
+    done = {}  # seed index -> score, until every earlier seed is in
+    try:
+        for fut in as_completed(futures):
+            done[index[fut]] = fut.result()
+            while len(scores) in done:
+                scores.append(done.pop(len(scores)))
+                trial.report(float(np.mean(scores)), step=len(scores))
+                if trial.should_prune():
+                    raise optuna.exceptions.TrialPruned()
+    finally:
+        for fut in futures:
+            fut.cancel()
+    return float(np.mean(scores))
+
+# ---------- trial-level workers ----------
+
+_FINISHED = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+def _worker(rank, study_name, storage_url, objective, n_trials, max_finished, pruner, sampler_seed):
+    """Runs trials until the study holds max_finished finished trials (old ones included)."""
+    sampler = optuna.samplers.TPESampler(seed=None if sampler_seed is None else sampler_seed + rank)
+    study = with_retry(lambda: optuna.load_study(study_name=study_name, storage=make_storage(storage_url),
+                                                 sampler=sampler, pruner=pruner))
+    try:
+        study.optimize(objective, n_trials=n_trials,
+                       callbacks=[optuna.study.MaxTrialsCallback(max_finished, states=_FINISHED)])
+    finally:
+        shutdown_seed_pool()
+
+def run_study(study, objective, n_trials: int, n_workers: int = 1, storage_url: str = None,
+              pruner=None, sampler_seed=None, show_progress_bar: bool = True):
+    """
+    n_workers == 1: plain study.optimize in this process.
+    n_workers > 1:  one process per worker on the study stored at storage_url; each worker
+                    gets its own TPESampler(seed=sampler_seed + rank) so they do not all
+                    propose the same parameters.
+    """
+    if n_workers <= 1:
+        try:
+            study.optimize(objective, n_trials=n_trials, n_jobs=1, show_progress_bar=show_progress_bar)
+        finally:
+            shutdown_seed_pool()
+        return study
+    if storage_url is None:
+        raise ValueError("parallel workers need a shared storage (storage_url)")
+    # MaxTrialsCallback counts every finished trial in the storage: a resumed study
+    # (load_if_exists) already has some, and n_trials are new ones on top of those
+    existing = len(with_retry(lambda: study.get_trials(deepcopy=False, states=_FINISHED)))
+    ctx = mp.get_context("spawn")  # same behaviour on Linux and Windows
+    procs = [ctx.Process(target=_worker, args=(rank, study.study_name, storage_url, objective,
+                                               n_trials, existing + n_trials, pruner, sampler_seed))
+             for rank in range(n_workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    failed = [p.exitcode for p in procs if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} optuna worker(s) exited with codes {failed}")
+    return study
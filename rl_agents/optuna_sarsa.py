@@ -1,27 +1,15 @@
 # rl_agents/optuna_sarsa.py
 import argparse
 import os
+from functools import partial
 import optuna
 import numpy as np
 from rl_env.pokemon_env import PokemonEnv
 from rl_agents.tabular_sarsa import TabularSarsaLearner
+from rl_agents.evaluation import evaluate
+from rl_agents.exact_eval import exact_evaluate
 from utils.checkpoint import save_checkpoint
-
-# Esta función no necesita cambios.
-def evaluate_greedy(env, agent, episodes=50, seed=123):
-    rng = np.random.default_rng(seed)
-    wins = 0
-    for _ in range(episodes):
-        obs, info = env.reset(seed=int(rng.integers(1_000_000)))
-        term = trunc = False
-        while not (term or trunc):
-            legal = np.flatnonzero(info["action_mask"])
-            q = agent.Q[obs]
-            a = int(legal[np.argmax(q[legal])]) if len(legal) else 0
-            obs, r, term, trunc, info = env.step(a)
-        if term and r > 0:
-            wins += 1
-    return wins / episodes
+from rl_agents.optuna_parallel import make_storage, mean_over_seeds, run_study, with_retry
 
 # --- CORRECCIÓN AQUÍ: Bucle de entrenamiento SARSA ---
 def train_agent(agent, env, train_episodes, seed):
@@ -50,7 +38,16 @@ def train_agent(agent, env, train_episodes, seed):
             action = action2
     return agent
 
-def objective(trial, train_episodes, max_steps):
+def train_and_eval(params, train_episodes, max_steps, seed, exact_eval=False):
+    """Entrena un agente con una semilla y devuelve su win rate greedy (ejecutable en otro proceso)."""
+    env = PokemonEnv(max_steps=max_steps)
+    agent = TabularSarsaLearner(n_actions=env.action_space.n, **params, seed=seed)
+    agent = train_agent(agent, env, train_episodes, seed)
+    if exact_eval:  # probabilidad exacta: el objetivo no tiene ruido de evaluación
+        return exact_evaluate(agent, horizon=max_steps).win_prob
+    return evaluate(agent, episodes=100, seed=seed + 999, max_steps=max_steps).win_rate
+
+def objective(trial, train_episodes, max_steps, seed_jobs=1, exact_eval=False):
     """Función objetivo para un trial de Optuna."""
     params = {
         "alpha":     trial.suggest_float("alpha",     0.05, 0.6, log=True),
@@ -60,21 +57,11 @@ def objective(trial, train_episodes, max_steps):
         "eps_decay": trial.suggest_int(  "eps_decay", 1000, 10000),
     }
 
-    env = PokemonEnv(max_steps=max_steps)
     seeds = [11, 29, 97]
-    scores = []
-
-    for i, seed in enumerate(seeds, 1):
-        agent = TabularSarsaLearner(n_actions=env.action_space.n, **params)
-        agent = train_agent(agent, env, train_episodes, seed)
-        score = evaluate_greedy(env, agent, episodes=100, seed=seed + 999)
-        
-        scores.append(score)
-        trial.report(float(np.mean(scores)), step=i)
-        if trial.should_prune():
-            raise optuna.exceptions.TrialPruned()
-            
-    return float(np.mean(scores))
+    # Las semillas se entrenan en paralelo si seed_jobs > 1; la media parcial se reporta
+    # al terminar cada una para que el pruner siga funcionando.
+    fn = partial(train_and_eval, params, train_episodes, max_steps, exact_eval=exact_eval)
+    return mean_over_seeds(trial, fn, seeds, n_jobs=seed_jobs)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -83,25 +70,32 @@ def main():
     ap.add_argument("--final-train-episodes", type=int, default=800, help="Episodios para el reentrenamiento final.")
     ap.add_argument("--study-name", type=str, default="sarsa-pokemon-study", help="Nombre del estudio.")
     ap.add_argument("--storage-db", type=str, default="sqlite:///optuna_studies.db", help="Base de datos para guardar el estudio.")
+    ap.add_argument("--n-workers", type=int, default=1, help="Procesos que ejecutan trials en paralelo sobre el mismo estudio.")
+    ap.add_argument("--seed-jobs", type=int, default=1, help="Procesos por trial para entrenar las semillas en paralelo.")
+    ap.add_argument("--exact-eval", action="store_true", help="Win rate exacto (cadena de Markov) en vez de 100 episodios.")
     args = ap.parse_args()
 
     pruner = optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1)
     sampler = optuna.samplers.TPESampler(seed=42)
     
-    study = optuna.create_study(
+    study = with_retry(lambda: optuna.create_study(
         direction="maximize",
         sampler=sampler,
         pruner=pruner,
         study_name=args.study_name,
-        storage=args.storage_db,
+        storage=make_storage(args.storage_db),
         load_if_exists=True
-    )
+    ))
 
-    study.optimize(
-        lambda trial: objective(trial, args.train_episodes, max_steps=200),
+    run_study(
+        study,
+        partial(objective, train_episodes=args.train_episodes, max_steps=200, seed_jobs=args.seed_jobs,
+                exact_eval=args.exact_eval),
         n_trials=args.trials,
-        n_jobs=1,
-        show_progress_bar=True
+        n_workers=args.n_workers,
+        storage_url=args.storage_db,
+        pruner=pruner,
+        sampler_seed=42,
     )
 
     print("Estudio completado.")
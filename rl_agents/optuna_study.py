@@ -1,29 +1,19 @@
 # rl_agents/optuna_study.py
 import argparse, os, optuna, numpy as np
+from functools import partial
 from rl_env.pokemon_env import PokemonEnv
 from rl_agents.tabular_q import TabularQLearner
+from rl_agents.evaluation import evaluate
+from rl_agents.exact_eval import exact_evaluate
 from utils.checkpoint import save_checkpoint
+from rl_agents.optuna_parallel import DEFAULT_STORAGE, make_storage, mean_over_seeds, run_study, with_retry
 
-def evaluate_greedy(env, agent, episodes=50, seed=123):
-    rng = np.random.default_rng(seed)
-    wins = 0
-    for _ in range(episodes):
-        obs, info = env.reset(seed=int(rng.integers(1_000_000)))
-        term = trunc = False
-        while not (term or trunc):
-            legal = np.flatnonzero(info["action_mask"])
-            q = agent.Q[obs]
-            a = int(legal[np.argmax(q[legal])]) if len(legal) else 0
-            obs, r, term, trunc, info = env.step(a)
-        if term and r > 0:
-            wins += 1
-    return wins / episodes
-
-def train_once(alpha, gamma, eps0, eps_end, eps_decay, train_episodes=600, max_steps=200, seed=0):
+def train_once(alpha, gamma, eps0, eps_end, eps_decay, train_episodes=600, max_steps=200, seed=0,
+               exact_eval=False):
     env = PokemonEnv(max_steps=max_steps)
     agent = TabularQLearner(n_actions=env.action_space.n,
                             alpha=alpha, gamma=gamma,
-                            eps_start=eps0, eps_end=eps_end, eps_decay=eps_decay)
+                            eps_start=eps0, eps_end=eps_end, eps_decay=eps_decay, seed=seed)
     rng = np.random.default_rng(seed)
     for _ in range(train_episodes):
         obs, info = env.reset(seed=int(rng.integers(1_000_000)))
@@ -34,39 +24,47 @@ def train_once(alpha, gamma, eps0, eps_end, eps_decay, train_episodes=600, max_s
             obs2, r, term, trunc, info = env.step(a)
             agent.update(obs, a, r, obs2, term or trunc)
             obs = obs2
-    return evaluate_greedy(env, agent, episodes=100, seed=seed+999)
+    if exact_eval:  # deterministic: no evaluation noise for the sampler to chase
+        return exact_evaluate(agent, horizon=max_steps).win_prob
+    return evaluate(agent, episodes=100, seed=seed+999, max_steps=max_steps).win_rate
 
-def objective(train_episodes):
-    def _objective(trial):
-        alpha     = trial.suggest_float("alpha",     0.05, 0.6, log=True)
-        gamma     = trial.suggest_float("gamma",     0.90, 0.999)
-        eps0      = trial.suggest_float("eps0",      0.3,  1.0)
-        eps_end   = trial.suggest_float("eps_end",   0.01, 0.2)
-        eps_decay = trial.suggest_int(  "eps_decay", 1000, 10000)
+def objective(trial, train_episodes, seed_jobs=1, exact_eval=False):
+    alpha     = trial.suggest_float("alpha",     0.05, 0.6, log=True)
+    gamma     = trial.suggest_float("gamma",     0.90, 0.999)
+    eps0      = trial.suggest_float("eps0",      0.3,  1.0)
+    eps_end   = trial.suggest_float("eps_end",   0.01, 0.2)
+    eps_decay = trial.suggest_int(  "eps_decay", 1000, 10000)
 
-        seeds = [11, 29, 97]
-        scores = []
-        for i, sd in enumerate(seeds, 1):
-            score = train_once(alpha, gamma, eps0, eps_end, eps_decay,
-                               train_episodes=train_episodes, seed=sd)
-            scores.append(score)
-            trial.report(float(np.mean(scores)), step=i)
-            if trial.should_prune():
-                raise optuna.exceptions.TrialPruned()
-        return float(np.mean(scores))
-    return _objective
+    seeds = [11, 29, 97]
+    fn = partial(train_once, alpha, gamma, eps0, eps_end, eps_decay, train_episodes, 200, exact_eval=exact_eval)
+    return mean_over_seeds(trial, fn, seeds, n_jobs=seed_jobs)  # reports the running mean per seed
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--trials", type=int, default=40)
     ap.add_argument("--train-episodes", type=int, default=600)
     ap.add_argument("--final-train-episodes", type=int, default=800)
+    ap.add_argument("--n-workers", type=int, default=1, help="processes running trials of the same study")
+    ap.add_argument("--seed-jobs", type=int, default=1, help="processes per trial training the seeds concurrently")
+    ap.add_argument("--storage-db", type=str, default=None,
+                    help=f"study storage URL (in-memory if omitted; {DEFAULT_STORAGE} when --n-workers > 1)")
+    ap.add_argument("--study-name", type=str, default="q-pokemon-study")
+    ap.add_argument("--exact-eval", action="store_true", help="exact win probability instead of 100 sampled episodes")
     args = ap.parse_args()
 
+    storage_url = args.storage_db or (DEFAULT_STORAGE if args.n_workers > 1 else None)
     pruner  = optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1)
     sampler = optuna.samplers.TPESampler(seed=42)
-    study = optuna.create_study(direction="maximize", sampler=sampler, pruner=pruner)
-    study.optimize(objective(args.train_episodes), n_trials=args.trials, n_jobs=1, show_progress_bar=True)
+    if storage_url is None:
+        study = optuna.create_study(direction="maximize", sampler=sampler, pruner=pruner)
+    else:
+        study = with_retry(lambda: optuna.create_study(direction="maximize", sampler=sampler, pruner=pruner,
+                                                       study_name=args.study_name,
+                                                       storage=make_storage(storage_url), load_if_exists=True))
+    run_study(study, partial(objective, train_episodes=args.train_episodes, seed_jobs=args.seed_jobs,
+                             exact_eval=args.exact_eval),
+              n_trials=args.trials, n_workers=args.n_workers, storage_url=storage_url,
+              pruner=pruner, sampler_seed=42)
 
     print("Best value:", study.best_value)
     print("Best params:", study.best_params)
@@ -0,0 +1,84 @@
+# rl_agents/q_table.py
+import numpy as np
+
+
+class DenseQTable:
+    """
+    Contiguous Q storage: one float32 row per state id in a 2-D array.
+
+    Drop-in for the defaultdict(lambda: np.zeros(n_actions)) used by the learners:
+    Q[s] returns a writable view of row s (so Q[s][a] = v works), unseen rows read
+    as zeros, and len(Q) counts the rows that have been touched.
+    The array starts small and grows geometrically up to max_states, which is known
+    up-front when state ids come from the mixed-radix encoding (see state_space_size).
+    """
+    def __init__(self, n_actions: int, max_states: int, initial_capacity: int = 256):
+        self.n_actions = n_actions
+        self.max_states = int(max_states)
+        cap = max(1, min(initial_capacity, self.max_states))
+        self.data = np.zeros((cap, n_actions), dtype=np.float32)
+        self.visited = np.zeros(cap, dtype=bool)
+        self._n_visited = 0
+
+    @classmethod
+    def from_arrays(cls, data: np.ndarray, visited: np.ndarray) -> "DenseQTable":
+        """Wrap existing storage (e.g. an np.memmap of a binary checkpoint) without copying it."""
+        q = cls.__new__(cls)
+        q.n_actions = data.shape[1]
+        q.max_states = data.shape[0]
+        q.data = data
+        q.visited = np.array(visited, dtype=bool)  # small, always a private copy
+        q._n_visited = int(q.visited.sum())
+        return q
+
+    def _grow(self, s: int):
+        if s >= self.max_states:
+            raise IndexError(f"state id {s} out of bounds for a table of {self.max_states} states")
+        cap = min(self.max_states, max(2 * len(self.data), s + 1))
+        data = np.zeros((cap, self.n_actions), dtype=np.float32)
+        data[:len(self.data)] = self.data
+        visited = np.zeros(cap, dtype=bool)
+        visited[:len(self.visited)] = self.visited
+        self.data, self.visited = data, visited
+
+    def __getitem__(self, s) -> np.ndarray:
+        s = int(s)
+        if s >= len(self.data):
+            self._grow(s)
+        if not self.visited[s]:
+            self.visited[s] = True
+            self._n_visited += 1
+        return self.data[s]
+
+    def __setitem__(self, s, row):
+        self[s][:] = row
+
+    def __contains__(self, s) -> bool:
+        s = int(s)
+        return s < len(self.visited) and bool(self.visited[s])
+
+    def __len__(self) -> int:
+        return self._n_visited
+
+    def keys(self):
+        return np.flatnonzero(self.visited).tolist()
+
+    def items(self):
+        for s in self.keys():
+            yield s, self.data[s]
+
+    # --- batch helpers (no per-state Python work) ---
+    def rows(self, states) -> np.ndarray:
+        """Q rows for a batch of state ids; ids beyond the allocated part read as zeros."""
+        states = np.asarray(states, dtype=np.int64)
+        top = int(states.max(initial=-1))
+        if top >= len(self.data):
+            self._grow(top)
+        return self.data[states]
+
+    def greedy(self, states, masks=None) -> np.ndarray:
+        """Batch argmax over actions, restricted to masks[i] (bool [N, n_actions]) if given."""
+        q = self.rows(states)
+        if masks is not None:
+            q = np.where(masks, q, -np.inf)
+        return np.argmax(q, axis=1)
@@ -1,5 +1,9 @@
+import os, tempfile
 import numpy as np
 from rl_env.pokemon_env import PokemonEnv
+from rl_env.vector_env import make_vector_env
+from rl_agents.tabular_q import TabularQLearner
+from utils.checkpoint import save_checkpoint, load_checkpoint
 
 def main():
     env = PokemonEnv(max_steps=50)
@@ -12,6 +16,43 @@ def main():
         obs, r, term, trunc, info = env.step(a)
         steps += 1
     print(f"Smoke test OK. Reached end after {steps} steps. terminated={term}, truncated={trunc}")
+    check_vector_switch()
+    check_qtab_roundtrip()
+
+def check_vector_switch():
+    """A switch sent through the vector env (numpy int actions) must change the active pokémon."""
+    venv = make_vector_env(1, asynchronous=False, seed=123)
+    obs, info = venv.reset(seed=123)
+    switches = np.flatnonzero(info["action_mask"][0][10:]) + 10
+    assert len(switches), "no legal switch at the start of the battle"
+    a = int(switches[0])
+    venv.step(np.array([a]))
+    battle = venv.envs[0].unwrapped.battle
+    assert battle.pokemon_activo_t1 is battle.t1.pokemons[a - 10], "switch action was ignored"
+    venv.close()
+    print(f"Vector switch OK. Action {a} -> {battle.pokemon_activo_t1.name}")
+
+def check_qtab_roundtrip():
+    """A learner built like the training scripts (n_actions from the env) saves and reloads as .qtab."""
+    env = PokemonEnv(max_steps=50)
+    agent = TabularQLearner(n_actions=env.action_space.n, seed=0)
+    obs, info = env.reset(seed=0)
+    term = trunc = False
+    while not (term or trunc):
+        a = agent.act(obs, np.flatnonzero(info["action_mask"]))
+        obs2, r, term, trunc, info = env.step(a)
+        agent.update(obs, a, r, obs2, term or trunc)
+        obs = obs2
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "q.qtab")
+        save_checkpoint(agent, env, path)
+        loaded = TabularQLearner(n_actions=env.action_space.n)
+        load_checkpoint(loaded, env, path, mmap_mode="r")
+        for sid, row in agent.Q.items():
+            assert np.array_equal(loaded.Q[sid], row), f"row {sid} differs after reload"
+        assert loaded.t == agent.t, "epsilon schedule (t) was not restored"
+        del loaded  # release the memmap before the directory goes away
+    print(f"Checkpoint round trip OK. {len(agent.Q)} rows")
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,24 @@
 import math, numpy as np
 from collections import defaultdict
+from rl_agents.q_table import DenseQTable
 
 
 # We implemented SARSA algorithm in order to compare it against the Q-Learning
 
 class TabularSarsaLearner:
-    def __init__(self, n_actions, alpha=0.3, gamma=0.99, eps_start=1.0, eps_end=0.05, eps_decay=3000):
+    def __init__(self, n_actions, alpha=0.3, gamma=0.99, eps_start=1.0, eps_end=0.05, eps_decay=3000,
+                 n_states=None, seed=None):
         self.n_actions = n_actions
         self.alpha, self.gamma = alpha, gamma
         self.eps_start, self.eps_end, self.eps_decay = eps_start, eps_end, eps_decay
-        self.Q = defaultdict(lambda: np.zeros(n_actions, dtype=np.float32))
+        # n_states known (bounded mixed-radix ids) -> contiguous array-backed table
+        if n_states is not None:
+            self.Q = DenseQTable(n_actions, n_states)
+        else:
+            self.Q = defaultdict(lambda: np.zeros(n_actions, dtype=np.float32))
         self.t = 0
+        self.rng = np.random.default_rng(seed)  # own stream: exploration is reproducible per seed
+        self.dirty = set()  # rows updated since the last pop_dirty() (incremental checkpoints)
 
     def _eps(self):
         """
@@ -33,8 +41,8 @@ class TabularSarsaLearner:
         if not legal.size:
             return 0 # Return a default action, e.g., action '0'
         
-        if np.random.rand() < eps:
-            return int(np.random.choice(legal))           # explore among legal
+        if self.rng.random() < eps:
+            return int(self.rng.choice(legal))           # explore among legal
         
         q_values = self.Q[s]
         # exploit among legal: argmax on the legal slice
@@ -58,4 +66,10 @@ class TabularSarsaLearner:
             target = r + self.gamma * q_next
             
         # Standard TD update
-        self.Q[s][a] = q_current + self.alpha * (target - q_current)
\ No newline at end of file
+        self.Q[s][a] = q_current + self.alpha * (target - q_current)
+        self.dirty.add(s)
+
+    def pop_dirty(self):
+        """State ids whose Q row changed since the previous call."""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
@@ -1,35 +1,45 @@
-import numpy as np, os, argparse, csv, time
+import numpy as np, os, argparse, time
 from rl_env.pokemon_env import PokemonEnv
+from rl_env.vector_env import make_vector_env, final_obs_batch
 from rl_agents.tabular_q import TabularQLearner
-from utils.checkpoint import save_checkpoint, load_checkpoint
+from rl_agents.evaluation import evaluate, make_eval_env
+from utils.checkpoint import IncrementalCheckpointer
+from utils.metrics_sink import MetricsSink, export_csv
 import datetime
 
 CKPT_DEFAULT = "checkpoints/q_table.pkl"
+LOG_COLUMNS = {"episode": np.int64, "train_return": np.float64, "steps": np.int64, "epsilon": np.float64,
+               "q_rows": np.int64, "eval_winrate": np.float64, "eval_return": np.float64}
 
-# ---------- Greedy evaluation (ε = 0) ----------
-def evaluate_greedy(env: PokemonEnv, agent: TabularQLearner, episodes: int = 50, seed: int = 123):
+# ---------- Parallel experience collection (many workers, one learner) ----------
+def collect_vectorized(venv, agent: TabularQLearner, episodes: int, seed=None):
     """
-    Runs episodes with a purely greedy policy (no exploration, no learning).
-    Returns the win-rate in [0,1].
+    Steps all workers of venv in lockstep and applies every transition to the single
+    learner in this process. Yields (G, steps) each time a worker finishes an episode,
+    until `episodes` episodes have been completed.
     """
-    rng = np.random.default_rng(seed)
-    wins, rets = 0, []
-    for _ in range(episodes):
-        # re-seed env for reproducibility across evals (optional)
-        obs, info = env.reset(seed=int(rng.integers(1_000_000)))
-        terminated = truncated = False
-        G = 0.0
-        while not (terminated or truncated):
-            legal = np.flatnonzero(info["action_mask"])
-            q = agent.Q[obs]  # shape: [n_actions]
-            # greedy among legal; guard in case q shorter than action_space.n
-            a = int(legal[np.argmax(q[legal])]) if len(legal) else 0
-            obs, r, terminated, truncated, info = env.step(a)
-            G += r
-        rets.append(G)
-        if terminated and env.battle.winner() == "agent": #little change here to improve reward
-            wins += 1
-    return wins / episodes, float(np.mean(rets))
+    n = venv.num_envs
+    obs, info = venv.reset(seed=seed)
+    G = np.zeros(n)
+    steps = np.zeros(n, dtype=int)
+    finished = 0
+    while finished < episodes:
+        masks = info["action_mask"]
+        actions = np.array([agent.act(int(obs[i]), np.flatnonzero(masks[i])) for i in range(n)])
+        obs2, r, terminated, truncated, info = venv.step(actions)
+        done = terminated | truncated
+        # terminal rows bootstrap from their final obs, not from the auto-reset one
+        s2 = final_obs_batch(obs2, info)
+        for i in range(n):
+            agent.update(int(obs[i]), int(actions[i]), float(r[i]), int(s2[i]), bool(done[i]))
+        G += r
+        steps += 1
+        for i in np.flatnonzero(done):
+            if finished < episodes:
+                finished += 1
+                yield float(G[i]), int(steps[i])
+            G[i], steps[i] = 0.0, 0
+        obs = obs2
 
 def main():
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -38,13 +48,19 @@ def main():
     ap.add_argument("--eval-every", type=int, default=50)
     ap.add_argument("--ckpt", type=str, default=CKPT_DEFAULT)
     ap.add_argument("--load", action="store_true", help="load checkpoint if exists")
+    ap.add_argument("--compact-every", type=int, default=20,
+                    help="delta-log appends between full checkpoint snapshots")
     ap.add_argument("--verbose", action="store_true")
-    ap.add_argument("--log-csv", type=str, default="logs/train_log_{timestamp}.csv".format(timestamp=timestamp))
+    ap.add_argument("--log-csv", type=str, default="logs/train_log_{timestamp}.csv".format(timestamp=timestamp),
+                    help="CSV exported at the end; the per-episode rows go to <log-csv>.metrics/ as they happen")
     ap.add_argument("--alpha", type=float, default=0.30)
     ap.add_argument("--gamma", type=float, default=0.99)
     ap.add_argument("--eps-start", type=float, default=1.0)
     ap.add_argument("--eps-end", type=float, default=0.05)
     ap.add_argument("--eps-decay", type=int, default=4000)
+    ap.add_argument("--dense", action="store_true", help="array-backed Q-table over the bounded state ids")
+    ap.add_argument("--num-envs", type=int, default=1, help=">1: collect experience from that many worker envs")
+    ap.add_argument("--sync", action="store_true", help="with --num-envs, step the workers in this process")
     args = ap.parse_args()
 
     os.makedirs("checkpoints", exist_ok=True)
@@ -55,48 +71,64 @@ def main():
     agent = TabularQLearner(
         n_actions=env.action_space.n,
         alpha=args.alpha, gamma=args.gamma,
-        eps_start=args.eps_start, eps_end=args.eps_end, eps_decay=args.eps_decay)
+        eps_start=args.eps_start, eps_end=args.eps_end, eps_decay=args.eps_decay,
+        n_states=env.n_states if args.dense else None)
+    ckpt = IncrementalCheckpointer(args.ckpt, compact_every=args.compact_every)
+    if args.load and os.path.exists(args.ckpt):
+        ckpt.load(agent, env)
 
-    csvf = open(args.log_csv, "w", newline="")
-    writer = csv.writer(csvf)
-    writer.writerow(["episode","train_return","steps","epsilon","q_rows","eval_winrate","eval_return"])
+    # rows are buffered and written as .npz chunks by a background thread (see utils.metrics_sink)
+    metrics_dir = os.path.splitext(args.log_csv)[0] + ".metrics"
+    with MetricsSink(metrics_dir, LOG_COLUMNS, fresh=True) as sink:  # flushed even if training stops early
+        eval_env = make_eval_env(episodes=100)  # built once, reused by every periodic evaluation
+        t0 = time.time()
+        # ----- training loop with periodic evaluation -----
 
-    t0 = time.time()
-    # ----- training loop with periodic evaluation -----
+        def single_env_episodes():
+            for _ in range(args.episodes):
+                obs, info = env.reset()
+                terminated = truncated = False
+                G = 0.0
+                steps = 0
 
-    for ep in range(1, args.episodes + 1):
-        obs, info = env.reset()
-        terminated = truncated = False
-        G = 0.0
-        steps = 0
+                while not (terminated or truncated):
+                    legal = np.flatnonzero(info["action_mask"])          # legal action indices now
+                    a = agent.act(obs, legal)                            # ε-greedy among legal
+                    obs2, r, terminated, truncated, info = env.step(a)  # Gymnasium 5-tuple
+                    agent.update(obs, a, r, obs2, terminated or truncated)
+                    obs = obs2
+                    G += r
+                    steps += 1
+                yield G, steps
 
-        while not (terminated or truncated):
-            legal = np.flatnonzero(info["action_mask"])          # legal action indices now
-            a = agent.act(obs, legal)                            # ε-greedy among legal
-            obs2, r, terminated, truncated, info = env.step(a)  # Gymnasium 5-tuple
-            agent.update(obs, a, r, obs2, terminated or truncated)
-            obs = obs2
-            G += r
-            steps += 1
-        # periodic greedy eval + save
-        eval_wr = eval_ret = float("nan")
+        venv = None
+        if args.num_envs > 1:
+            venv = make_vector_env(args.num_envs, asynchronous=not args.sync, max_steps=200)
+            episodes = collect_vectorized(venv, agent, args.episodes)
+        else:
+            episodes = single_env_episodes()
 
-        if ep % args.eval_every == 0:
-            eval_wr, eval_ret = evaluate_greedy(env, agent, episodes=100)
-            save_checkpoint(agent, env, args.ckpt)
-            if args.verbose:
-                elapsed = time.time() - t0
-                print(f"[ep {ep:4d}] train_return={G:7.3f} steps={steps:3d} "
-                      f"eps={agent._eps():.3f} Qrows={len(agent.Q)} "
-                      f"| eval wr={eval_wr:.2f} ret={eval_ret:.3f} | {elapsed:.1f}s")
+        for ep, (G, steps) in enumerate(episodes, start=1):
+            # periodic greedy eval + save
+            eval_wr = eval_ret = float("nan")
 
-        writer.writerow([ep, f"{G:.4f}", steps,
-                         f"{agent._eps():.6f}", len(agent.Q),
-                         f"{eval_wr:.4f}" if eval_wr==eval_wr else "",
-                         f"{eval_ret:.4f}" if eval_ret==eval_ret else ""])
-        csvf.flush()
+            if ep % args.eval_every == 0:
+                res = evaluate(agent, episodes=100, venv=eval_env)
+                eval_wr, eval_ret = res.win_rate, res.mean_return
+                ckpt.save(agent, env)  # only the rows touched since the last save
+                if args.verbose:
+                    elapsed = time.time() - t0
+                    print(f"[ep {ep:4d}] train_return={G:7.3f} steps={steps:3d} "
+                          f"eps={agent._eps():.3f} Qrows={len(agent.Q)} "
+                          f"| eval {res} | {elapsed:.1f}s")
 
-    csvf.close()
+            sink.append(episode=ep, train_return=G, steps=steps, epsilon=agent._eps(),
+                        q_rows=len(agent.Q), eval_winrate=eval_wr, eval_return=eval_ret)
+
+    export_csv(metrics_dir, args.log_csv)
+    ckpt.compact(agent, env)
+    if venv is not None:
+        venv.close()
     print(f"[done] CSV log -> {args.log_csv}")
 
 if __name__ == "__main__":
@@ -1,32 +1,52 @@
+import argparse
 import numpy as np
-import pickle
-import csv
+import os
 from rl_env.pokemon_env import PokemonEnv
+from rl_env.vector_env import make_vector_env, final_obs_batch
 from rl_agents.tabular_sarsa import TabularSarsaLearner
+from rl_agents.evaluation import evaluate, make_eval_env
+from utils.checkpoint import IncrementalCheckpointer
+from utils.metrics_sink import MetricsSink, export_csv
 
-# ---------- Greedy evaluation (ε = 0) ----------
-def evaluate_greedy(env: PokemonEnv, agent: TabularSarsaLearner, episodes: int = 50, seed: int = 123):
+# ---------- Parallel experience collection (many workers, one learner) ----------
+def collect_vectorized(venv, agent: TabularSarsaLearner, episodes: int, seed=None):
     """
-    Runs episodes with a purely greedy policy (no exploration, no learning).
-    Returns the win-rate in [0,1].
+    On-policy SARSA over a vector env: each worker keeps its pending action a, and
+    the single learner applies (s, a, r, s', a') for every worker after each step.
+    Yields (G, steps) each time a worker finishes an episode.
     """
-    rng = np.random.default_rng(seed)
-    wins = 0
-    for _ in range(episodes):
-        # re-seed env for reproducibility across evals (optional)
-        obs, info = env.reset(seed=int(rng.integers(1_000_000)))
-        terminated = truncated = False
-        while not (terminated or truncated):
-            legal = np.flatnonzero(info["action_mask"])
-            q = agent.Q[obs]  # shape: [n_actions]
-            # greedy among legal; guard in case q shorter than action_space.n
-            a = int(legal[np.argmax(q[legal])]) if len(legal) else 0
-            obs, r, terminated, truncated, info = env.step(a)
-        if terminated and r > 0:
-            wins += 1
-    return wins / episodes
+    n = venv.num_envs
+    obs, info = venv.reset(seed=seed)
+    a = np.array([agent.act(int(obs[i]), np.flatnonzero(info["action_mask"][i])) for i in range(n)])
+    G = np.zeros(n)
+    steps = np.zeros(n, dtype=int)
+    finished = 0
+    while finished < episodes:
+        obs_next, r, terminated, truncated, info = venv.step(a)
+        done = terminated | truncated
+        s2 = final_obs_batch(obs_next, info)
+        a_next = np.empty(n, dtype=int)
+        for i in range(n):
+            # finished workers were auto-reset: their next action starts the new episode
+            a_next[i] = agent.act(int(obs_next[i]), np.flatnonzero(info["action_mask"][i]))
+            a2 = None if done[i] else int(a_next[i])
+            agent.update(int(obs[i]), int(a[i]), float(r[i]), int(s2[i]), a2, bool(done[i]))
+        G += r
+        steps += 1
+        for i in np.flatnonzero(done):
+            if finished < episodes:
+                finished += 1
+                yield float(G[i]), int(steps[i])
+            G[i], steps[i] = 0.0, 0
+        obs, a = obs_next, a_next
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--episodes", type=int, default=1000)
+    ap.add_argument("--dense", action="store_true", help="array-backed Q-table over the bounded state ids")
+    ap.add_argument("--num-envs", type=int, default=1, help=">1: collect experience from that many worker envs")
+    ap.add_argument("--sync", action="store_true", help="with --num-envs, step the workers in this process")
+    args = ap.parse_args()
 
     # Archivos de salida
     log_filepath = "./logs/train_log_sarsa.csv"
@@ -40,70 +60,80 @@ def main():
         gamma=0.99,
         eps_start=1.0,   # start very exploratory
         eps_end=0.05,    # end mostly greedy
-        eps_decay=4000   # slower decay = more early exploration
+        eps_decay=4000,  # slower decay = more early exploration
+        n_states=env.n_states if args.dense else None
     )
+    ckpt = IncrementalCheckpointer(q_table_filepath)
 
-    # ----- Preparación del archivo de logs -----
-    log_fieldnames = ["episode", "train_return", "steps", "epsilon", "q_rows", "eval_winrate"]
-    with open(log_filepath, 'w', newline='') as log_file:
-        log_writer = csv.DictWriter(log_file, fieldnames=log_fieldnames)
-        log_writer.writeheader()
+    # ----- Preparación de los logs: chunks .npz en segundo plano, CSV al terminar -----
+    log_columns = {"episode": np.int64, "train_return": np.float64, "steps": np.int64,
+                   "epsilon": np.float64, "q_rows": np.int64, "eval_winrate": np.float64}
+    metrics_dir = os.path.splitext(log_filepath)[0] + ".metrics"
+    with MetricsSink(metrics_dir, log_columns, fresh=True) as sink:
 
         # ----- training loop with periodic evaluation -----
-        n_episodes = 1000
+        n_episodes = args.episodes
         eval_every = 50
+        eval_env = make_eval_env(episodes=100)  # se reutiliza en cada evaluación
 
-        for ep in range(1, n_episodes + 1):
-            obs, info = env.reset()
-            terminated = truncated = False
-            G = 0.0
-            steps = 0
-
-            # SARSA CHANGE 1: Choose first action *before* the loop
-            legal = np.flatnonzero(info["action_mask"])
-            a = agent.act(obs, legal)
-
-            while not (terminated or truncated):
-                # SARSA CHANGE 2: Step the environment with the current action
-                obs2, r, terminated, truncated, info = env.step(a)
-
-                # SARSA CHANGE 3: Choose the *next* action a2 from the new state obs2
-                # This is needed for the on-policy update.
-                # If the episode is over, there is no next action.
-                if terminated or truncated:
-                    a2 = None
-                else:
-                    legal2 = np.flatnonzero(info["action_mask"])
-                    a2 = agent.act(obs2, legal2)
-
-                # SARSA CHANGE 4: Update using the (S, A, R, S', A') tuple
-                agent.update(obs, a, r, obs2, a2, terminated or truncated)
-
-                # SARSA CHANGE 5: The next state and action become the current ones
-                obs = obs2
-                a = a2
-                
-                G += r
-                steps += 1
+        def single_env_episodes():
+            for _ in range(n_episodes):
+                obs, info = env.reset()
+                terminated = truncated = False
+                G = 0.0
+                steps = 0
 
+                # SARSA CHANGE 1: Choose first action *before* the loop
+                legal = np.flatnonzero(info["action_mask"])
+                a = agent.act(obs, legal)
+
+                while not (terminated or truncated):
+                    # SARSA CHANGE 2: Step the environment with the current action
+                    obs2, r, terminated, truncated, info = env.step(a)
+
+                    # SARSA CHANGE 3: Choose the *next* action a2 from the new state obs2
+                    # This is needed for the on-policy update.
+                    # If the episode is over, there is no next action.
+                    if terminated or truncated:
+                        a2 = None
+                    else:
+                        legal2 = np.flatnonzero(info["action_mask"])
+                        a2 = agent.act(obs2, legal2)
+
+                    # SARSA CHANGE 4: Update using the (S, A, R, S', A') tuple
+                    agent.update(obs, a, r, obs2, a2, terminated or truncated)
+
+                    # SARSA CHANGE 5: The next state and action become the current ones
+                    obs = obs2
+                    a = a2
+
+                    G += r
+                    steps += 1
+                yield G, steps
+
+        venv = None
+        if args.num_envs > 1:
+            venv = make_vector_env(args.num_envs, asynchronous=not args.sync, max_steps=200)
+            episodes = collect_vectorized(venv, agent, n_episodes)
+        else:
+            episodes = single_env_episodes()
+
+        for ep, (G, steps) in enumerate(episodes, start=1):
             if ep % eval_every == 0:
-                wr = evaluate_greedy(env, agent, episodes=100)  # more episodes = lower variance
+                wr = evaluate(agent, episodes=100, venv=eval_env).win_rate  # more episodes = lower variance
                 print(f"ep={ep:4d}  train_return={G:6.2f}  steps={steps:3d}  greedy_winrate={wr:.2f}")
 
-                # Escribir en el archivo CSV
-                log_writer.writerow({
-                    "episode": ep,
-                    "train_return": round(G, 2),
-                    "steps": steps,
-                    "epsilon": round(agent._eps(), 4),
-                    "q_rows": len(agent.Q),
-                    "eval_winrate": round(wr, 2)
-                })
-    
-    
+                # Registrar la fila (se escribe en disco en segundo plano)
+                sink.append(episode=ep, train_return=round(G, 2), steps=steps,
+                            epsilon=round(agent._eps(), 4), q_rows=len(agent.Q),
+                            eval_winrate=round(wr, 2))
+                ckpt.save(agent, env)  # solo las filas Q modificadas desde el último guardado
+        if venv is not None:
+            venv.close()
+    export_csv(metrics_dir, log_filepath)
+
     print(f"\nEntrenamiento completado. Guardando la tabla Q en '{q_table_filepath}'...")
-    with open(q_table_filepath, 'wb') as f:
-        pickle.dump(dict(agent.Q), f)
+    ckpt.compact(agent, env)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
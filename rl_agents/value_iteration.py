@@ -0,0 +1,146 @@
+# rl_agents/value_iteration.py
+"""
+Optimal policy of the battle vs the random bot by value iteration over modelo_combate.
+
+    python -m rl_agents.value_iteration [--hp-buckets 20 | --exact] [--objective reward|win]
+                                        [--ckpt checkpoints/q_table.pkl] [--check-episodes 2000]
+
+objective="reward" maximises the expected discounted return of calcular_reward_turno,
+objective="win" the discounted probability of winning (with gamma = 1 every action that
+keeps a sure win ties, including switching forever, so gamma < 1 is what makes the
+policy actually finish). Either way the (undiscounted) win probability of the resulting
+policy from the initial state is reported, and --ckpt evaluates a trained Q-table's
+greedy policy on the same model for comparison.
+--check-episodes plays the model policy in the real env as a sanity check (the model
+ignores max_steps truncation and, with --hp-buckets, rounds HP).
+"""
+import argparse, time
+from dataclasses import dataclass
+import numpy as np
+
+from modelo_combate import ModeloCombate, construir_modelo
+
+
+@dataclass
+class ValueIterationResult:
+    V: np.ndarray          # [S] optimal value per model state
+    Q: np.ndarray          # [A] value per state-action pair
+    policy: np.ndarray     # [S] optimal action per state (lowest action on ties)
+    iterations: int
+    win_prob: np.ndarray   # [S] win probability of `policy`
+
+
+def _best_pairs(model: ModeloCombate, Q: np.ndarray, V: np.ndarray, atol: float = 1e-9) -> np.ndarray:
+    """First state-action pair (lowest action) reaching max Q in each state."""
+    best = Q >= V[model.sa_estado] - atol
+    first = np.where(best, np.arange(len(Q)), len(Q))
+    return np.minimum.reduceat(first, model.inicio[:-1])
+
+
+def policy_values(model: ModeloCombate, sa: np.ndarray, rewards: np.ndarray, gamma: float,
+                  tol: float = 1e-10, max_iter: int = 1_000_000) -> np.ndarray:
+    """Iterative evaluation of the policy given by one state-action pair per state."""
+    P, r = model.P[sa], rewards[sa]
+    v = np.zeros(model.n_estados)
+    for _ in range(max_iter):
+        v2 = r + gamma * (P @ v)
+        if np.abs(v2 - v).max() < tol:
+            return v2
+        v = v2
+    return v
+
+
+def value_iteration(model: ModeloCombate, gamma: float = 0.99, objective: str = "reward",
+                    tol: float = 1e-8, max_iter: int = 100_000) -> ValueIterationResult:
+    if objective == "reward":
+        rewards = model.R
+    elif objective == "win":
+        rewards = model.p_victoria
+    else:
+        raise ValueError(f"unknown objective {objective!r} (reward | win)")
+    V = np.zeros(model.n_estados)
+    starts = model.inicio[:-1]
+    for it in range(1, max_iter + 1):
+        Q = rewards + gamma * (model.P @ V)
+        V2 = np.maximum.reduceat(Q, starts)
+        delta = np.abs(V2 - V).max()
+        V = V2
+        if delta < tol:
+            break
+    sa = _best_pairs(model, Q, V)
+    win = policy_values(model, sa, model.p_victoria, 1.0)
+    return ValueIterationResult(V, Q, model.sa_accion[sa], it, win)
+
+
+def greedy_policy_from_q(model: ModeloCombate, Qtab) -> np.ndarray:
+    """Action per model state of a Q-table's greedy policy over its observation ids."""
+    from rl_agents.evaluation import greedy_actions
+    legal = np.zeros((model.n_estados, 16), dtype=bool)
+    legal[model.sa_estado, model.sa_accion] = True
+    return greedy_actions(Qtab, model.obs, legal)
+
+
+def check_in_env(model: ModeloCombate, policy: np.ndarray, episodes: int, seed: int = 0,
+                 max_steps: int = 200) -> float:
+    """Monte-Carlo win rate of a model policy played in the real (vector) env."""
+    from rl_env.vector_pokemon_env import VectorPokemonEnv
+    venv = VectorPokemonEnv(min(episodes, 256), n_buckets=5, max_steps=max_steps, seed=seed)
+    venv.reset(seed=seed)
+    c = venv.battle
+    done_eps, wins = 0, 0
+    while done_eps < episodes:
+        s = model.indices(c.activo1, c.vivos1, c.vida1, c.activo2, c.vida2)
+        a = np.where(s >= 0, policy[np.maximum(s, 0)], np.argmax(c.acciones_legales(), axis=1))
+        _, _, term, trunc, info = venv.step(a)
+        fin = term | trunc
+        if fin.any():
+            wins += int(info["agent_won"].sum())
+            done_eps += int(fin.sum())
+    return wins / done_eps
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hp-buckets", type=int, default=20, help="HP resolution of the model (hp_to_bucket)")
+    ap.add_argument("--exact", action="store_true", help="exact HP (can be too many states)")
+    ap.add_argument("--objective", choices=("reward", "win"), default="reward")
+    ap.add_argument("--gamma", type=float, default=0.99)
+    ap.add_argument("--ckpt", type=str, default=None, help="Q-table checkpoint to compare against")
+    ap.add_argument("--check-episodes", type=int, default=0)
+    ap.add_argument("--out", type=str, default=None, help="save the policy (.npz)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    model = construir_modelo(discretizar=None if args.exact else args.hp_buckets)
+    t1 = time.perf_counter()
+    print(f"[model] {model} in {t1 - t0:.2f}s")
+    res = value_iteration(model, gamma=args.gamma, objective=args.objective)
+    print(f"[vi] {res.iterations} iterations in {time.perf_counter() - t1:.2f}s | "
+          f"V(start)={res.V[0]:.3f} | win probability {res.win_prob[0]:.4f}")
+
+    if args.ckpt:
+        from rl_agents.tabular_q import TabularQLearner
+        from rl_env.pokemon_env import PokemonEnv
+        from utils.checkpoint import load_checkpoint
+        env = PokemonEnv()
+        agent = TabularQLearner(n_actions=env.action_space.n)
+        load_checkpoint(agent, env, args.ckpt, mmap_mode="r")
+        from rl_agents.exact_eval import exact_evaluate
+        sa = model.pares(greedy_policy_from_q(model, agent.Q))
+        rewards = model.R if args.objective == "reward" else model.p_victoria
+        v = policy_values(model, sa, rewards, args.gamma)
+        print(f"[ckpt] {args.ckpt}: greedy V(start)={v[0]:.3f} on the model (optimal {res.V[0]:.3f})")
+        print(f"[ckpt] exact greedy policy: {exact_evaluate(agent)}")
+
+    if args.check_episodes:
+        wr = check_in_env(model, res.policy, args.check_episodes)
+        print(f"[check] env win rate of the model policy over {args.check_episodes} episodes: {wr:.4f}")
+
+    if args.out:
+        np.savez(args.out, policy=res.policy, V=res.V, obs=model.obs,
+                 **{k: v for k, v in model.estados.items()})
+        print(f"[save] {args.out}")
+
+
+if __name__ == "__main__":
+    main()
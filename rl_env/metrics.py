@@ -0,0 +1,86 @@
+# rl_env/metrics.py
+"""
+Optional per-phase timers and event counters for Combate.step_rl / PokemonEnv.step.
+
+Disabled instrumentation is just `metrics is None` checks on the hot path. When enabled
+(PokemonEnv(instrument=True)), every phase records its duration in a log2 histogram
+(bucket b holds durations in [2^(b-1), 2^b) ns), so collecting stays O(1) per event and
+the summary gives approximate percentiles over any number of steps.
+"""
+from time import perf_counter_ns
+from typing import Dict
+
+PHASES = (
+    "action_mask",    # PokemonEnv._action_mask (before and after the turn)
+    "agent_action",   # applying the agent's move/switch choice
+    "bot_move",       # Combate.elegir_movimiento_bot
+    "damage",         # ejecutar_ataque -> calcular_danio (+ HP update)
+    "ko",             # manejar_debilitado
+    "reward",         # calcular_reward_turno
+    "estado_raw",     # Combate.estado_raw
+    "obs_encode",     # bucketing + matchup + mixed-radix id
+)
+COUNTERS = ("steps", "turns", "misses", "kos_dealt", "kos_taken", "forced_switches", "illegal_fallbacks")
+_N_BUCKETS = 64
+
+
+class StepMetrics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hist: Dict[str, list] = {p: [0] * _N_BUCKETS for p in PHASES}
+        self.total_ns: Dict[str, int] = {p: 0 for p in PHASES}
+        self.counts: Dict[str, int] = {c: 0 for c in COUNTERS}
+
+    # --- recording (hot path) ---
+    def lap(self, phase: str, t0: int) -> int:
+        """Record now - t0 under phase and return now (start of the next phase)."""
+        now = perf_counter_ns()
+        dt = now - t0
+        self.hist[phase][min(dt.bit_length(), _N_BUCKETS - 1)] += 1
+        self.total_ns[phase] += dt
+        return now
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] += n
+
+    # --- reporting ---
+    @staticmethod
+    def _percentile_ns(hist, q: float) -> float:
+        n = sum(hist)
+        if n == 0:
+            return 0.0
+        target, acc = q * n, 0
+        for b, c in enumerate(hist):
+            acc += c
+            if acc >= target:
+                return float(2 ** b)  # bucket upper bound
+        return float(2 ** (_N_BUCKETS - 1))
+
+    def summary(self) -> dict:
+        """{"phases": {phase: count/total_ms/mean_us/p50_us/p90_us/p99_us/share}, "counters": {...}}"""
+        grand = sum(self.total_ns.values()) or 1
+        phases = {}
+        for p in PHASES:
+            h, n = self.hist[p], sum(self.hist[p])
+            phases[p] = {
+                "count": n,
+                "total_ms": self.total_ns[p] / 1e6,
+                "mean_us": self.total_ns[p] / n / 1e3 if n else 0.0,
+                "p50_us": self._percentile_ns(h, 0.50) / 1e3,
+                "p90_us": self._percentile_ns(h, 0.90) / 1e3,
+                "p99_us": self._percentile_ns(h, 0.99) / 1e3,
+                "share": self.total_ns[p] / grand,
+            }
+        return {"phases": phases, "counters": dict(self.counts)}
+
+    def report(self) -> str:
+        s = self.summary()
+        lines = [f"{'phase':13s} {'count':>9s} {'total ms':>10s} {'mean us':>9s} "
+                 f"{'p50<=us':>8s} {'p90<=us':>8s} {'p99<=us':>8s} {'share':>6s}"]
+        for p, d in s["phases"].items():
+            lines.append(f"{p:13s} {d['count']:9d} {d['total_ms']:10.1f} {d['mean_us']:9.2f} "
+                         f"{d['p50_us']:8.2f} {d['p90_us']:8.2f} {d['p99_us']:8.2f} {d['share']:6.1%}")
+        lines.append("  ".join(f"{k}={v}" for k, v in s["counters"].items()))
+        return "\n".join(lines)
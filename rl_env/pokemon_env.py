@@ -1,15 +1,28 @@
 # rl_env/pokemon_env.py
+from functools import lru_cache
+from time import perf_counter_ns
 from typing import Dict, Optional
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 
-from data import crear_todos_los_entrenadores
+from cache_datos import cargar_entrenadores
 from combate import Combate
 
-from rl_env.state_encoder import hp_to_bucket, TinyState, StateEncoder
+from rl_env.metrics import StepMetrics
+from rl_env.state_encoder import hp_to_bucket, TinyState, MixedRadixEncoder
 from rl_env.utils_types import _m, coarse_matchup
 
+N_ACTIONS = 16
+
+
+@lru_cache(maxsize=None)
+def mask_from_bits(bits: int) -> np.ndarray:
+    """Read-only bool view of Combate.mascara_legal (one shared array per distinct mask)."""
+    mask = ((bits >> np.arange(N_ACTIONS)) & 1).astype(bool)
+    mask.setflags(write=False)
+    return mask
+
 
 class PokemonEnv(gym.Env):
     """
@@ -22,53 +35,98 @@ class PokemonEnv(gym.Env):
     """
     metadata = {"render_modes": []}
 
-    def __init__(self, n_buckets: int = 5, max_steps: int = 200, seed: Optional[int] = None):
+    def __init__(self, n_buckets: int = 5, max_steps: int = 200, seed: Optional[int] = None,
+                 headless: bool = True, instrument: bool = False, bot=None, recorder=None):
         super().__init__()
         self.n_buckets = n_buckets
         self.max_steps = max_steps
-        self.encoder = StateEncoder()
+        # headless=True: the battle builds no log strings and prints nothing (training mode)
+        self.headless = headless
+        # stateless mixed-radix ids in [0, n_states): same id for the same state everywhere
+        self.encoder = MixedRadixEncoder(n_buckets)
+        self.n_states = self.encoder.n_states
         self.rng = np.random.default_rng(seed)
         self._t = 0
+        # instrument=True: per-phase timers/counters of every step in self.metrics
+        # (see rl_env.metrics); disabled it costs a few `is None` checks per step
+        self.metrics: Optional[StepMetrics] = StepMetrics() if instrument else None
+        # opponent policy (bot_busqueda.BotExpectimax / BotMCTS / ...); None = random moves
+        self.bot = bot
 
         # Build trainers and a factory to make fresh Combate each reset
-        entrenadores = crear_todos_los_entrenadores()
+        entrenadores = cargar_entrenadores()  # parsed once per process (see cache_datos)
         self.t1 = entrenadores[1]  # agente
         self.t2 = entrenadores[2]  # bot
         self.battle: Optional[Combate] = None
 
+        # recorder: rl_env.trajectory.TrajectoryRecorder; None = nothing recorded
+        self.recorder = recorder
+        self._obs = 0  # state id before the current step (for the recorder)
+        if recorder is not None:
+            recorder.attach(self)
+
         # Spaces (upper bounds; legality via action_mask)
         # We allow up to 16 discrete actions (4 moves + up to 12 switches is plenty)
-        self.action_space = spaces.Discrete(16)
-        # Observation is an integer index; we set a generous bound
-        self.observation_space = spaces.Discrete(200_000)
+        self.action_space = spaces.Discrete(N_ACTIONS)
+        # Observation is an integer index in [0, n_states)
+        self.observation_space = spaces.Discrete(self.n_states)
 
     # --- required Gym API ---
     def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
         if seed is not None:
             self.rng = np.random.default_rng(seed)
         self._t = 0
-        self.battle = Combate(self.t1, self.t2, interactive=False)  # our engine
+        # our engine; it draws accuracy rolls / bot moves from self.rng, so seed= fixes the battle
+        self.battle = Combate(self.t1, self.t2, interactive=False, headless=self.headless, rng=self.rng,
+                             bot=self.bot)
+        self.battle.metrics = self.metrics
         obs = self._obs_from_raw(self.battle.estado_raw())
         info = {"action_mask": self._action_mask()}
+        if self.recorder is not None:
+            self.recorder.begin_episode()
+            self._obs = obs
         return obs, info
 
     def step(self, action: int):
         assert self.battle is not None, "Call reset() before step()."
+        action = int(action)  # vector envs pass numpy ints; Combate only switches on int
         self._t += 1
+        m = self.metrics
+        if m is not None:
+            m.count("steps")
+            t0 = perf_counter_ns()
 
-        # Mask illegal actions (fallback to first legal)
-        mask = self._action_mask()
-        if action < 0 or action >= len(mask) or not mask[action]:
-            # Pick first legal action deterministically (or random among legals)
-            legal_idxs = np.flatnonzero(mask)
-            action = int(legal_idxs[0])
+        # Mask illegal actions (fallback to first legal); the battle keeps the mask as int bits
+        bits = self.battle.mascara_legal
+        if m is not None:
+            m.lap("action_mask", t0)
+        if action < 0 or action >= N_ACTIONS or not (bits >> action) & 1:
+            # Pick first legal action deterministically (lowest set bit)
+            action = (bits & -bits).bit_length() - 1
+            if m is not None:
+                m.count("illegal_fallbacks")
 
-        reward, ended = self.battle.step_rl(action)
+        reward, ended = self.battle.step_rl(action)  # agent_action/bot_move/damage/ko/reward phases
         terminated = bool(ended)
         truncated = (self._t >= self.max_steps) and not terminated
 
-        obs = self._obs_from_raw(self.battle.estado_raw())
-        info = {"action_mask": self._action_mask()}
+        if m is None:
+            obs = self._obs_from_raw(self.battle.estado_raw())
+            info = {"action_mask": self._action_mask()}
+        else:
+            t0 = perf_counter_ns()
+            raw = self.battle.estado_raw()
+            t0 = m.lap("estado_raw", t0)
+            obs = self._obs_from_raw(raw)
+            t0 = m.lap("obs_encode", t0)
+            info = {"action_mask": self._action_mask()}
+            m.lap("action_mask", t0)
+
+        if self.recorder is not None:
+            self.recorder.record(self._obs, action, reward, self.battle)
+            if terminated or truncated:
+                self.recorder.end_episode(0 if truncated else (1 if self.battle.pokemon_left_t2 == 0 else -1))
+            self._obs = obs
 
         return obs, float(reward), terminated, truncated, info
 
@@ -87,9 +145,5 @@ class PokemonEnv(gym.Env):
         return self.encoder.encode(tiny)
 
     def _action_mask(self) -> np.ndarray:
-        # Mark legal indices True
-        legales = self.battle.acciones_legales_agente()
-        mask = np.zeros(self.action_space.n, dtype=bool)
-        if len(legales) > 0:
-            mask[np.array(legales, dtype=int)] = True
-        return mask
+        # cached read-only array: copy it before modifying
+        return mask_from_bits(self.battle.mascara_legal)
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Tuple
+import numpy as np
 
 def hp_to_bucket(hp_actual: float, hp_total: float, n_buckets: int = 5) -> int:
     if hp_actual <= 0:
@@ -16,12 +17,69 @@ class TinyState:
     ours_left: int    # 1..3
     opps_left: int    # 1..3
 
+MAX_TEAM = 3  # pokémon per team -> *_left in 0..3
+
+def state_space_size(n_buckets: int = 5) -> int:
+    """
+    Number of distinct TinyStates: hp buckets in 0..n_buckets (x2), matchup in {-1,0,1},
+    ours_left/opps_left in 0..MAX_TEAM. Upper bound for mixed-radix ids.
+    """
+    return (n_buckets + 1) * (n_buckets + 1) * 3 * (MAX_TEAM + 1) * (MAX_TEAM + 1)
+
+def mixed_radix_id(s: TinyState, n_buckets: int = 5) -> int:
+    """Deterministic id in [0, state_space_size(n_buckets)) for a TinyState."""
+    i = s.our_hp_b
+    i = i * (n_buckets + 1) + s.opp_hp_b
+    i = i * 3 + (s.matchup + 1)
+    i = i * (MAX_TEAM + 1) + s.ours_left
+    i = i * (MAX_TEAM + 1) + s.opps_left
+    return i
+
+class MixedRadixEncoder:
+    """
+    Stateless, bijective TinyState <-> id mapping (mixed radix over our_hp_b, opp_hp_b,
+    matchup, ours_left, opps_left). Same id for the same state in every process and run,
+    so Q-tables from parallel workers and checkpoints can be merged/shared directly.
+    """
+    def __init__(self, n_buckets: int = 5):
+        self.n_buckets = n_buckets
+        self.n_states = state_space_size(n_buckets)
+
+    def encode(self, s: TinyState) -> int:
+        return mixed_radix_id(s, self.n_buckets)
+
+    def decode(self, i: int) -> TinyState:
+        i, opps_left = divmod(int(i), MAX_TEAM + 1)
+        i, ours_left = divmod(i, MAX_TEAM + 1)
+        i, matchup = divmod(i, 3)
+        our_hp_b, opp_hp_b = divmod(i, self.n_buckets + 1)
+        return TinyState(our_hp_b=our_hp_b, opp_hp_b=opp_hp_b, matchup=matchup - 1,
+                         ours_left=ours_left, opps_left=opps_left)
+
+    def encode_batch(self, our_hp_b, opp_hp_b, matchup, ours_left, opps_left) -> np.ndarray:
+        """Vectorized encode over integer arrays (one array per TinyState field)."""
+        n = self.n_buckets + 1
+        i = np.asarray(our_hp_b, dtype=np.int64) * n + opp_hp_b
+        i = i * 3 + (np.asarray(matchup, dtype=np.int64) + 1)
+        i = i * (MAX_TEAM + 1) + ours_left
+        i = i * (MAX_TEAM + 1) + opps_left
+        return i
+
+    def decode_batch(self, ids) -> Tuple[np.ndarray, ...]:
+        """Inverse of encode_batch: (our_hp_b, opp_hp_b, matchup, ours_left, opps_left) arrays."""
+        i, opps_left = np.divmod(np.asarray(ids, dtype=np.int64), MAX_TEAM + 1)
+        i, ours_left = np.divmod(i, MAX_TEAM + 1)
+        i, matchup = np.divmod(i, 3)
+        our_hp_b, opp_hp_b = np.divmod(i, self.n_buckets + 1)
+        return our_hp_b, opp_hp_b, matchup - 1, ours_left, opps_left
+
 class StateEncoder:
     """
-    Dictionary that maps the TinyState to an int, so the agent see a number 
-    which represents a unique combination of our_hp_bucket, opp_hp_bucket, matchup, ours_left, opps_left
+    Legacy encoder: dictionary that maps the TinyState to an int in first-seen order.
+    Only kept to read old checkpoints that stored its id -> TinyState map
+    (utils.checkpoint remaps those rows to MixedRadixEncoder ids).
     """
-    def __init__(self): 
+    def __init__(self):
         self._to_id: Dict[TinyState,int] = {}
         self._from_id: Dict[int,TinyState] = {}
     def encode(self, s: TinyState) -> int:
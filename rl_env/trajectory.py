@@ -0,0 +1,210 @@
+# rl_env/trajectory.py
+"""
+Compact on-disk record of PokemonEnv episodes, for audit and replay.
+
+    rec = TrajectoryRecorder("logs/trajectories/run1")
+    env = PokemonEnv(recorder=rec)
+    ... train ...
+    rec.close()
+
+    traj = TrajectoryReader("logs/trajectories/run1")
+    traj.episodes                      # one row per finished episode
+    turns = traj.episode(123)          # structured array, one row per turn
+
+Every turn is one row of a NumPy structured array (TURN_FIELDS + HP per slot, about
+50 bytes), written straight into a memory-mapped segment file, so recording costs one
+row store per step and the OS writes the pages back in the background. Segments are
+preallocated (sparse) for `segment_turns` rows and trimmed when they are closed; an
+episode never spans two segments. Per-episode rows (start row, length, outcome,
+return) go to a second memmap per segment.
+
+meta.json lists the dtypes, the trainers and the completed episodes of every segment.
+It is rewritten every `sync_every` episodes and on close, so after a crash everything
+up to the last sync is readable.
+
+Rows hold the state id seen *before* the action, the action actually applied (after
+the illegal-action fallback) and the battle *after* the turn: active slot and HP per
+slot (the active pokémon's current HP, the stored HP for the others). Hits are
+1 = hit, 0 = miss, -1 = did not attack (switched or fainted first).
+utils.replay_export renders recorded episodes to PNG frames or GIFs.
+"""
+import json, os
+from typing import Optional
+import numpy as np
+
+META = "meta.json"
+VERSION = 1
+
+TURN_FIELDS = [
+    ("t", np.uint16), ("obs", np.int32), ("action", np.int8), ("bot_move", np.int8),
+    ("hit_agent", np.int8), ("hit_bot", np.int8),
+    ("dmg_agent", np.float32), ("dmg_bot", np.float32), ("reward", np.float32),
+    ("active1", np.int8), ("active2", np.int8),
+]
+EPISODE_DTYPE = np.dtype([
+    ("episode", np.int64), ("start", np.int64), ("length", np.int32),
+    ("outcome", np.int8),   # 1 agent won, -1 bot won, 0 truncated
+    ("ret", np.float32),
+])
+_HIT = {None: -1, False: 0, True: 1}
+
+
+def turn_dtype(n1: int, n2: int) -> np.dtype:
+    return np.dtype(TURN_FIELDS + [("hp1", np.float32, (n1,)), ("hp2", np.float32, (n2,))])
+
+
+def _descr(dt: np.dtype):
+    return [list(f) if len(f) == 2 else [f[0], f[1], list(f[2])] for f in dt.descr]
+
+
+def _from_descr(descr) -> np.dtype:
+    return np.dtype([tuple(f) if len(f) == 2 else (f[0], f[1], tuple(f[2])) for f in descr])
+
+
+class TrajectoryRecorder:
+    def __init__(self, directory: str, segment_turns: int = 1 << 20, sync_every: int = 1000):
+        self.directory = directory
+        self.segment_turns = segment_turns
+        self.sync_every = sync_every
+        os.makedirs(directory, exist_ok=True)
+        self.meta = None
+        self.dtype: Optional[np.dtype] = None
+        self._turns = self._episodes = None
+        self._n_turns = self._n_episodes = 0
+        self._episode = 0
+        self._start = 0
+        self._G = 0.0
+        self._max_len = 0
+
+    # --- called by PokemonEnv ---
+    def attach(self, env):
+        """Fixes the row layout from the env's teams (one recorder per env)."""
+        t1, t2 = env.t1, env.t2
+        self.dtype = turn_dtype(len(t1.pokemons), len(t2.pokemons))
+        self._max_len = env.max_steps
+        if self.meta is None:
+            self.meta = {
+                "version": VERSION,
+                "turn_dtype": _descr(self.dtype),
+                "episode_dtype": _descr(EPISODE_DTYPE),
+                "trainers": [t1.name, t2.name],
+                "teams": [[p.name for p in t1.pokemons], [p.name for p in t2.pokemons]],
+                "n_buckets": env.n_buckets,
+                "segments": [],
+            }
+
+    def begin_episode(self):
+        if self._turns is None or self._n_turns + self._max_len > len(self._turns):
+            self._new_segment()
+        self._start = self._n_turns
+        self._G = 0.0
+
+    def record(self, obs: int, action: int, reward: float, battle):
+        idx_bot, dj, db, hit_j, hit_b = battle.ultimo_turno
+        e = battle.snapshot()
+        hp1, hp2 = list(e.vidas1), list(e.vidas2)
+        hp1[e.activo1] = e.vida1
+        hp2[e.activo2] = e.vida2
+        i = self._n_turns
+        self._turns[i] = (i - self._start + 1, obs, action, idx_bot, _HIT[hit_j], _HIT[hit_b],
+                          dj, db, reward, e.activo1, e.activo2, hp1, hp2)
+        self._n_turns = i + 1
+        self._G += reward
+
+    def end_episode(self, outcome: int):
+        j = self._n_episodes
+        self._episodes[j] = (self._episode, self._start, self._n_turns - self._start, outcome, self._G)
+        self._n_episodes = j + 1
+        self._episode += 1
+        if self._episode % self.sync_every == 0:
+            self._sync()
+
+    # --- segments ---
+    def _paths(self, k: int):
+        return f"turns.{k:05d}.bin", f"episodes.{k:05d}.bin"
+
+    def _new_segment(self):
+        self._close_segment()
+        k = len(self.meta["segments"])
+        turns_name, eps_name = self._paths(k)
+        cap = max(self.segment_turns, self._max_len)
+        self._turns = np.memmap(os.path.join(self.directory, turns_name), dtype=self.dtype, mode="w+", shape=(cap,))
+        self._episodes = np.memmap(os.path.join(self.directory, eps_name), dtype=EPISODE_DTYPE, mode="w+", shape=(cap,))
+        self._n_turns = self._n_episodes = 0
+        self.meta["segments"].append({"turns": turns_name, "episodes": eps_name, "n_turns": 0, "n_episodes": 0})
+
+    def _sync(self):
+        seg = self.meta["segments"][-1]
+        # only completed episodes count: rows of an episode in progress are ignored
+        last = self._episodes[self._n_episodes - 1] if self._n_episodes else None
+        seg["n_episodes"] = self._n_episodes
+        seg["n_turns"] = int(last["start"] + last["length"]) if last is not None else 0
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp = os.path.join(self.directory, META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.directory, META))
+
+    def _close_segment(self):
+        if self._turns is None:
+            return
+        self._sync()
+        seg = self.meta["segments"][-1]
+        self._turns.flush()
+        self._episodes.flush()
+        self._turns = self._episodes = None
+        # trim the preallocated files to what was written
+        os.truncate(os.path.join(self.directory, seg["turns"]), seg["n_turns"] * self.dtype.itemsize)
+        os.truncate(os.path.join(self.directory, seg["episodes"]), seg["n_episodes"] * EPISODE_DTYPE.itemsize)
+
+    def close(self):
+        """Trims the open segment and writes meta.json (an episode still in progress is dropped)."""
+        if self._turns is not None:
+            self._close_segment()
+        elif self.meta is not None:
+            self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """Read-only, memory-mapped view of a recorder directory."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META)) as f:
+            self.meta = json.load(f)
+        self.dtype = _from_descr(self.meta["turn_dtype"])
+        self._turns, eps = [], []
+        for seg in self.meta["segments"]:
+            self._turns.append(self._map(seg["turns"], self.dtype, seg["n_turns"]))
+            eps.append(self._map(seg["episodes"], EPISODE_DTYPE, seg["n_episodes"]))
+        self.episodes = np.concatenate(eps) if eps else np.zeros(0, dtype=EPISODE_DTYPE)
+        # segment of every episode row
+        self._segment = np.repeat(np.arange(len(eps)), [len(e) for e in eps])
+
+    def _map(self, name, dtype, n):
+        if n == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode="r", shape=(n,))
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def _index(self, episode: int) -> int:
+        # episode ids are increasing: binary search
+        i = int(np.searchsorted(self.episodes["episode"], episode))
+        if i == len(self.episodes) or self.episodes["episode"][i] != episode:
+            raise KeyError(episode)
+        return i
+
+    def episode(self, episode: int) -> np.ndarray:
+        """Turn rows of one recorded episode (a read-only memmap slice)."""
+        i = self._index(episode)
+        e = self.episodes[i]
+        return self._turns[self._segment[i]][e["start"]: e["start"] + e["length"]]
@@ -0,0 +1,51 @@
+# rl_env/vector_env.py
+"""
+Factory for gymnasium vector envs (SyncVectorEnv / AsyncVectorEnv) over PokemonEnv.
+
+State ids come from the stateless MixedRadixEncoder, so an id means the same TinyState
+in every worker: observations are plain Discrete ids, which AsyncVectorEnv writes into
+shared memory instead of pickling them through the pipes.
+
+Autoreset is SAME_STEP: a finished env is reset inside the same step() call and its
+terminal observation is in info["final_obs"] (see final_obs_batch).
+info["action_mask"] comes back batched as a [num_envs, 16] bool array.
+"""
+from typing import Callable, Optional
+import numpy as np
+import gymnasium as gym
+
+from rl_env.pokemon_env import PokemonEnv
+
+
+def final_obs_batch(obs: np.ndarray, info: dict) -> np.ndarray:
+    """obs with the rows of finished envs replaced by their terminal observation."""
+    if "final_obs" not in info:
+        return obs
+    out = obs.copy()
+    for i in np.flatnonzero(info["_final_obs"]):
+        out[i] = info["final_obs"][i]
+    return out
+
+
+def make_env_fn(rank: int, seed: Optional[int] = None, **env_kwargs) -> Callable[[], gym.Env]:
+    """Thunk building the rank-th worker env (seeded with seed + rank)."""
+    def _thunk():
+        env_seed = None if seed is None else seed + rank
+        return PokemonEnv(seed=env_seed, **env_kwargs)
+    return _thunk
+
+
+def make_vector_env(num_envs: int, *, asynchronous: bool = True, seed: Optional[int] = None,
+                    context: Optional[str] = None, **env_kwargs) -> gym.vector.VectorEnv:
+    """
+    Build num_envs PokemonEnv workers.
+      asynchronous=True  -> AsyncVectorEnv, one subprocess per env, obs via shared memory
+      asynchronous=False -> SyncVectorEnv, all envs in this process (handy for debugging)
+    env_kwargs are forwarded to PokemonEnv (n_buckets, max_steps, ...).
+    Call reset(seed=seed) on the result to get per-worker seeds seed, seed+1, ...
+    """
+    fns = [make_env_fn(i, seed, **env_kwargs) for i in range(num_envs)]
+    mode = gym.vector.AutoresetMode.SAME_STEP
+    if asynchronous:
+        return gym.vector.AsyncVectorEnv(fns, shared_memory=True, context=context, autoreset_mode=mode)
+    return gym.vector.SyncVectorEnv(fns, autoreset_mode=mode)
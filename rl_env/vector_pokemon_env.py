@@ -0,0 +1,103 @@
+# rl_env/vector_pokemon_env.py
+from typing import Optional
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+from gymnasium.vector.utils import batch_space
+
+from cache_datos import cargar_entrenadores
+from combate_vectorial import VectorCombate
+
+from rl_env.state_encoder import MixedRadixEncoder
+from rl_env.utils_types import coarse_matchup
+
+
+class VectorPokemonEnv(gym.vector.VectorEnv):
+    """
+    Batched PokemonEnv: n_envs battles stepped together by a single VectorCombate.
+    Same actions, observations, action_mask and rewards as PokemonEnv.
+
+    Autoreset is SAME_STEP: when a battle ends (or is truncated) it is reset inside
+    the same step() call. The returned obs is the first obs of the new episode and
+    the terminal obs is in info["final_obs"] (only meaningful where done).
+    """
+    metadata = {"render_modes": [], "autoreset_mode": gym.vector.AutoresetMode.SAME_STEP}
+
+    def __init__(self, n_envs: int, n_buckets: int = 5, max_steps: int = 200,
+                 seed: Optional[int] = None):
+        super().__init__()
+        self.num_envs = int(n_envs)
+        self.n_buckets = n_buckets
+        self.max_steps = max_steps
+        # same stateless encoder as PokemonEnv -> same ids
+        self.encoder = MixedRadixEncoder(n_buckets)
+        self.rng = np.random.default_rng(seed)
+
+        entrenadores = cargar_entrenadores()  # parsed once per process (see cache_datos)
+        self.t1 = entrenadores[1]  # agente
+        self.t2 = entrenadores[2]  # bot
+        self.battle = VectorCombate(self.t1, self.t2, self.num_envs, rng=self.rng)
+        self._t = np.zeros(self.num_envs, dtype=np.int64)
+
+        # matchup only depends on which two pokémon are active
+        self._matchup = np.array([[coarse_matchup(a.type1, a.type2, b.type1, b.type2)
+                                   for b in self.t2.pokemons] for a in self.t1.pokemons], dtype=np.int64)
+        # hp_to_bucket widths per slot
+        self._width1 = np.maximum(1, self.battle.hp_total1 // n_buckets)
+        self._width2 = np.maximum(1, self.battle.hp_total2 // n_buckets)
+
+        self.single_action_space = spaces.Discrete(16)
+        self.single_observation_space = spaces.Discrete(self.encoder.n_states)
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+
+    # --- Gym vector API ---
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+            self.battle.rng = self.rng
+        self.battle.reset()
+        self._t[:] = 0
+        return self._obs(), {"action_mask": self.battle.acciones_legales()}
+
+    def step(self, actions):
+        self._t += 1
+        actions = np.asarray(actions, dtype=np.int64)
+
+        # Mask illegal actions (fallback to first legal, like PokemonEnv)
+        ok = self.battle.es_legal(actions)
+        if not ok.all():
+            actions = np.where(ok, actions, np.argmax(self.battle.acciones_legales(), axis=1))
+
+        rewards, terminated = self.battle.step_rl(actions)
+        truncated = (self._t >= self.max_steps) & ~terminated
+
+        obs = self._obs()
+        info = {}
+        done = terminated | truncated
+        if done.any():
+            info["final_obs"] = obs.copy()
+            info["agent_won"] = self.battle.agent_won() & terminated
+            self.battle.reset(done)
+            self._t[done] = 0
+            obs = self._obs()
+        info["action_mask"] = self.battle.acciones_legales()
+        return obs, rewards, terminated, truncated, info
+
+    def observations(self) -> np.ndarray:
+        """State ids of the battles as they are now (e.g. after battle.fijar_estados)."""
+        return self._obs()
+
+    # --- helpers ---
+    def _buckets(self, vida, width):
+        # vectorized hp_to_bucket
+        b = ((vida - 1) // width).astype(np.int64) + 1
+        b = np.minimum(b, self.n_buckets)
+        return np.where(vida <= 0, 0, b)
+
+    def _obs(self) -> np.ndarray:
+        c = self.battle
+        our_b = self._buckets(c.vida1, self._width1[c.activo1])
+        opp_b = self._buckets(c.vida2, self._width2[c.activo2])
+        matchup = self._matchup[c.activo1, c.activo2]
+        return self.encoder.encode_batch(our_b, opp_b, matchup, c.left1, c.left2)
@@ -0,0 +1,110 @@
+# tabla_danio.py
+"""
+Tablas deterministas de daño de todo el roster (atacante x defensor x movimiento).
+
+El daño antes de la tirada de precisión (danio_base: efectividad, STAB y cociente de
+stats) sólo depende de (especie atacante, especie defensora, movimiento), así que se
+calcula una vez al compilar el dataset (cache_datos) y se guarda con él:
+
+    DANIO[a, d, m]     daño sin precisión (0 si el movimiento m no existe)
+    EFECTIVIDAD[a, m, d] efectividad del movimiento m de a contra d (1 si no existe)
+    PRECISION[a, m]    precisión 0..100 (0 si no existe: nunca acierta)
+    N_MOVS[a]          movimientos de a
+
+Las filas son el orden de crear_todos_los_pokemon; cada Pokemon del dataset guarda su
+fila en pokemon.idx_roster. Los arrays son float64 (no float32) para que el daño leído
+sea bit a bit el mismo que calcula danio_base y los combates no cambien. Para el
+camino escalar hay copias en listas, como en tabla_tipos.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+from danio import danio_base
+from tabla_tipos import efectividad_total
+
+MAX_MOVS = 4
+
+
+class TablaDanio:
+    def __init__(self, nombres: List[str], danio: np.ndarray, efectividad: np.ndarray,
+                 precision: np.ndarray, n_movs: np.ndarray):
+        self.nombres = list(nombres)
+        self.indice: Dict[str, int] = {n: i for i, n in enumerate(self.nombres)}
+        self.danio = danio
+        self.efectividad = efectividad
+        self.precision = precision
+        self.n_movs = n_movs
+        for arr in (danio, efectividad, precision, n_movs):
+            arr.setflags(write=False)
+        # copias en listas: leer un float de Python es más rápido que un escalar de NumPy
+        self.danio_l = danio.tolist()
+        self.precision_l = precision.tolist()
+
+    @classmethod
+    def construir(cls, pokemons) -> "TablaDanio":
+        n = len(pokemons)
+        danio = np.zeros((n, n, MAX_MOVS), dtype=np.float64)
+        eff = np.ones((n, MAX_MOVS, n), dtype=np.float64)
+        prec = np.zeros((n, MAX_MOVS), dtype=np.int64)
+        n_movs = np.array([len(p.movimientos) for p in pokemons], dtype=np.int64)
+        for ia, atacante in enumerate(pokemons):
+            for m, mov in enumerate(atacante.movimientos):
+                prec[ia, m] = mov.precision
+                for idf, defensor in enumerate(pokemons):
+                    e = efectividad_total(mov.type, defensor.type1, defensor.type2)
+                    eff[ia, m, idf] = e
+                    danio[ia, idf, m] = danio_base(atacante, defensor, mov, e)
+        return cls([p.name for p in pokemons], danio, eff, prec, n_movs)
+
+    # --- estado para pickle: las listas se reconstruyen al cargar ---
+    def __getstate__(self):
+        return {"nombres": self.nombres, "danio": self.danio, "efectividad": self.efectividad,
+                "precision": self.precision, "n_movs": self.n_movs}
+
+    def __setstate__(self, st):
+        self.__init__(st["nombres"], st["danio"].copy(), st["efectividad"].copy(),
+                      st["precision"].copy(), st["n_movs"].copy())
+
+    # --- consulta ---
+    def cubre(self, pokemons) -> bool:
+        """True si todos los pokémon son del roster de esta tabla (tienen su fila asignada)."""
+        return all(getattr(p, "idx_roster", None) is not None
+                   and p.idx_roster < len(self.nombres)
+                   and self.nombres[p.idx_roster] == p.name for p in pokemons)
+
+    def filas(self, pokemons) -> np.ndarray:
+        """Índices de fila de una lista de pokémon (p. ej. un equipo)."""
+        return np.array([self.indice[p.name] for p in pokemons], dtype=np.int64)
+
+    def danio_de(self, atacante, defensor, idx_mov: int) -> float:
+        """Daño sin precisión del movimiento idx_mov de atacante contra defensor."""
+        return self.danio_l[atacante.idx_roster][defensor.idx_roster][idx_mov]
+
+    def precision_de(self, atacante, idx_mov: int) -> int:
+        return self.precision_l[atacante.idx_roster][idx_mov]
+
+    def tablas_equipos(self, atacantes, defensores):
+        """(danio[a, d, m], efectividad[a, m, d], precision[a, m]) restringidas a dos equipos."""
+        fa, fd = self.filas(atacantes), self.filas(defensores)
+        return (self.danio[np.ix_(fa, fd)],
+                self.efectividad[fa][:, :, fd],
+                self.precision[fa])
+
+
+# --- tabla del dataset compilado (la registra cache_datos al cargar) ---
+_registrada: Optional[TablaDanio] = None
+
+
+def registrar(tabla: Optional[TablaDanio]):
+    global _registrada
+    _registrada = tabla
+
+
+def tabla_registrada() -> Optional[TablaDanio]:
+    return _registrada
+
+
+def tabla_para(pokemons) -> Optional[TablaDanio]:
+    """La tabla registrada si cubre a todos estos pokémon; si no, None (cálculo directo)."""
+    t = _registrada
+    return t if t is not None and t.cubre(pokemons) else None
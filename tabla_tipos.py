@@ -0,0 +1,100 @@
+# tabla_tipos.py
+"""
+Registro precompilado de la tabla de tipos.
+
+Contiene la definición de la tabla de tipos (tipos / datos_efectividad, que data.py
+reexporta) y la compila una sola vez:
+    - TIPO_ID: nombre del tipo -> id entero (0..17)
+    - EFECTIVIDAD: matriz float32 [18, 18] (atacante, defensor)
+    - EFECTIVIDAD_DUAL: tabla float32 [19, 19, 19] (atacante, defensor1, defensor2)
+      con el producto ya calculado. El índice SIN_TIPO (18) representa "sin tipo"
+      (None/NaN) y es neutro en cualquier posición.
+
+Las búsquedas escalares usan copias en listas de Python (más rápidas que indexar
+un ndarray elemento a elemento); las vectorizadas usan directamente los arrays.
+
+No depende de pandas: es lo único de la tabla que necesita el camino de entrenamiento.
+"""
+from typing import Dict, Optional
+import numpy as np
+
+tipos = [
+    "Normal", "Fuego", "Agua", "Planta", "Electrico", "Hielo", "Lucha", "Veneno", "Tierra",
+    "Volador", "Psiquico", "Bicho", "Roca", "Fantasma", "Dragon", "Siniestro", "Acero", "Hada"
+]
+
+datos_efectividad = [
+    # Defensor ->
+    # Nor   Fue    Agu    Pla    Elé    Hie    Luc    Ven    Tie    Vol    Psi    Bic    Roc    Fan    Dra    Sin    Ace    Had   ↓ Atacante
+    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   0.5,   0.0,   1.0,   1.0,   0.5,   1.0], # Normal
+    [1.0,  0.5,   0.5,   2.0,   1.0,   2.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   0.5,   1.0,   2.0,   1.0], # Fuego
+    [1.0,  2.0,   0.5,   0.5,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   1.0,   1.0], # Agua
+    [1.0,  0.5,   2.0,   0.5,   1.0,   1.0,   1.0,   0.5,   2.0,   0.5,   1.0,   0.5,   2.0,   1.0,   0.5,   1.0,   0.5,   1.0], # Planta
+    [1.0,  1.0,   2.0,   0.5,   0.5,   1.0,   1.0,   1.0,   0.0,   2.0,   1.0,   1.0,   1.0,   1.0,   0.5,   1.0,   1.0,   1.0], # Eléctrico
+    [1.0,  0.5,   0.5,   2.0,   1.0,   0.5,   1.0,   1.0,   2.0,   2.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0], # Hielo
+    [2.0,  1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   0.5,   0.5,   0.5,   2.0,   0.0,   1.0,   2.0,   2.0,   0.5], # Lucha
+    [1.0,  1.0,   1.0,   2.0,   1.0,   1.0,   1.0,   0.5,   0.5,   1.0,   1.0,   1.0,   0.5,   0.5,   1.0,   1.0,   0.0,   2.0], # Veneno
+    [1.0,  2.0,   1.0,   0.5,   2.0,   1.0,   1.0,   2.0,   1.0,   0.0,   1.0,   0.5,   2.0,   1.0,   1.0,   1.0,   2.0,   1.0], # Tierra
+    [1.0,  1.0,   1.0,   2.0,   0.5,   1.0,   2.0,   1.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   1.0,   1.0,   0.5,   1.0], # Volador
+    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   2.0,   1.0,   1.0,   0.5,   1.0,   1.0,   1.0,   1.0,   0.0,   0.5,   1.0], # Psíquico
+    [1.0,  0.5,   1.0,   2.0,   1.0,   1.0,   0.5,   0.5,   1.0,   0.5,   2.0,   1.0,   1.0,   0.5,   1.0,   2.0,   0.5,   0.5], # Bicho
+    [1.0,  2.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   0.5,   2.0,   1.0,   2.0,   1.0,   1.0,   1.0,   1.0,   0.5,   1.0], # Roca
+    [0.0,  1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   1.0], # Fantasma
+    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   0.5,   0.0], # Dragón
+    [1.0,  1.0,   1.0,   1.0,   1.0,   1.0,   0.5,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   2.0,   1.0,   0.5,   1.0,   0.5], # Siniestro
+    [1.0,  0.5,   0.5,   1.0,   0.5,   2.0,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   1.0,   1.0,   1.0,   0.5,   2.0], # Acero
+    [1.0,  0.5,   1.0,   1.0,   1.0,   1.0,   2.0,   0.5,   1.0,   1.0,   1.0,   1.0,   1.0,   1.0,   2.0,   2.0,   0.5,   1.0]  # Hada
+]
+
+N_TIPOS = len(tipos)
+SIN_TIPO = N_TIPOS  # id reservado para "no tiene tipo"
+
+TIPO_ID: Dict[str, int] = {t: i for i, t in enumerate(tipos)}
+
+EFECTIVIDAD = np.array(datos_efectividad, dtype=np.float32)
+EFECTIVIDAD.setflags(write=False)
+
+
+def _construir_tabla_dual() -> np.ndarray:
+    """Tabla [atacante, defensor1, defensor2] con la fila/columnas SIN_TIPO a 1.0."""
+    ext = np.ones((N_TIPOS + 1, N_TIPOS + 1), dtype=np.float32)
+    ext[:N_TIPOS, :N_TIPOS] = EFECTIVIDAD
+    dual = ext[:, :, None] * ext[:, None, :]
+    dual.setflags(write=False)
+    return dual
+
+
+EFECTIVIDAD_DUAL = _construir_tabla_dual()
+
+# Copias en listas para el camino escalar (evitan crear escalares de NumPy)
+_SIMPLE = np.pad(EFECTIVIDAD, ((0, 1), (0, 1)), constant_values=1.0).tolist()
+_DUAL = EFECTIVIDAD_DUAL.tolist()
+
+
+def tipo_id(tipo: Optional[str]) -> int:
+    """
+    Id entero de un tipo. None/NaN (pokémon sin segundo tipo) y los tipos
+    desconocidos se mapean a SIN_TIPO, que es neutro.
+    """
+    if tipo is None or tipo != tipo:  # NaN != NaN
+        return SIN_TIPO
+    return TIPO_ID.get(tipo, SIN_TIPO)
+
+
+def es_tipo_conocido(tipo: Optional[str]) -> bool:
+    return tipo in TIPO_ID
+
+
+def efectividad(tipo_atacante: Optional[str], tipo_defensor: Optional[str]) -> float:
+    """Multiplicador de un tipo de ataque contra UN tipo defensor."""
+    return _SIMPLE[tipo_id(tipo_atacante)][tipo_id(tipo_defensor)]
+
+
+def efectividad_total(tipo_atacante: Optional[str], tipo_def1: Optional[str], tipo_def2: Optional[str]) -> float:
+    """Multiplicador total de un tipo de ataque contra un defensor de (hasta) dos tipos."""
+    return _DUAL[tipo_id(tipo_atacante)][tipo_id(tipo_def1)][tipo_id(tipo_def2)]
+
+
+def efectividad_total_ids(att_id: int, def1_id: int, def2_id: int) -> float:
+    """Igual que efectividad_total pero con ids ya resueltos."""
+    return _DUAL[att_id][def1_id][def2_id]
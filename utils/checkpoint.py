@@ -1,26 +1,305 @@
 # utils/checkpoint.py
-import pickle, numpy as np
+"""
+Q-table checkpoints in two formats:
+
+  *.pkl   pickle of {"Q": {state_id: row}, "encoder": {...}}  (also reads the legacy
+          files in checkpoints/ that stored the first-seen "encoder_from_id" map)
+  *.qtab  binary, memory-mappable:
+            [0, HEADER_SIZE)   MAGIC + uint32 length + JSON header (schema version,
+                               n_actions, n_buckets, n_states, hyperparameters, offsets)
+            [q_offset, ...)    float32 Q block, C order, shape (n_states, n_actions)
+            [enc_offset, ...)  encoder section: uint8 visited flag per state id
+          Loading maps the Q block with np.memmap, so several evaluation processes
+          can share one on-disk table without copying it.
+
+save_checkpoint / load_checkpoint pick the format from the extension (save) or the
+magic bytes (load). Snapshots are written to a temp file and renamed into place, so a
+crash mid-save never leaves a half-written checkpoint.
+
+IncrementalCheckpointer adds an append-only delta log (<path>.delta) holding only the
+rows that changed since the previous save; it is periodically compacted into a new
+full snapshot.
+"""
+import json, os, pickle, struct, zlib, numpy as np
 from collections import defaultdict
+from rl_agents.q_table import DenseQTable
+
+BIN_EXT = ".qtab"
+MAGIC = b"PKMNQTAB"
+SCHEMA_VERSION = 1
+HEADER_SIZE = 4096   # fixed header region; the Q block starts right after it
+_ALIGN = 64
+_HPARAMS = ("alpha", "gamma", "eps_start", "eps_end", "eps_decay", "t")
+
+def _scalar(v):
+    """Plain Python number for the JSON header (gymnasium hands out numpy ints)."""
+    return v.item() if isinstance(v, np.generic) else v
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def _is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _atomic_write(path: str, write_fn):
+    """write_fn(f) into path.tmp, fsync, then rename over path (atomic on POSIX and Windows)."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write_fn(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# ---------- pickle format ----------
 
-def save_checkpoint(agent, env, path: str):
-    # agent.Q: defaultdict(int -> np.ndarray)
-    # env.encoder.*: the ID<->TinyState maps
+def _save_pickle(agent, env, path: str, generation: int = 0):
+    # agent.Q: int -> np.ndarray (defaultdict or DenseQTable)
+    # env.encoder is stateless (mixed radix): n_buckets is enough to rebuild it
     payload = {
-        "Q": {int(k): v for k, v in agent.Q.items()},                 # visited rows only
-        "encoder_from_id": {int(k): env.encoder._from_id[k] for k in env.encoder._from_id},
-        # you could reconstruct to_id from from_id, so we don’t store it twice
+        "Q": {int(k): np.array(v) for k, v in agent.Q.items()},      # visited rows only
+        "encoder": {"kind": "mixed_radix", "n_buckets": env.encoder.n_buckets},
+        "generation": generation,
     }
-    with open(path, "wb") as f:
-        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _atomic_write(path, lambda f: pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL))
 
-def load_checkpoint(agent, env, path: str):
+def _rows_from_payload(payload, env):
+    """Q rows keyed by the env's current state ids."""
+    if "encoder_from_id" in payload:
+        # legacy checkpoint: ids were assigned in first-seen order -> remap through TinyState
+        from_id = payload["encoder_from_id"]
+        return {env.encoder.encode(from_id[sid]): row for sid, row in payload["Q"].items()}
+    enc = payload.get("encoder", {})
+    if enc.get("n_buckets", env.encoder.n_buckets) != env.encoder.n_buckets:
+        raise ValueError(f"checkpoint was saved with n_buckets={enc['n_buckets']}, "
+                         f"env uses n_buckets={env.encoder.n_buckets}")
+    return payload["Q"]
+
+def _load_pickle(agent, env, path: str):
     with open(path, "rb") as f:
         payload = pickle.load(f)
-    # restore Q as defaultdict again (so unseen states still auto-init)
-    agent.Q = defaultdict(lambda: np.zeros(agent.n_actions, dtype=np.float32), payload["Q"])
-    # rebuild encoder maps
-    env.encoder._to_id.clear()
-    env.encoder._from_id.clear()
-    for sid, tiny in payload["encoder_from_id"].items():
-        env.encoder._from_id[sid] = tiny
-        env.encoder._to_id[tiny] = sid
+    rows = _rows_from_payload(payload, env)
+    if isinstance(agent.Q, DenseQTable):
+        # dense agent: copy the stored rows into the array-backed table
+        for sid, row in rows.items():
+            agent.Q[sid] = row
+    else:
+        # restore Q as defaultdict again (so unseen states still auto-init)
+        agent.Q = defaultdict(lambda: np.zeros(agent.n_actions, dtype=np.float32), rows)
+
+# ---------- binary format ----------
+
+def _dense_arrays(agent, n_states: int):
+    """(Q block, visited) for the whole state space, whatever the agent's Q storage is."""
+    if isinstance(agent.Q, DenseQTable):
+        q = np.zeros((n_states, agent.n_actions), dtype=np.float32)
+        k = min(n_states, len(agent.Q.data))
+        q[:k] = agent.Q.data[:k]
+        visited = np.zeros(n_states, dtype=np.uint8)
+        visited[:k] = agent.Q.visited[:k]
+        return q, visited
+    q = np.zeros((n_states, agent.n_actions), dtype=np.float32)
+    visited = np.zeros(n_states, dtype=np.uint8)
+    for sid, row in agent.Q.items():
+        q[int(sid)] = row
+        visited[int(sid)] = 1
+    return q, visited
+
+def read_header(path: str) -> dict:
+    """Parse and validate the JSON header of a .qtab file."""
+    with open(path, "rb") as f:
+        head = f.read(HEADER_SIZE)
+    if head[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a binary Q-table checkpoint")
+    (n,) = struct.unpack_from("<I", head, len(MAGIC))
+    header = json.loads(head[len(MAGIC) + 4: len(MAGIC) + 4 + n].decode("utf-8"))
+    if header.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(f"unsupported checkpoint schema version {header.get('schema_version')}")
+    return header
+
+def _save_binary(agent, env, path: str, generation: int = 0):
+    n_states, n_actions = env.n_states, agent.n_actions
+    q, visited = _dense_arrays(agent, n_states)
+    q_offset = HEADER_SIZE
+    enc_offset = _align(q_offset + q.nbytes)
+    header = {
+        "schema_version": SCHEMA_VERSION,
+        "n_actions": int(n_actions),
+        "n_buckets": int(env.encoder.n_buckets),
+        "n_states": int(n_states),
+        "dtype": "float32",
+        "learner": type(agent).__name__,
+        "hyperparams": {k: _scalar(getattr(agent, k)) for k in _HPARAMS if hasattr(agent, k)},
+        "encoder": {"kind": "mixed_radix", "n_buckets": int(env.encoder.n_buckets), "section": "visited_u8"},
+        "q_offset": q_offset,
+        "enc_offset": enc_offset,
+        "generation": generation,
+    }
+    blob = json.dumps(header).encode("utf-8")
+    if len(MAGIC) + 4 + len(blob) > HEADER_SIZE:
+        raise ValueError("checkpoint header does not fit in HEADER_SIZE")
+
+    def write(f):
+        f.write(MAGIC + struct.pack("<I", len(blob)) + blob)
+        f.write(b"\0" * (q_offset - f.tell()))
+        f.write(q.tobytes(order="C"))
+        f.write(b"\0" * (enc_offset - f.tell()))
+        f.write(visited.tobytes())
+    _atomic_write(path, write)
+
+def _load_binary(agent, env, path: str, mmap_mode: str = "c"):
+    """
+    Map the Q block of a .qtab file into agent.Q (a DenseQTable over np.memmap).
+      mmap_mode="r"   read-only, shared page cache (evaluation)
+      mmap_mode="c"   copy-on-write: updates stay in this process (resume training)
+      mmap_mode="r+"  updates are written back to the file
+    The step counter `t` is restored too, so a resumed run continues its ε schedule;
+    the other hyperparameters stay as the agent was built (they are informative).
+    """
+    h = read_header(path)
+    if h["n_buckets"] != env.encoder.n_buckets or h["n_actions"] != agent.n_actions:
+        raise ValueError(f"checkpoint (n_buckets={h['n_buckets']}, n_actions={h['n_actions']}) does not "
+                         f"match env/agent (n_buckets={env.encoder.n_buckets}, n_actions={agent.n_actions})")
+    shape = (h["n_states"], h["n_actions"])
+    q = np.memmap(path, dtype=np.float32, mode=mmap_mode, offset=h["q_offset"], shape=shape)
+    visited = np.fromfile(path, dtype=np.uint8, count=h["n_states"], offset=h["enc_offset"])
+    agent.Q = DenseQTable.from_arrays(q, visited)
+    t = h.get("hyperparams", {}).get("t")
+    if t is not None and hasattr(agent, "t"):
+        agent.t = int(t)
+
+# ---------- public API ----------
+
+def save_checkpoint(agent, env, path: str, generation: int = 0):
+    if path.endswith(BIN_EXT):
+        _save_binary(agent, env, path, generation)
+    else:
+        _save_pickle(agent, env, path, generation)
+
+def load_checkpoint(agent, env, path: str, mmap_mode: str = "c"):
+    if _is_binary(path):
+        _load_binary(agent, env, path, mmap_mode=mmap_mode)
+    else:
+        _load_pickle(agent, env, path)
+
+def checkpoint_generation(path: str) -> int:
+    """Compaction generation stored in a snapshot (0 for files without one)."""
+    if _is_binary(path):
+        return int(read_header(path).get("generation", 0))
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+    return int(payload.get("generation", 0)) if isinstance(payload, dict) else 0
+
+def describe_checkpoint(path: str) -> dict:
+    """Small summary of a checkpoint of either format (instead of dumping every row)."""
+    if _is_binary(path):
+        h = read_header(path)
+        visited = np.fromfile(path, dtype=np.uint8, count=h["n_states"], offset=h["enc_offset"])
+        return {"format": "qtab", **{k: v for k, v in h.items() if not k.endswith("_offset")},
+                "rows_visited": int(visited.sum()), "bytes": os.path.getsize(path)}
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+    if "Q" not in payload:   # raw {state_id: row} dict (train_sarsa.py output)
+        payload = {"Q": payload}
+    rows = payload["Q"]
+    first = next(iter(rows.values()), None)
+    return {"format": "pickle",
+            "encoder": "legacy first-seen ids" if "encoder_from_id" in payload else payload.get("encoder"),
+            "rows_visited": len(rows),
+            "n_actions": None if first is None else len(first),
+            "bytes": os.path.getsize(path)}
+
+# ---------- incremental checkpoints (snapshot + append-only delta log) ----------
+
+DELTA_MAGIC = b"QDLT"
+_DELTA_HEAD = struct.Struct("<4sIII")   # magic, generation, n_rows, n_actions
+
+class IncrementalCheckpointer:
+    """
+    Snapshot at `path` plus an append-only delta log at `path`.delta.
+
+    save() appends only the rows reported by agent.pop_dirty(), so its cost scales with
+    how many rows changed, not with the table size. Every `compact_every` appends (or
+    once the log outgrows the snapshot) the table is compacted into a fresh snapshot
+    (atomic rename) with generation + 1 and the log is dropped. Each delta record carries
+    the generation it applies to and a CRC32, so records left over from a crash between
+    the rename and the log removal, or a torn last record, are ignored by load().
+
+    Deltas only make sense on top of a snapshot of this same table: until load() or
+    compact() has run, save() writes a full snapshot (an older file at `path` belongs
+    to another run and is replaced, not appended to).
+    """
+    def __init__(self, path: str, compact_every: int = 20):
+        self.path = path
+        self.delta_path = path + ".delta"
+        self.compact_every = compact_every
+        self.generation = checkpoint_generation(path) if os.path.exists(path) else 0
+        self._appends = 0
+        self._synced = False  # does the snapshot on disk hold this agent's table?
+
+    def save(self, agent, env):
+        if not self._synced:
+            self.compact(agent, env)
+            return
+        dirty = agent.pop_dirty()
+        if dirty:
+            self._append(agent, sorted(dirty))
+        if self._appends >= self.compact_every or self._delta_size() > os.path.getsize(self.path):
+            self.compact(agent, env)
+
+    def compact(self, agent, env):
+        """Write a full snapshot of the current table and drop the delta log."""
+        agent.pop_dirty()
+        save_checkpoint(agent, env, self.path, generation=self.generation + 1)
+        self.generation += 1
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._appends = 0
+        self._synced = True
+
+    def load(self, agent, env, mmap_mode: str = "c"):
+        """Load the snapshot and replay the valid delta records of its generation."""
+        load_checkpoint(agent, env, self.path, mmap_mode=mmap_mode)
+        self.generation = checkpoint_generation(self.path)
+        for ids, rows in self._read_deltas():
+            for sid, row in zip(ids.tolist(), rows):
+                agent.Q[sid][:] = row
+        agent.pop_dirty()
+        self._synced = True
+
+    # --- delta log ---
+    def _delta_size(self) -> int:
+        return os.path.getsize(self.delta_path) if os.path.exists(self.delta_path) else 0
+
+    def _append(self, agent, ids):
+        rows = np.stack([np.asarray(agent.Q[s], dtype=np.float32) for s in ids])
+        body = (_DELTA_HEAD.pack(DELTA_MAGIC, self.generation, len(ids), rows.shape[1])
+                + np.asarray(ids, dtype=np.int64).tobytes() + rows.tobytes())
+        with open(self.delta_path, "ab") as f:
+            f.write(body + struct.pack("<I", zlib.crc32(body)))
+            f.flush()
+            os.fsync(f.fileno())
+        self._appends += 1
+
+    def _read_deltas(self):
+        if not os.path.exists(self.delta_path):
+            return
+        with open(self.delta_path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _DELTA_HEAD.size <= len(data):
+            magic, gen, n, n_actions = _DELTA_HEAD.unpack_from(data, pos)
+            end = pos + _DELTA_HEAD.size + n * 8 + n * n_actions * 4
+            if magic != DELTA_MAGIC or end + 4 > len(data):
+                break                                    # torn tail from a crash
+            body = data[pos:end]
+            (crc,) = struct.unpack_from("<I", data, end)
+            if zlib.crc32(body) != crc:
+                break
+            pos = end + 4
+            if gen != self.generation:
+                continue                                 # stale: already in the snapshot
+            off = _DELTA_HEAD.size
+            ids = np.frombuffer(body, dtype=np.int64, count=n, offset=off)
+            rows = np.frombuffer(body, dtype=np.float32, count=n * n_actions, offset=off + n * 8)
+            yield ids, rows.reshape(n, n_actions)
@@ -0,0 +1,168 @@
+# utils/metrics_sink.py
+"""
+Buffered, columnar writer for per-episode training metrics.
+
+Rows go into preallocated NumPy column buffers; every `chunk_rows` rows the full
+buffers are handed to a background thread that writes them as one chunk file
+(an uncompressed .npz: one .npy array per column), so the training loop never waits
+on the disk. At most `max_pending` chunks wait in memory; only if the disk falls that
+far behind does append() block.
+
+Layout of a run directory (e.g. logs/train_log_20251026_223102.metrics/):
+
+    <worker>.<seq:06d>.npz      chunk `seq` of worker `worker`
+
+Each writer only touches files with its own worker prefix (default: the pid), so
+several processes can log into the same directory at once. Chunks are written to a
+temp name and renamed into place: readers never see a half-written chunk, and after a
+crash every completed chunk is still readable.
+
+read_metrics() concatenates the chunks (by worker, then sequence) and export_csv()
+writes the old CSV layout for plots and spreadsheets:
+
+    python -m utils.metrics_sink logs/run.metrics [--csv logs/run.csv]
+"""
+import argparse, csv, glob, os, queue, threading
+from typing import Dict, Optional
+import numpy as np
+
+CHUNK_EXT = ".npz"
+
+
+class MetricsSink:
+    def __init__(self, directory: str, columns: Dict[str, type], worker: Optional[str] = None,
+                 chunk_rows: int = 4096, max_pending: int = 16, fresh: bool = False):
+        """
+        columns: name -> NumPy dtype, in CSV order. Float columns not given in a row are NaN,
+        integer columns 0. fresh=True deletes the chunks already in `directory` (start of a
+        new run, like opening a CSV with "w"); secondary workers of the same run leave it False.
+        """
+        self.directory = directory
+        self.columns = {k: np.dtype(v) for k, v in columns.items()}
+        self.worker = str(worker if worker is not None else os.getpid())
+        self.chunk_rows = chunk_rows
+        os.makedirs(directory, exist_ok=True)
+        if fresh:
+            for p in glob.glob(os.path.join(directory, "*" + CHUNK_EXT)):
+                os.remove(p)
+        self._seq = 0
+        self._n = 0
+        self._buf = self._new_buffers()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._writer, name=f"metrics-sink-{self.worker}", daemon=True)
+        self._thread.start()
+
+    def _new_buffers(self) -> Dict[str, np.ndarray]:
+        buf = {}
+        for k, dt in self.columns.items():
+            buf[k] = np.full(self.chunk_rows, np.nan, dtype=dt) if dt.kind == "f" else np.zeros(self.chunk_rows, dtype=dt)
+        return buf
+
+    def append(self, **row):
+        """Adds one row (column=value). Cheap: a few array stores."""
+        if self._error is not None:
+            raise RuntimeError("metrics writer thread failed") from self._error
+        with self._lock:
+            i = self._n
+            buf = self._buf
+            for k, v in row.items():
+                buf[k][i] = v
+            self._n = i + 1
+            if self._n == self.chunk_rows:
+                self._submit()
+
+    def _submit(self):
+        # called with the lock held and at least one row buffered
+        n, buf = self._n, self._buf
+        chunk = {k: v[:n] for k, v in buf.items()}
+        path = os.path.join(self.directory, f"{self.worker}.{self._seq:06d}{CHUNK_EXT}")
+        self._seq += 1
+        self._buf = self._new_buffers()
+        self._n = 0
+        self._queue.put((path, chunk))
+
+    def flush(self):
+        """Hands the rows buffered so far to the writer thread (does not wait for the disk)."""
+        with self._lock:
+            if self._n:
+                self._submit()
+
+    def close(self):
+        """Flushes, waits for every pending chunk to be written and stops the thread."""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("metrics writer thread failed") from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue  # keep draining so producers never block on a dead writer
+            path, chunk = item
+            try:
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    np.savez(f, **chunk)
+                os.replace(tmp, path)
+            except BaseException as e:
+                self._error = e
+
+
+def chunk_paths(directory: str):
+    """Completed chunk files, ordered by worker and sequence number."""
+    paths = glob.glob(os.path.join(directory, "*" + CHUNK_EXT))
+    return sorted(paths, key=lambda p: os.path.basename(p).rsplit(".", 2)[:2])
+
+
+def read_metrics(directory: str) -> Dict[str, np.ndarray]:
+    """All rows of a run directory as {column: array}."""
+    parts: Dict[str, list] = {}
+    for path in chunk_paths(directory):
+        with np.load(path) as z:
+            for k in z.files:
+                parts.setdefault(k, []).append(z[k])
+    return {k: np.concatenate(v) for k, v in parts.items()}
+
+
+def export_csv(directory: str, csv_path: str) -> int:
+    """Writes the run as CSV (NaN -> empty cell) and returns the number of rows."""
+    data = read_metrics(directory)
+    names = list(data)
+    cols = []
+    for k in names:
+        a = data[k]
+        if a.dtype.kind == "f":
+            cols.append(["" if v != v else repr(v) for v in a.tolist()])
+        else:
+            cols.append(a.tolist())
+    with open(csv_path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(names)
+        w.writerows(zip(*cols))
+    return len(cols[0]) if cols else 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("directory", help="run directory written by MetricsSink")
+    ap.add_argument("--csv", type=str, default=None, help="output CSV (default: <directory without .metrics>.csv)")
+    args = ap.parse_args()
+    out = args.csv or os.path.splitext(args.directory.rstrip("/\\"))[0] + ".csv"
+    n = export_csv(args.directory, out)
+    print(f"[export] {n} rows -> {out}")
+
+
+if __name__ == "__main__":
+    main()
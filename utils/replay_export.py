@@ -0,0 +1,121 @@
+# utils/replay_export.py
+"""
+Re-renders episodes recorded by rl_env.trajectory as PNG frames or an animated GIF.
+
+    python -m utils.replay_export logs/trajectories/run1 --episode 123 --gif ep123.gif
+    python -m utils.replay_export logs/trajectories/run1 --episode 123 --frames ep123/
+
+Frame 0 is the start of the battle (full HP, first slot of each team); frame k is the
+battle after turn k, with the turn summarised in the side panel. Frames are drawn with
+image_generator.componer_imagen_combate in a process pool: every worker loads the
+trainers and the sprite atlas once, and saves its own PNGs; for a GIF the frames come
+back to the parent, which assembles them in order.
+"""
+import argparse, os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from rl_env.trajectory import TrajectoryReader
+
+# per-process state of the render workers
+_T1 = _T2 = None
+
+
+def _load_trainers(trainers: List[str]):
+    from cache_datos import cargar_entrenadores
+    by_name = {e.name: e for e in cargar_entrenadores()}
+    return by_name[trainers[0]], by_name[trainers[1]]
+
+
+def _init_worker(trainers: List[str]):
+    global _T1, _T2
+    from image_generator import precargar_atlas
+    _T1, _T2 = _load_trainers(trainers)
+    precargar_atlas([_T1, _T2])
+
+
+def _render(job, keep: bool = False):
+    """job = (path or None, text, active1, hp1, active2, hp2). Saves to path; returns the image if keep."""
+    from image_generator import componer_imagen_combate
+    path, text, a1, hp1, a2, hp2 = job
+    left1 = sum(1 for h in hp1 if h > 0)
+    left2 = sum(1 for h in hp2 if h > 0)
+    img = componer_imagen_combate(_T1, _T2, text, left1, left2,
+                                  _T1.pokemons[a1], hp1[a1], _T2.pokemons[a2], hp2[a2])
+    if img is not None and path is not None:
+        img.save(path)
+    return img if keep else None
+
+
+def _describe(row, prev_a1: int, prev_a2: int, t1, t2) -> str:
+    """Panel text of one turn row; prev_a* are the active slots at the start of the turn."""
+    lines = [f"Turn {int(row['t'])}"]
+    action = int(row["action"])
+    if action >= 10:
+        lines.append(f"Agent switches to {t1.pokemons[action - 10].name}")
+    hit_j, hit_b = int(row["hit_agent"]), int(row["hit_bot"])
+    if hit_j >= 0:
+        p = t1.pokemons[prev_a1]
+        res = f"{row['dmg_agent']:.1f} dmg" if hit_j else "missed"
+        lines.append(f"{p.name} uses {p.movimientos[action].name}: {res}")
+    if hit_b >= 0:
+        p = t2.pokemons[prev_a2]
+        res = f"{row['dmg_bot']:.1f} dmg" if hit_b else "missed"
+        lines.append(f"{p.name} uses {p.movimientos[int(row['bot_move'])].name}: {res}")
+    lines.append(f"Reward {row['reward']:+.3f}")
+    return "\n".join(lines)
+
+
+def frame_jobs(traj: TrajectoryReader, episode: int, t1, t2, outdir: Optional[str] = None):
+    """Render jobs of one episode, one per frame (t1/t2: the recorded trainers); with outdir every job saves frame_NNNN.png."""
+    turns = traj.episode(episode)
+    path = (lambda k: os.path.join(outdir, f"frame_{k:04d}.png")) if outdir else (lambda k: None)
+    jobs = [(path(0), f"Episode {episode}", 0, [float(p.hp) for p in t1.pokemons], 0, [float(p.hp) for p in t2.pokemons])]
+    a1 = a2 = 0
+    for k, row in enumerate(turns, start=1):
+        jobs.append((path(k), _describe(row, a1, a2, t1, t2),
+                     int(row["active1"]), row["hp1"].tolist(), int(row["active2"]), row["hp2"].tolist()))
+        a1, a2 = int(row["active1"]), int(row["active2"])
+    return jobs
+
+
+def export_episode(directory: str, episode: int, gif: Optional[str] = None, frames: Optional[str] = None,
+                   workers: Optional[int] = None, duration: int = 600) -> int:
+    """Renders one episode to a GIF and/or a directory of PNGs. Returns the number of frames."""
+    traj = TrajectoryReader(directory)
+    trainers = traj.meta["trainers"]
+    if frames:
+        os.makedirs(frames, exist_ok=True)
+    jobs = frame_jobs(traj, episode, *_load_trainers(trainers), outdir=frames)
+    keep = [bool(gif)] * len(jobs)  # for the GIF the images come back to the parent
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(trainers,)) as ex:
+        images = [im for im in ex.map(_render, jobs, keep, chunksize=8) if im is not None]
+        if gif and images:
+            images = [im.convert("P", palette=1, colors=256) for im in images]  # 1 = ADAPTIVE
+            images[0].save(gif, save_all=True, append_images=images[1:], duration=duration, loop=0)
+    return len(jobs)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("directory", help="directory written by rl_env.trajectory.TrajectoryRecorder")
+    ap.add_argument("--episode", type=int, default=None, help="episode id (default: the last recorded)")
+    ap.add_argument("--gif", type=str, default=None, help="output GIF")
+    ap.add_argument("--frames", type=str, default=None, help="output directory for PNG frames")
+    ap.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    ap.add_argument("--duration", type=int, default=600, help="ms per GIF frame")
+    args = ap.parse_args()
+    if not args.gif and not args.frames:
+        ap.error("give --gif and/or --frames")
+    episode = args.episode
+    if episode is None:
+        eps = TrajectoryReader(args.directory).episodes
+        if not len(eps):
+            ap.error("no episodes recorded")
+        episode = int(eps["episode"][-1])
+    n = export_episode(args.directory, episode, args.gif, args.frames, args.workers, args.duration)
+    print(f"[replay] episode {episode}: {n} frames")
+
+
+if __name__ == "__main__":
+    main()